@@ -1,14 +1,27 @@
 import json
 import os
+import re
+import threading
 from datetime import datetime
 from utils import app_dir
+import durable_io
 
 BASE_DIR = app_dir()
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Legacy single-file log (latest first). It is still read as the oldest
+# segment but is no longer written to.
 AUDIT_FILE = os.path.join(DATA_DIR, "audit_log.json")
+
+# New entries are appended as JSON lines to one segment per month,
+# rolling over to audit_log_YYYY-MM.N.jsonl once a segment gets large.
+SEGMENT_PREFIX = "audit_log_"
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+_SEGMENT_RE = re.compile(r"^audit_log_(\d{4})-(\d{2})(?:\.(\d+))?\.jsonl$")
+
 CURRENT_AUDIT_USER = None
+_write_lock = threading.Lock()
 
 
 def set_current_audit_user(user):
@@ -17,7 +30,59 @@ def set_current_audit_user(user):
     CURRENT_AUDIT_USER = text or None
 
 
-def write_audit_log(
+# -------------------------------
+# Segments
+# -------------------------------
+def _segment_path(month, part=0):
+    suffix = f".{part}" if part else ""
+    return os.path.join(DATA_DIR, f"{SEGMENT_PREFIX}{month}{suffix}.jsonl")
+
+
+def list_audit_segments():
+    """Segment paths ordered oldest to newest."""
+    found = []
+    try:
+        names = os.listdir(DATA_DIR)
+    except OSError:
+        return []
+    for name in names:
+        m = _SEGMENT_RE.match(name)
+        if m:
+            found.append(((int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)), os.path.join(DATA_DIR, name)))
+    return [path for _key, path in sorted(found)]
+
+
+def _current_segment(now):
+    month = now.strftime("%Y-%m")
+    part = 0
+    path = _segment_path(month, part)
+    while os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES:
+        part += 1
+        path = _segment_path(month, part)
+    return path
+
+
+def _append_lines(entries):
+    if not entries:
+        return
+    if durable_io.in_group():
+        # Part of a unit of work: written with the rest of its files.
+        durable_io.append_lines(
+            _current_segment(datetime.now()),
+            [json.dumps(e, ensure_ascii=False) for e in entries],
+        )
+        return
+    payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+    with _write_lock:
+        path = _current_segment(datetime.now())
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(payload)
+
+
+# -------------------------------
+# Write
+# -------------------------------
+def build_audit_entry(
     user=None,
     module=None,
     action=None,
@@ -46,17 +111,87 @@ def write_audit_log(
 
     if extra:
         log.update(extra)
+    return log
+
+
+def write_audit_log(
+    user=None,
+    module=None,
+    action=None,
+    reference=None,
+    before=None,
+    after=None,
+    extra=None
+):
+    # O(1): one appended line, independent of how much history exists.
+    _append_lines([
+        build_audit_entry(
+            user=user,
+            module=module,
+            action=action,
+            reference=reference,
+            before=before,
+            after=after,
+            extra=extra,
+        )
+    ])
+
+
+def write_audit_logs(entries):
+    """Append several entries built with build_audit_entry in one write."""
+    _append_lines([e for e in entries if isinstance(e, dict)])
+
+
+# -------------------------------
+# Read (latest first)
+# -------------------------------
+def _read_lines_reversed(path, block_size=64 * 1024):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + tail
+            lines = chunk.split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if tail.strip():
+            yield tail
+
+
+def iter_audit_logs():
+    """Yield audit entries newest first across all segments and the legacy file."""
+    for path in reversed(list_audit_segments()):
+        try:
+            for raw in _read_lines_reversed(path):
+                try:
+                    yield json.loads(raw.decode("utf-8"))
+                except ValueError:
+                    continue
+        except OSError:
+            continue
 
-    logs = []
     if os.path.exists(AUDIT_FILE):
         try:
             with open(AUDIT_FILE, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-        except:
-            logs = []
+                legacy = json.load(f)
+        except Exception:
+            legacy = []
+        if isinstance(legacy, list):
+            for log in legacy:
+                if isinstance(log, dict):
+                    yield log
 
-    # Keep persisted log in reverse chronological order (latest first).
-    logs.insert(0, log)
 
-    with open(AUDIT_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, indent=2)
+def load_audit_logs(limit=None):
+    rows = []
+    for log in iter_audit_logs():
+        rows.append(log)
+        if limit and len(rows) >= limit:
+            break
+    return rows
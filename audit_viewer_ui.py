@@ -1,11 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import json
-import os
 
-from utils import app_dir
+from audit_log import load_audit_logs
 from date_picker import open_date_picker
+from virtual_tree import VirtualTree
+from ui_tasks import TaskStatus
 from ui_theme import compact_form_grid
 
 
@@ -20,28 +20,28 @@ class AuditViewerUI(ttk.Frame):
         self.audit_data = []
         self.filtered = []
 
-        self.load_audit_file()
         self.build_ui()
+        self.load_audit_file()
 
     # --------------------------------------------------
     # LOAD AUDIT FILE
     # --------------------------------------------------
     def load_audit_file(self):
-        base = app_dir()
-        data_dir = os.path.join(base, "data")
-        self.audit_file = os.path.join(data_dir, "audit_log.json")
+        def work(_task):
+            # Segments are read newest first, so rows arrive already ordered.
+            rows = load_audit_logs()
+            return rows, self._build_rows(rows)
 
-        if not os.path.exists(self.audit_file):
-            self.audit_data = []
-            return
+        def done(result):
+            self.audit_data, values = result
+            self.view.set_rows(values)
 
-        try:
-            with open(self.audit_file, "r", encoding="utf-8") as f:
-                self.audit_data = json.load(f)
-        except Exception as e:
+        def failed(e):
             messagebox.showerror("Error", f"Failed to load audit log\n{e}")
             self.audit_data = []
 
+        self.tasks.run(work, on_done=done, on_error=failed, text="Loading audit log...")
+
     # --------------------------------------------------
     # UI
     # --------------------------------------------------
@@ -112,6 +112,9 @@ class AuditViewerUI(ttk.Frame):
             "reference"
         )
 
+        self.tasks = TaskStatus(self)
+        self.tasks.pack(anchor="w", padx=10)
+
         table_frame = ttk.Frame(self)
         table_frame.pack(fill="both", expand=True, padx=10, pady=10)
         table_frame.columnconfigure(0, weight=1)
@@ -143,46 +146,57 @@ class AuditViewerUI(ttk.Frame):
         xsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
         xsb.grid(row=1, column=0, sticky="ew")
         self.tree.configure(yscrollcommand=ysb.set, xscrollcommand=xsb.set)
-
-        self.load_rows(self.audit_data)
+        self.view = VirtualTree(self.tree, ysb)
 
     # --------------------------------------------------
     # LOAD TABLE ROWS
     # --------------------------------------------------
     def load_rows(self, rows):
-        self.tree.delete(*self.tree.get_children())
+        self.tasks.run(lambda _task: self._build_rows(rows), on_done=self.view.set_rows, text="Loading audit log...")
 
+    def _build_rows(self, rows):
         ordered_rows = sorted(
             rows,
             key=lambda r: self.parse_datetime(r.get("timestamp")) or datetime.min,
             reverse=True
         )
 
-        for r in ordered_rows:
-            self.tree.insert(
-                "",
-                "end",
-                values=(
-                    self.format_timestamp(r.get("timestamp", "")),
-                    self.format_user_label(r.get("user", "")),
-                    r.get("module", ""),
-                    r.get("action", ""),
-                    r.get("reference", "")
-                )
+        return [
+            (
+                self.format_timestamp(r.get("timestamp", "")),
+                self.format_user_label(r.get("user", "")),
+                r.get("module", ""),
+                r.get("action", ""),
+                r.get("reference", "")
             )
+            for r in ordered_rows
+        ]
 
     # --------------------------------------------------
     # FILTER LOGIC
     # --------------------------------------------------
     def apply_filters(self):
-        self.filtered = []
-
         from_d = self.parse_date(self.from_date.get())
         to_d = self.parse_date(self.to_date.get())
         user = self.user_e.get().strip().lower()
         module = self.module_e.get().strip().lower()
+        rows = self.audit_data
+
+        def work(_task):
+            filtered = self._filter_rows(rows, from_d, to_d, user, module)
+            return filtered, self._build_rows(filtered)
+
+        def done(result):
+            self.filtered, values = result
+            self.view.set_rows(values)
+            if not self.filtered:
+                messagebox.showinfo("Info", "No audit records found")
 
-        for r in self.audit_data:
+        self.tasks.run(work, on_done=done, text="Loading audit log...")
+
+    def _filter_rows(self, rows, from_d, to_d, user, module):
+        filtered = []
+        for r in rows:
             ts = self.parse_datetime(r.get("timestamp"))
 
             if from_d and ts and ts < from_d:
@@ -197,12 +211,8 @@ class AuditViewerUI(ttk.Frame):
             if module and module not in r.get("module", "").lower():
                 continue
 
-            self.filtered.append(r)
-
-        self.load_rows(self.filtered)
-
-        if not self.filtered:
-            messagebox.showinfo("Info", "No audit records found")
+            filtered.append(r)
+        return filtered
 
     def reset_filters(self):
         self.from_date.delete(0, tk.END)
@@ -0,0 +1,136 @@
+import bisect
+import tkinter as tk
+from collections import OrderedDict
+
+
+# Shared suggestion engine for the search-as-you-type dropdowns.
+#
+# SuggestionIndex lowercases every value once and keeps a trigram index
+# (trigram -> ids of values containing it). A query of 3+ characters only
+# checks the values in the smallest posting list of its trigrams; shorter
+# queries scan the pre-lowered keys. Results are ranked: values starting
+# with the query, then values with a word starting with it, then any other
+# substring match, each group in the original (sorted) order, capped at
+# limit.
+#
+# Screens keep their sorted *_values_all lists and call suggest(values,
+# typed); the index for a list is built on first use and reused until the
+# screen assigns a new list. debounce() wraps a <KeyRelease> handler so
+# filtering runs once typing pauses instead of on every key.
+
+MAX_SUGGESTIONS = 200
+DEBOUNCE_MS = 120
+_GRAM = 3
+_CACHE_SIZE = 32
+# Keys the filter handlers ignore; they pass straight through so they never
+# cancel a pending filter run.
+NAVIGATION_KEYS = ("Up", "Down", "Left", "Right", "Return", "Escape", "Tab")
+
+
+class SuggestionIndex:
+    def __init__(self, values):
+        self.values = values
+        self._count = len(values)
+        self._keys = [str(v).lower() for v in values]
+        self._grams = {}
+        for i, key in enumerate(self._keys):
+            for gram in {key[j:j + _GRAM] for j in range(len(key) - _GRAM + 1)}:
+                self._grams.setdefault(gram, []).append(i)
+        # (key, id) pairs in key order, for prefix lookups with bisect.
+        self._sorted = sorted((key, i) for i, key in enumerate(self._keys))
+
+    def is_current(self, values):
+        return values is self.values and len(values) == self._count
+
+    def _prefix_ids(self, q, limit):
+        ids = []
+        pos = bisect.bisect_left(self._sorted, (q,))
+        while pos < len(self._sorted) and self._sorted[pos][0].startswith(q):
+            ids.append(self._sorted[pos][1])
+            pos += 1
+            if len(ids) >= limit:
+                break
+        return sorted(ids)
+
+    def _candidates(self, q):
+        if len(q) < _GRAM:
+            return range(len(self._keys))
+        postings = []
+        for j in range(len(q) - _GRAM + 1):
+            ids = self._grams.get(q[j:j + _GRAM])
+            if not ids:
+                return []
+            postings.append(ids)
+        return min(postings, key=len)
+
+    def search(self, typed, limit=MAX_SUGGESTIONS):
+        q = str(typed or "").strip().lower()
+        if not q:
+            return []
+        prefix = self._prefix_ids(q, limit)
+        remaining = limit - len(prefix)
+        word_starts = []
+        inside = []
+        if remaining > 0:
+            for i in self._candidates(q):
+                key = self._keys[i]
+                pos = key.find(q)
+                if pos <= 0:
+                    # Not found, or a prefix match already collected.
+                    continue
+                if not key[pos - 1].isalnum():
+                    word_starts.append(i)
+                    if len(word_starts) >= remaining:
+                        break
+                elif len(inside) < remaining:
+                    inside.append(i)
+        ranked = (prefix + word_starts + inside)[:limit]
+        return [self.values[i] for i in ranked]
+
+
+_indexes = OrderedDict()
+
+
+def index_for(values):
+    """SuggestionIndex for a values list, reused while the list is unchanged."""
+    key = id(values)
+    index = _indexes.get(key)
+    if index is None or not index.is_current(values):
+        index = SuggestionIndex(values)
+        _indexes[key] = index
+    _indexes.move_to_end(key)
+    while len(_indexes) > _CACHE_SIZE:
+        _indexes.popitem(last=False)
+    return index
+
+
+def suggest(values, typed, limit=MAX_SUGGESTIONS):
+    """Ranked values matching typed (prefix, then word start, then substring)."""
+    if not values:
+        return []
+    return index_for(values).search(typed, limit)
+
+
+def debounce(widget, handler, delay_ms=DEBOUNCE_MS):
+    """
+    Event handler that runs handler(event) once no further event arrived
+    for delay_ms. Bind it in place of handler.
+    """
+    pending = {"after_id": None}
+
+    def fire(event):
+        pending["after_id"] = None
+        if widget.winfo_exists():
+            handler(event)
+
+    def on_event(event=None):
+        if event is not None and getattr(event, "keysym", "") in NAVIGATION_KEYS:
+            return handler(event)
+        if pending["after_id"] is not None:
+            try:
+                widget.after_cancel(pending["after_id"])
+            except tk.TclError:
+                pass
+        pending["after_id"] = widget.after(delay_ms, lambda: fire(event))
+
+    return on_event
@@ -7,14 +7,17 @@ from audit_log import write_audit_log
 from config import COMPANY
 from utils_print import print_pdf
 from sales import create_sale
+from transaction import unit_of_work
 from inventory import get_available_items, get_item_stock, load_inventory
 from item_summary_report import get_item_summary_report
-from customers import load_customers, get_customer_by_name
+from customer_index import get_customer_index
 from customers import (
     save_customer,
     get_customer_by_phone,
     get_customer_by_name
 )
+from autocomplete import suggest, debounce
+from ui_tasks import run_task
 from ui_theme import compact_form_grid
 
 ITEM_TYPE_OPTIONS = ["Nos", "Kg", "Litre", "Metre"]
@@ -45,7 +48,7 @@ class BillingUI(ttk.Frame):
         self._saving_invoice = False
         self._quick_action_locked = False
         self._quick_action_job = None
-        self._customers_cache = {}
+        self._customer_index = None
         self._customer_name_values_all = []
         self._customer_phone_values_all = []
         self._customer_address_values_all = []
@@ -112,7 +115,7 @@ class BillingUI(ttk.Frame):
         
         self.item_cb = ttk.Combobox(add, state="normal", width=22)
         self.item_cb.grid(row=1, column=0, padx=5)
-        self.item_cb.bind("<KeyRelease>", self.filter_items_live)
+        self.item_cb.bind("<KeyRelease>", debounce(self, self.filter_items_live))
         self.item_cb.bind("<<ComboboxSelected>>", self.on_item_change)
         self.item_cb.bind("<FocusOut>", self.on_item_focus_out)
         self.item_cb.bind("<Down>", self.on_item_down_key)
@@ -363,7 +366,7 @@ class BillingUI(ttk.Frame):
             self.cust_name["values"] = self._customer_name_values_all
             self._hide_name_suggestions()
             return
-        matches = [n for n in self._customer_name_values_all if typed in n.lower()]
+        matches = self._customer_index.names.match(typed) if self._customer_index else []
         shown = matches if matches else self._customer_name_values_all
         self._show_name_suggestions(shown)
 
@@ -375,7 +378,7 @@ class BillingUI(ttk.Frame):
             self.phone["values"] = self._customer_phone_values_all
             self._hide_phone_suggestions()
             return
-        matches = [p for p in self._customer_phone_values_all if typed in p]
+        matches = self._customer_index.phones.match(typed) if self._customer_index else []
         shown = matches if matches else self._customer_phone_values_all
         self._show_phone_suggestions(shown)
 
@@ -387,7 +390,7 @@ class BillingUI(ttk.Frame):
             self.address["values"] = self._customer_address_values_all
             self._hide_address_suggestions()
             return
-        matches = [a for a in self._customer_address_values_all if typed in a.lower()]
+        matches = self._customer_index.addresses.match(typed) if self._customer_index else []
         shown = matches if matches else self._customer_address_values_all
         self._show_address_suggestions(shown)
 
@@ -571,49 +574,29 @@ class BillingUI(ttk.Frame):
         return "break"
 
     def _warm_load_customers(self):
+        # Built once per process and kept current by save_customer.
         try:
-            self._customers_cache = load_customers()
+            self._customer_index = get_customer_index()
         except Exception:
-            self._customers_cache = {}
-        names = []
-        phones = []
-        addresses = []
-        for c in self._customers_cache.values():
-            if not isinstance(c, dict):
-                continue
-            nm = str(c.get("name", "")).strip()
-            ph = str(c.get("phone", "")).strip()
-            ad = str(c.get("address", "")).strip()
-            if nm:
-                names.append(nm)
-            if ph:
-                phones.append(ph)
-            if ad:
-                addresses.append(ad)
-        self._customer_name_values_all = sorted(set(names), key=str.lower)
-        self._customer_phone_values_all = sorted(set(phones))
-        self._customer_address_values_all = sorted(set(addresses), key=str.lower)
+            self._customer_index = None
+        if self._customer_index is None:
+            return
+        self._customer_name_values_all = self._customer_index.names.values()
+        self._customer_phone_values_all = self._customer_index.phones.values()
+        self._customer_address_values_all = self._customer_index.addresses.values()
         self.cust_name["values"] = self._customer_name_values_all
         self.phone["values"] = self._customer_phone_values_all
         self.address["values"] = self._customer_address_values_all
 
     def _find_customer_by_phone(self, phone):
-        key = str(phone or "").strip()
-        if not key:
+        if self._customer_index is None:
             return None
-        for c in self._customers_cache.values():
-            if str(c.get("phone", "")).strip() == key:
-                return c
-        return None
+        return self._customer_index.find_by_phone(phone)
 
     def _find_customer_by_name(self, name):
-        key = str(name or "").strip().lower()
-        if not key:
+        if self._customer_index is None:
             return None
-        for c in self._customers_cache.values():
-            if str(c.get("name", "")).strip().lower() == key:
-                return c
-        return None
+        return self._customer_index.find_by_name(name)
 
     def _validate_phone_input(self, proposed):
         if proposed == "":
@@ -677,7 +660,7 @@ class BillingUI(ttk.Frame):
             self._hide_item_suggestions()
             self.update_qty_dropdown()
             return
-        matches = [name for name in self._item_values_all if typed in name.lower()]
+        matches = suggest(self._item_values_all, typed)
         shown = matches if matches else self._item_values_all
         self._show_item_suggestions(shown)
         self.update_qty_dropdown()
@@ -976,36 +959,36 @@ class BillingUI(ttk.Frame):
             summary["discount_amount"] = round(discount_amount, 2)
             summary["grand_total"] = self._round_amount_by_rule(max(gross_total - discount_amount, 0.0))
 
-            invoice_no = create_sale(
-                customer_name=self.cust_name.get(),
-                phone=phone,
-                items=gst_items,
-                payment_mode=self.pay_mode.get(),
-                paid_amount=paid,
-                discount_percent=discount_percent
-            )
-
-            write_audit_log(
-                user="admin",
-                module="invoice",
-                action="create",
-                reference=invoice_no,
-                after={
-                    "customer": self.cust_name.get(),
-                    "phone": phone,
-                    "total": summary.get("grand_total"),
-                    "paid": paid,
-                    "payment_mode": self.pay_mode.get(),
-                    "items_count": len(gst_items)
-                }
-            )
-
-            save_customer(
-                name=self.cust_name.get(),
-                phone=phone,
-                address=self.address.get()
-            )
-            self._customers_cache = load_customers()
+            with unit_of_work("billing"):
+                invoice_no = create_sale(
+                    customer_name=self.cust_name.get(),
+                    phone=phone,
+                    items=gst_items,
+                    payment_mode=self.pay_mode.get(),
+                    paid_amount=paid,
+                    discount_percent=discount_percent
+                )
+
+                write_audit_log(
+                    user="admin",
+                    module="invoice",
+                    action="create",
+                    reference=invoice_no,
+                    after={
+                        "customer": self.cust_name.get(),
+                        "phone": phone,
+                        "total": summary.get("grand_total"),
+                        "paid": paid,
+                        "payment_mode": self.pay_mode.get(),
+                        "items_count": len(gst_items)
+                    }
+                )
+
+                save_customer(
+                    name=self.cust_name.get(),
+                    phone=phone,
+                    address=self.address.get()
+                )
             self._warm_load_customers()
             for i in gst_items:
                 name = i.get("item") or i.get("name")
@@ -1013,21 +996,35 @@ class BillingUI(ttk.Frame):
                 if name in self._stock_cache:
                     self._stock_cache[name] = max(self._stock_cache[name] - sold_qty, 0.0)
 
-            pdf_path = f"invoices/{invoice_no}.pdf"
-            generate_gst_invoice_pdf(
-                filepath=pdf_path,
-                company=COMPANY,
-                invoice_no=invoice_no,
-                invoice_date=datetime.now().strftime("%d-%m-%Y"),
-                customer={"name": self.cust_name.get(), "gstin": "", "state": "AP"},
-                items=gst_items,
-                summary=summary
-            )
-
-            self.last_invoice_path = os.path.abspath(pdf_path)
-            self.print_btn.config(state="normal")
-            os.startfile(self.last_invoice_path)
-            self.status_var.set(f"Invoice Created : {invoice_no}")
+            pdf_path = os.path.abspath(f"invoices/{invoice_no}.pdf")
+            customer = {"name": self.cust_name.get(), "gstin": "", "state": "AP"}
+            invoice_date = datetime.now().strftime("%d-%m-%Y")
+
+            def write_pdf(_task):
+                # The sale is already committed; only the PDF is built off the UI thread.
+                generate_gst_invoice_pdf(
+                    filepath=pdf_path,
+                    company=COMPANY,
+                    invoice_no=invoice_no,
+                    invoice_date=invoice_date,
+                    customer=customer,
+                    items=gst_items,
+                    summary=summary
+                )
+                os.startfile(pdf_path)
+
+            def pdf_ready(_result):
+                self.last_invoice_path = pdf_path
+                self.print_btn.config(state="normal")
+                self.status_var.set(f"Invoice Created : {invoice_no}")
+
+            def pdf_failed(e):
+                self.status_var.set(f"Invoice Created : {invoice_no} (PDF failed)")
+                messagebox.showerror("Invoice PDF", f"Invoice {invoice_no} was saved but its PDF could not be created.\n\n{e}")
+
+            self.print_btn.config(state="disabled")
+            self.status_var.set(f"Invoice Created : {invoice_no} (creating PDF...)")
+            run_task(self, write_pdf, on_done=pdf_ready, on_error=pdf_failed, name="Invoice PDF")
             self.reset_form_for_next_invoice()
         finally:
             self._saving_invoice = False
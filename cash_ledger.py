@@ -1,8 +1,10 @@
-import json
 import os
+import uuid
 from datetime import datetime
 from utils import app_dir
 from audit_log import write_audit_log
+from journal_store import JournalStore
+import sqlite_store
 
 # -------------------------------
 # Path setup
@@ -12,21 +14,26 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 CASH_LEDGER_FILE = os.path.join(DATA_DIR, "cash_ledger.json")
+# cash_ledger.json stays the snapshot; new entries go to
+# cash_ledger.journal.jsonl. Entries written before entry_id existed have
+# no key and are simply kept in the snapshot.
+CASH_LEDGER_STORE = JournalStore(CASH_LEDGER_FILE, key_field="entry_id")
 
 
 # -------------------------------
 # Load / Save
 # -------------------------------
 def load_cash_ledger():
-    if not os.path.exists(CASH_LEDGER_FILE):
-        return []
-    with open(CASH_LEDGER_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_cash_ledger()
+    return CASH_LEDGER_STORE.load()
 
 
 def save_cash_ledger(data):
-    with open(CASH_LEDGER_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    if sqlite_store.is_enabled():
+        sqlite_store.save_cash_ledger(data)
+        return
+    CASH_LEDGER_STORE.save(data)
 
 
 # -------------------------------
@@ -40,9 +47,8 @@ def add_cash_entry(
     reference="",
     user="admin"
 ):
-    ledger = load_cash_ledger()
-
     entry = {
+        "entry_id": uuid.uuid4().hex,
         "date": date,
         "particulars": particulars,
         "cash_in": round(float(cash_in), 2),
@@ -50,8 +56,11 @@ def add_cash_entry(
         "reference": reference
     }
 
-    ledger.append(entry)
-    save_cash_ledger(ledger)
+    if sqlite_store.is_enabled():
+        sqlite_store.append_cash_entry(entry)
+    else:
+        # One journal line instead of rewriting the whole ledger.
+        CASH_LEDGER_STORE.put(entry)
 
     # ---------- AUDIT ----------
     write_audit_log(
@@ -0,0 +1,62 @@
+import os
+import json
+import threading
+from utils import app_dir
+import data_cache
+import durable_io
+
+BASE_DIR = app_dir()
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Last number handed out per sequence, e.g. {"invoice_no": 42, "purchase_id": 7}.
+COUNTERS_FILE = os.path.join(DATA_DIR, "counters.json")
+
+_lock = threading.RLock()
+
+
+def _read_counters():
+    if not os.path.exists(COUNTERS_FILE):
+        return {}
+    with open(COUNTERS_FILE, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def id_number(value, prefix):
+    """Numeric part of an id like INV0042 (0 if it does not match prefix)."""
+    text = str(value or "").strip().upper()
+    if not text.startswith(prefix):
+        return 0
+    try:
+        return int(text[len(prefix):])
+    except ValueError:
+        return 0
+
+
+def next_sequence(name, floor=0, seed=None):
+    """
+    Allocate the next number of sequence name.
+
+    floor: a number known to be used already (e.g. the last stored id), so a
+    stale counters file can never hand out a duplicate.
+    seed: callable returning the highest number in use; called only the
+    first time, when the counter does not exist yet.
+
+    Inside a unit of work the new value is committed with the record that
+    uses it.
+    """
+    with _lock:
+        counters = data_cache.load(COUNTERS_FILE, _read_counters)
+        if name in counters:
+            current = int(counters.get(name) or 0)
+        else:
+            current = int(seed() if seed else 0)
+        value = max(current, int(floor or 0)) + 1
+        counters[name] = value
+        durable_io.write_json(COUNTERS_FILE, counters, indent=4)
+        data_cache.store(COUNTERS_FILE, counters)
+        return value
@@ -0,0 +1,210 @@
+import bisect
+import threading
+
+import data_cache
+import sqlite_store
+from customers import CUSTOMER_FILE, load_customers
+
+
+# In-memory lookup structures for the customer directory, used by billing
+# autocomplete.
+#
+# Exact lookups are hash maps (phone -> record, lowercased name -> records).
+# Suggestions come from sorted (token, display) arrays searched with bisect,
+# so a keystroke costs O(log n + matches) instead of a scan of every
+# customer. Names and addresses are also indexed per word, so "kum" finds
+# "Bharath Kumar".
+#
+# The index is built once from load_customers() and then updated in place
+# by customers.save_customer (after its write is committed). A change to
+# customers.json made outside the app is noticed through the file signature
+# and triggers a rebuild.
+
+MAX_SUGGESTIONS = 200
+
+
+class _PrefixIndex:
+    def __init__(self, split_words):
+        self._split_words = split_words
+        self._entries = []  # sorted (token, display.lower(), display)
+        self._counts = {}  # display -> number of customers using it
+        self._values = None
+
+    def _tokens(self, display):
+        low = display.lower()
+        tokens = {low}
+        if self._split_words:
+            tokens.update(w for w in low.split() if w)
+        return tokens
+
+    def add(self, display):
+        display = str(display or "").strip()
+        if not display:
+            return
+        count = self._counts.get(display, 0)
+        self._counts[display] = count + 1
+        if count:
+            return
+        low = display.lower()
+        for token in self._tokens(display):
+            bisect.insort(self._entries, (token, low, display))
+        self._values = None
+
+    def load(self, displays):
+        """Bulk initial fill: one sort instead of an insort per value."""
+        for display in displays:
+            display = str(display or "").strip()
+            if not display:
+                continue
+            count = self._counts.get(display, 0)
+            self._counts[display] = count + 1
+            if count:
+                continue
+            low = display.lower()
+            self._entries.extend((token, low, display) for token in self._tokens(display))
+        self._entries.sort()
+        self._values = None
+
+    def discard(self, display):
+        display = str(display or "").strip()
+        count = self._counts.get(display, 0)
+        if not count:
+            return
+        if count > 1:
+            self._counts[display] = count - 1
+            return
+        del self._counts[display]
+        low = display.lower()
+        for token in self._tokens(display):
+            entry = (token, low, display)
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+        self._values = None
+
+    def match(self, prefix, limit=MAX_SUGGESTIONS):
+        """Distinct values with a word (or the whole value) starting with prefix."""
+        key = str(prefix or "").strip().lower()
+        if not key:
+            return []
+        found = []
+        seen = set()
+        i = bisect.bisect_left(self._entries, (key,))
+        while i < len(self._entries) and self._entries[i][0].startswith(key):
+            display = self._entries[i][2]
+            if display not in seen:
+                seen.add(display)
+                found.append(display)
+                if len(found) >= limit:
+                    break
+            i += 1
+        return sorted(found, key=str.lower)
+
+    def values(self):
+        """Every distinct value, sorted case-insensitively (shared list)."""
+        if self._values is None:
+            self._values = sorted(self._counts, key=str.lower)
+        return self._values
+
+
+class CustomerIndex:
+    def __init__(self):
+        self.by_phone = {}
+        self.by_name = {}  # name.lower() -> {phone: record}
+        self.names = _PrefixIndex(split_words=True)
+        self.phones = _PrefixIndex(split_words=False)
+        self.addresses = _PrefixIndex(split_words=True)
+
+    @classmethod
+    def build(cls, customers):
+        index = cls()
+        for key, rec in (customers or {}).items():
+            phone = str(key or "").strip()
+            if not phone or not isinstance(rec, dict):
+                continue
+            index.by_phone[phone] = rec
+            name = str(rec.get("name", "")).strip()
+            if name:
+                index.by_name.setdefault(name.lower(), {})[phone] = rec
+        index.names.load(rec.get("name", "") for rec in index.by_phone.values())
+        index.phones.load(index.by_phone)
+        index.addresses.load(rec.get("address", "") for rec in index.by_phone.values())
+        return index
+
+    def _link(self, phone, rec):
+        self.by_phone[phone] = rec
+        name = str(rec.get("name", "")).strip()
+        if name:
+            self.by_name.setdefault(name.lower(), {})[phone] = rec
+        self.names.add(name)
+        self.phones.add(phone)
+        self.addresses.add(rec.get("address", ""))
+
+    def _unlink(self, phone, rec):
+        self.by_phone.pop(phone, None)
+        name = str(rec.get("name", "")).strip()
+        same_name = self.by_name.get(name.lower())
+        if same_name is not None:
+            same_name.pop(phone, None)
+            if not same_name:
+                del self.by_name[name.lower()]
+        self.names.discard(name)
+        self.phones.discard(phone)
+        self.addresses.discard(rec.get("address", ""))
+
+    def put(self, rec, phone=None):
+        """Add or replace one customer (keyed by phone, like customers.json)."""
+        phone = str(phone or rec.get("phone", "")).strip()
+        if not phone:
+            return
+        old = self.by_phone.get(phone)
+        if old is not None:
+            self._unlink(phone, old)
+        self._link(phone, rec)
+
+    def find_by_phone(self, phone):
+        return self.by_phone.get(str(phone or "").strip())
+
+    def find_by_name(self, name):
+        same_name = self.by_name.get(str(name or "").strip().lower())
+        if not same_name:
+            return None
+        return next(iter(same_name.values()))
+
+
+_lock = threading.RLock()
+_index = None
+_index_signature = None
+
+
+def _source_signature():
+    # SQLite mode has no file to watch; only this process writes customers.
+    if sqlite_store.is_enabled():
+        return None
+    return data_cache.file_signature(CUSTOMER_FILE)
+
+
+def get_customer_index():
+    global _index, _index_signature
+    with _lock:
+        signature = _source_signature()
+        if _index is None or signature != _index_signature:
+            _index = CustomerIndex.build(load_customers())
+            _index_signature = signature
+        return _index
+
+
+def record_saved(rec):
+    """Apply a committed save_customer to the index without rebuilding it."""
+    global _index_signature
+    with _lock:
+        if _index is None:
+            return
+        _index.put(rec)
+        _index_signature = _source_signature()
+
+
+def invalidate():
+    global _index
+    with _lock:
+        _index = None
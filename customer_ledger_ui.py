@@ -1,11 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-from sales import load_sales, save_sales
-from audit_log import write_audit_log
-from cash_ledger import add_cash_entry
+from sales import load_sales, receive_invoice_payment
 from date_picker import open_date_picker
+from autocomplete import suggest, debounce
 from ui_theme import compact_form_grid
+from virtual_tree import VirtualTree
+from ui_tasks import TaskStatus
 
 class CustomerLedgerUI(ttk.Frame):
     def __init__(self, parent):
@@ -14,10 +15,6 @@ class CustomerLedgerUI(ttk.Frame):
         self.sales = []
         self.filtered_sales = []
         self.selected_invoice = None
-        self._render_job = None
-        self._rows_buffer = []
-        self._pending_total_due = 0.0
-        self._pending_customer_name = None
         self._customer_name_values_all = []
         self._item_values_all = []
         self.name_suggest_win = None
@@ -47,9 +44,9 @@ class CustomerLedgerUI(ttk.Frame):
                 "Due": f"{s.get('due', 0):.2f}"
             })
 
-        export_customer_ledger_excel(
-            rows=rows,
-            customer_name=customer_name
+        self.tasks.run(
+            lambda _task: export_customer_ledger_excel(rows=rows, customer_name=customer_name),
+            text="Exporting Excel...",
         )
 
 
@@ -71,9 +68,9 @@ class CustomerLedgerUI(ttk.Frame):
                 "due": f"{s.get('due'):.2f}",
                 })
 
-        generate_customer_ledger_pdf(
-            rows=rows,
-            customer_name=customer_name
+        self.tasks.run(
+            lambda _task: generate_customer_ledger_pdf(rows=rows, customer_name=customer_name),
+            text="Creating PDF...",
         )
 
     # ==================================================
@@ -98,7 +95,7 @@ class CustomerLedgerUI(ttk.Frame):
         ttk.Label(row1, text="Customer Name").pack(side="left", padx=(0, 3))
         self.name_e = ttk.Entry(row1, width=22)
         self.name_e.pack(side="left", padx=(0, 8))
-        self.name_e.bind("<KeyRelease>", self.filter_customer_names)
+        self.name_e.bind("<KeyRelease>", debounce(self, self.filter_customer_names))
         self.name_e.bind("<FocusOut>", self.on_name_focus_out)
         self.name_e.bind("<Down>", self.on_name_down_key)
 
@@ -112,7 +109,7 @@ class CustomerLedgerUI(ttk.Frame):
         ttk.Label(row1, text="Item").pack(side="left", padx=(0, 3))
         self.item_e = ttk.Entry(row1, width=18)
         self.item_e.pack(side="left", padx=(0, 8))
-        self.item_e.bind("<KeyRelease>", self.filter_items)
+        self.item_e.bind("<KeyRelease>", debounce(self, self.filter_items))
         self.item_e.bind("<FocusOut>", self.on_item_focus_out)
         self.item_e.bind("<Down>", self.on_item_down_key)
 
@@ -174,8 +171,13 @@ class CustomerLedgerUI(ttk.Frame):
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
         self.tree.tag_configure("due", background="#ffe6e6")
+        self.view = VirtualTree(self.tree)
+        status = ttk.Frame(self)
+        status.pack(fill="x", padx=15, pady=(0, 4))
         self.status_var = tk.StringVar(value="")
-        ttk.Label(self, textvariable=self.status_var).pack(anchor="w", padx=15, pady=(0, 4))
+        ttk.Label(status, textvariable=self.status_var).pack(side="left")
+        self.tasks = TaskStatus(status)
+        self.tasks.pack(side="left", padx=(10, 0))
 
         # ---------- SUMMARY ----------
         self.total_due_var = tk.StringVar(value="Total Due:0.00")
@@ -214,17 +216,9 @@ class CustomerLedgerUI(ttk.Frame):
     # LOAD LEDGER (CORE LOGIC)
     # ==================================================
     def load_ledger(self):
-        if self._render_job:
-            try:
-                self.after_cancel(self._render_job)
-            except Exception:
-                pass
-            self._render_job = None
-        self.tree.delete(*self.tree.get_children())
+        self.view.set_rows([])
         self.filtered_sales = []
         self.selected_invoice = None
-        self._rows_buffer = []
-        self.refresh_filter_recommendations()
 
         name = self.name_e.get().strip().lower()
         phone = self._normalize_phone().strip()
@@ -247,13 +241,23 @@ class CustomerLedgerUI(ttk.Frame):
 
         from_date = self.parse_date(from_raw)
         to_date = self.parse_date(to_raw)
+        self.tasks.run(
+            lambda task: self._read_ledger(task, name, phone, item, from_date, to_date),
+            on_done=self._show_ledger,
+            text="Loading ledger...",
+        )
+
+    def _read_ledger(self, task, name, phone, item, from_date, to_date):
+        sales = load_sales()
+        recommendations = self._filter_values(sales)
+        task.check()
 
         total_due = 0.0
         customer_name = None
         matched_sales = []
 
         sales_rows = sorted(
-            load_sales(),
+            sales,
             key=lambda x: self.parse_date(x.get("date")) or datetime.min,
             reverse=True
         )
@@ -287,23 +291,12 @@ class CustomerLedgerUI(ttk.Frame):
 
             total_due += float(s.get("due", 0))
 
-        self.filtered_sales = matched_sales
-        self._pending_customer_name = customer_name
-        self._pending_total_due = total_due
-        for s in matched_sales:
-            self._rows_buffer.append(
-                (
-                    (
-                        self.format_date(s.get("date")),
-                        s.get("invoice_no"),
-                        f"{s.get('grand_total', 0):.2f}",
-                        f"{s.get('paid', 0):.2f}",
-                        f"{s.get('due', 0):.2f}",
-                    ),
-                    ("due",) if s.get("due", 0) > 0 else ()
-                )
-            )
+        return matched_sales, customer_name, total_due, recommendations
 
+    def _show_ledger(self, result):
+        matched_sales, customer_name, total_due, recommendations = result
+        self._customer_name_values_all, self._item_values_all = recommendations
+        self.filtered_sales = matched_sales
         if not self.filtered_sales:
             self.customer_name_var.set("Customer: -")
             self.total_due_var.set("Total Due: 0.00")
@@ -311,30 +304,35 @@ class CustomerLedgerUI(ttk.Frame):
             messagebox.showinfo("Info", "No records found")
             return
 
-        self.status_var.set(f"Loading {len(self._rows_buffer)} rows...")
-        self._render_rows_chunk()
-
-    def _render_rows_chunk(self, chunk_size=250):
-        if not self._rows_buffer:
-            self.customer_name_var.set(
-                f"Customer: {self._pending_customer_name}" if self._pending_customer_name else "Customer: -"
-            )
-            self.total_due_var.set(f"Total Due: {self._pending_total_due:,.2f}")
-            self.status_var.set("")
-            self._render_job = None
-            return
-
-        batch = self._rows_buffer[:chunk_size]
-        self._rows_buffer = self._rows_buffer[chunk_size:]
-        for values, tags in batch:
-            self.tree.insert("", "end", values=values, tags=tags)
-
-        self.status_var.set(f"Loading... {len(self._rows_buffer)} rows remaining")
-        self._render_job = self.after(1, self._render_rows_chunk)
+        self.view.set_rows(
+            (
+                (
+                    self.format_date(s.get("date")),
+                    s.get("invoice_no"),
+                    f"{s.get('grand_total', 0):.2f}",
+                    f"{s.get('paid', 0):.2f}",
+                    f"{s.get('due', 0):.2f}",
+                )
+                for s in matched_sales
+            ),
+            [("due",) if s.get("due", 0) > 0 else () for s in matched_sales],
+        )
+        self.customer_name_var.set(f"Customer: {customer_name}" if customer_name else "Customer: -")
+        self.total_due_var.set(f"Total Due: {total_due:,.2f}")
+        self.status_var.set(f"{len(matched_sales)} invoices")
 
     # ==================================================
     def refresh_filter_recommendations(self):
-        sales = load_sales()
+        self.tasks.run(
+            lambda _task: self._filter_values(load_sales()),
+            on_done=self._apply_filter_values,
+            text="Loading customers...",
+        )
+
+    def _apply_filter_values(self, values):
+        self._customer_name_values_all, self._item_values_all = values
+
+    def _filter_values(self, sales):
         customer_names = []
         item_names = []
 
@@ -347,8 +345,7 @@ class CustomerLedgerUI(ttk.Frame):
                 if iname:
                     item_names.append(iname)
 
-        self._customer_name_values_all = sorted(set(customer_names), key=str.lower)
-        self._item_values_all = sorted(set(item_names), key=str.lower)
+        return sorted(set(customer_names), key=str.lower), sorted(set(item_names), key=str.lower)
 
     def filter_customer_names(self, event=None):
         if event and event.keysym in ("Up", "Down", "Left", "Right", "Return", "Escape", "Tab"):
@@ -357,7 +354,7 @@ class CustomerLedgerUI(ttk.Frame):
         if not typed:
             self._hide_name_suggestions()
             return
-        matches = [n for n in self._customer_name_values_all if typed in n.lower()]
+        matches = suggest(self._customer_name_values_all, typed)
         self._show_name_suggestions(matches)
 
     def filter_items(self, event=None):
@@ -367,7 +364,7 @@ class CustomerLedgerUI(ttk.Frame):
         if not typed:
             self._hide_item_suggestions()
             return
-        matches = [n for n in self._item_values_all if typed in n.lower()]
+        matches = suggest(self._item_values_all, typed)
         self._show_item_suggestions(matches)
 
     def _show_name_suggestions(self, values):
@@ -542,7 +539,7 @@ class CustomerLedgerUI(ttk.Frame):
         sel = self.tree.selection()
         if not sel:
             return
-        idx = self.tree.index(sel[0])
+        idx = self.view.row_index(sel[0])
         self.selected_invoice = self.filtered_sales[idx]
 
     # ==================================================
@@ -578,34 +575,11 @@ class CustomerLedgerUI(ttk.Frame):
 
         invoice_no = values[1]
 
-        # ---- update sales data ----
-        all_sales = load_sales()
-        for s in all_sales:
-            if s["invoice_no"] == invoice_no:
-                before_paid = s.get("paid", 0)
-                before_due = s.get("due", 0)
-
-                s["paid"] = before_paid + pay
-                s["due"] = before_due - pay
-                break
-
-        save_sales(all_sales)
-
-        write_audit_log(
-            user="admin",
-            module="payment",
-            action="receive",
-            reference=invoice_no,
-            before={"paid": before_paid, "due": before_due},
-            after={"paid": s["paid"], "due": s["due"]}
-        )
-
-        add_cash_entry(
-            date=datetime.now().strftime("%Y-%m-%d"),
-            particulars=f"Customer Payment {invoice_no}",
-            cash_in=pay,
-            reference=invoice_no
-        )
+        try:
+            receive_invoice_payment(invoice_no, pay)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
         messagebox.showinfo("Success", "Payment saved")
         self.load_ledger()
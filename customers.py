@@ -1,6 +1,9 @@
 import json
 import os
 from utils import app_dir
+import data_cache
+import durable_io
+import sqlite_store
 
 BASE_DIR = app_dir()
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -8,37 +11,61 @@ CUSTOMER_FILE = os.path.join(DATA_DIR, "customers.json")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
-def load_customers():
+def _read_customers():
     if not os.path.exists(CUSTOMER_FILE):
         return {}
     with open(CUSTOMER_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def load_customers():
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_customers()
+    return data_cache.load(CUSTOMER_FILE, _read_customers)
+
+
 def save_customers(data):
-    with open(CUSTOMER_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    import customer_index
+
+    if sqlite_store.is_enabled():
+        sqlite_store.save_customers(data)
+    else:
+        durable_io.write_json(CUSTOMER_FILE, data, indent=4)
+        data_cache.store(CUSTOMER_FILE, data)
+    durable_io.after_commit(customer_index.invalidate)
 
 
 def save_customer(name, phone, address):
+    import customer_index
+
     if not phone:
         return
 
-    data = load_customers()
-    data[phone] = {
+    rec = {
         "name": name,
         "phone": phone,
         "address": address
     }
-    save_customers(data)
+    if sqlite_store.is_enabled():
+        sqlite_store.put_customer(phone, rec)
+    else:
+        data = load_customers()
+        data[phone] = rec
+        durable_io.write_json(CUSTOMER_FILE, data, indent=4)
+        data_cache.store(CUSTOMER_FILE, data)
+    # The autocomplete index is patched in place once the write is committed.
+    durable_io.after_commit(lambda: customer_index.record_saved(rec))
 
 
 def get_customer_by_phone(phone):
+    if sqlite_store.is_enabled():
+        return sqlite_store.get_customer_by_phone(phone)
     return load_customers().get(phone)
 
 
 def get_customer_by_name(name):
-    for c in load_customers().values():
-        if c["name"].lower() == name.lower():
-            return c
-    return None
+    import customer_index
+
+    if sqlite_store.is_enabled():
+        return sqlite_store.get_customer_by_name(name)
+    return customer_index.get_customer_index().find_by_name(name)
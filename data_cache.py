@@ -0,0 +1,191 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+# In-process cache of parsed data files shared by every screen.
+#
+# Entries are keyed by the file path(s) they were parsed from and are
+# revalidated on each access against (size, mtime_ns) of those files, the
+# same idea as data_consistency._file_signature. The app's own writers call
+# store()/refresh() right after writing so the next read is a cache hit,
+# while edits made outside the app (restore, another process) still force a
+# re-parse.
+#
+# load() hands out a shallow copy of the top-level list/dict, so callers can
+# append, sort or pop freely; records inside are shared and must only be
+# mutated when the caller saves them back.
+#
+# Inside a durable_io group commit the writing thread caches staged values
+# before they reach disk. Entries it stores, refreshes or peeks (to patch in
+# place) while staging stay private to it until the commit: other threads,
+# such as ui_tasks workers, skip them and parse the committed files, and
+# only wait while the staged files are being put in place. That step takes
+# no module locks, so a reader holding one cannot deadlock against it.
+
+_lock = threading.RLock()
+# key -> (signature, value, owner); owner is the ident of the staging thread
+# the entry is private to, or None.
+_entries: Dict[Tuple[str, ...], Tuple[tuple, object, Optional[int]]] = {}
+_staging = threading.local()
+_applied = threading.Condition(threading.Lock())
+_applier: Optional[int] = None
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (int(stat.st_size), int(stat.st_mtime_ns))
+
+
+def _key(paths) -> Tuple[str, ...]:
+    if isinstance(paths, str):
+        return (os.path.abspath(paths),)
+    return tuple(os.path.abspath(p) for p in paths)
+
+
+def _signature(key: Tuple[str, ...]) -> tuple:
+    return tuple(file_signature(p) for p in key)
+
+
+def _owner() -> Optional[int]:
+    return threading.get_ident() if getattr(_staging, "active", False) else None
+
+
+def _visible(entry) -> bool:
+    return entry[2] is None or entry[2] == threading.get_ident()
+
+
+def _wait_applied():
+    me = threading.get_ident()
+    with _applied:
+        while _applier is not None and _applier != me:
+            _applied.wait()
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def load(paths, loader: Callable[[], object]):
+    """Parsed contents of paths, re-running loader only when a file changed."""
+    key = _key(paths)
+    _wait_applied()
+    with _lock:
+        sig = _signature(key)
+        entry = _entries.get(key)
+        if entry is not None and _visible(entry) and entry[0] == sig:
+            return _copy(entry[1])
+
+    # Signature is taken before parsing: a write racing the parse leaves a
+    # stale signature behind and the next load simply re-reads.
+    value = loader()
+    with _lock:
+        current = _entries.get(key)
+        # Another thread's staged value is kept; this caller gets the files.
+        if current is None or _visible(current):
+            _entries[key] = (sig, value, None)
+    return _copy(value)
+
+
+def peek(paths):
+    """Cached value (not a copy) if it is still current, else None. Never loads."""
+    key = _key(paths)
+    _wait_applied()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or not _visible(entry) or entry[0] != _signature(key):
+            return None
+        # A staging caller may patch it in place for a staged write.
+        owner = _owner()
+        if owner is not None:
+            _entries[key] = (entry[0], entry[1], owner)
+        return entry[1]
+
+
+def store(paths, value):
+    """Record value as the current contents of paths right after writing them."""
+    key = _key(paths)
+    with _lock:
+        current = _entries.get(key)
+        if current is None or _visible(current):
+            _entries[key] = (_signature(key), _copy(value), _owner())
+
+
+def refresh(paths):
+    """Re-sign an entry whose cached value was updated in place alongside a write."""
+    key = _key(paths)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and _visible(entry):
+            _entries[key] = (_signature(key), entry[1], _owner())
+
+
+def refresh_touching(paths: Iterable[str]):
+    """
+    After a commit: refresh() this thread's entries that include any of
+    paths and drop everyone else's, which predate the new files.
+    """
+    me = threading.get_ident()
+    targets = set(_key(paths))
+    with _lock:
+        for key, entry in list(_entries.items()):
+            if not targets.intersection(key):
+                continue
+            if entry[2] == me:
+                _entries[key] = (_signature(key), entry[1], me)
+            else:
+                _entries.pop(key, None)
+
+
+# -------------------------------
+# Group commit hooks (durable_io)
+# -------------------------------
+def begin_staging():
+    _staging.active = True
+
+
+def end_staging(discard: bool = False):
+    """Share this thread's private entries again, or drop them on rollback."""
+    me = threading.get_ident()
+    _staging.active = False
+    with _lock:
+        for key, entry in list(_entries.items()):
+            if entry[2] != me:
+                continue
+            if discard:
+                _entries.pop(key, None)
+            else:
+                _entries[key] = (entry[0], entry[1], None)
+
+
+@contextmanager
+def applying():
+    """Held while staged files are put in place; other threads' reads wait."""
+    global _applier
+    with _applied:
+        _applier = threading.get_ident()
+    try:
+        yield
+    finally:
+        with _applied:
+            _applier = None
+            _applied.notify_all()
+
+
+def invalidate(paths: Optional[Iterable[str]] = None):
+    """Drop cached entries touching any of paths (everything if None)."""
+    with _lock:
+        if paths is None:
+            _entries.clear()
+            return
+        targets = set(_key(paths))
+        for key in [k for k in _entries if targets.intersection(k)]:
+            _entries.pop(key, None)
@@ -4,6 +4,14 @@ import re
 from typing import Dict, List, Tuple
 
 from utils import app_dir
+import data_cache
+import durable_io
+from counters import id_number
+from journal_store import journal_path_for
+from inventory import load_inventory, save_inventory
+from purchase import PURCHASE_STORE, load_purchases, save_purchases, put_purchase
+import sqlite_store
+from sales import SALES_STORE, load_sales, save_sales, put_sale
 
 
 BASE_DIR = app_dir()
@@ -12,6 +20,9 @@ PURCHASE_FILE = os.path.join(DATA_DIR, "purchase.json")
 SALES_FILE = os.path.join(DATA_DIR, "sales.json")
 INVENTORY_FILE = os.path.join(DATA_DIR, "inventory.json")
 STATE_FILE = os.path.join(DATA_DIR, ".consistency_state.json")
+CHECKPOINT_VERSION = 1
+PURCHASE_JOURNAL_FILE = journal_path_for(PURCHASE_FILE)
+SALES_JOURNAL_FILE = journal_path_for(SALES_FILE)
 
 
 def _load_json(path, default):
@@ -24,9 +35,16 @@ def _load_json(path, default):
         return default
 
 
+def _load_records(loader):
+    try:
+        return loader()
+    except Exception:
+        return []
+
+
 def _save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    durable_io.write_json(path, data, indent=4)
+    data_cache.store(path, data)
 
 
 def _to_float(value):
@@ -40,21 +58,24 @@ def _normalize(name: str) -> str:
     return re.sub(r"[^a-z0-9]+", "", str(name or "").strip().lower())
 
 
-def _canonical_name(normalized: str, existing_inventory: Dict, name_map: Dict[str, str], fallback: str) -> str:
+def _inventory_name_index(inventory: Dict) -> Dict[str, str]:
+    # normalized name -> first inventory key with that normalization.
+    index: Dict[str, str] = {}
+    for inv_name in inventory.keys():
+        index.setdefault(_normalize(inv_name), inv_name)
+    return index
+
+
+def _canonical_name(normalized: str, inventory_index: Dict[str, str], name_map: Dict[str, str], fallback: str) -> str:
     if normalized in name_map:
         return name_map[normalized]
 
-    for inv_name in existing_inventory.keys():
-        if _normalize(inv_name) == normalized:
-            name_map[normalized] = inv_name
-            return inv_name
-
-    canonical = str(fallback or "").strip() or normalized
+    canonical = inventory_index.get(normalized) or str(fallback or "").strip() or normalized
     name_map[normalized] = canonical
     return canonical
 
 
-def _sanitize_purchase_records(purchases: List[dict], existing_inventory: Dict, name_map: Dict[str, str]):
+def _sanitize_purchase_records(purchases: List[dict], inventory_index: Dict[str, str], name_map: Dict[str, str]):
     changed = False
 
     for p in purchases:
@@ -81,7 +102,7 @@ def _sanitize_purchase_records(purchases: List[dict], existing_inventory: Dict,
             if not n:
                 continue
 
-            canonical = _canonical_name(n, existing_inventory, name_map, raw_name)
+            canonical = _canonical_name(n, inventory_index, name_map, raw_name)
             if item.get("item") != canonical:
                 item["item"] = canonical
                 changed = True
@@ -117,7 +138,7 @@ def _sanitize_purchase_records(purchases: List[dict], existing_inventory: Dict,
     return changed
 
 
-def _sanitize_sales_records(sales: List[dict], existing_inventory: Dict, name_map: Dict[str, str]):
+def _sanitize_sales_records(sales: List[dict], inventory_index: Dict[str, str], name_map: Dict[str, str]):
     changed = False
 
     for s in sales:
@@ -128,7 +149,7 @@ def _sanitize_sales_records(sales: List[dict], existing_inventory: Dict, name_ma
             if not n:
                 continue
 
-            canonical = _canonical_name(n, existing_inventory, name_map, raw_name)
+            canonical = _canonical_name(n, inventory_index, name_map, raw_name)
             if item.get("item") != canonical:
                 item["item"] = canonical
                 changed = True
@@ -161,9 +182,18 @@ def _sanitize_sales_records(sales: List[dict], existing_inventory: Dict, name_ma
     return changed
 
 
-def _rebuild_inventory(purchases: List[dict], sales: List[dict], existing_inventory: Dict, name_map: Dict[str, str]):
-    qty_map: Dict[str, float] = {}
-    rate_map: Dict[str, float] = {}
+def _fold_history(
+    purchases: List[dict],
+    sales: List[dict],
+    inventory_index: Dict[str, str],
+    name_map: Dict[str, str],
+    totals: Dict[str, Dict[str, float]],
+):
+    """
+    Add purchase qty and subtract non-cancelled sale qty into totals
+    ({canonical: {"qty", "rate"}}). Returns the canonical names touched.
+    """
+    touched = set()
 
     for p in purchases:
         for item in p.get("items", []):
@@ -171,26 +201,43 @@ def _rebuild_inventory(purchases: List[dict], sales: List[dict], existing_invent
             n = _normalize(item_name)
             if not n:
                 continue
-            canonical = _canonical_name(n, existing_inventory, name_map, item_name)
-            qty_map[canonical] = qty_map.get(canonical, 0.0) + _to_float(item.get("qty", 0))
-            rate_map[canonical] = _to_float(item.get("rate", 0))
+            canonical = _canonical_name(n, inventory_index, name_map, item_name)
+            rec = totals.setdefault(canonical, {"qty": 0.0})
+            rec["qty"] = rec["qty"] + _to_float(item.get("qty", 0))
+            rec["rate"] = _to_float(item.get("rate", 0))
+            touched.add(canonical)
 
     for s in sales:
         if s.get("cancelled"):
             continue
-        for item in s.get("items", []):
-            item_name = item.get("item") or item.get("name") or ""
-            n = _normalize(item_name)
-            if not n:
-                continue
-            canonical = _canonical_name(n, existing_inventory, name_map, item_name)
-            qty_map[canonical] = qty_map.get(canonical, 0.0) - _to_float(item.get("qty", 0))
-            rate_map.setdefault(canonical, _to_float(item.get("rate", 0)))
+        touched.update(_fold_sale(s, inventory_index, name_map, totals, sign=-1.0))
+
+    return touched
+
+
+def _fold_sale(sale: dict, inventory_index: Dict[str, str], name_map: Dict[str, str], totals: Dict, sign: float):
+    touched = set()
+    for item in sale.get("items", []):
+        item_name = item.get("item") or item.get("name") or ""
+        n = _normalize(item_name)
+        if not n:
+            continue
+        canonical = _canonical_name(n, inventory_index, name_map, item_name)
+        rec = totals.setdefault(canonical, {"qty": 0.0})
+        rec["qty"] = rec["qty"] + sign * _to_float(item.get("qty", 0))
+        rec.setdefault("rate", _to_float(item.get("rate", 0)))
+        touched.add(canonical)
+    return touched
+
+
+def _rebuild_inventory(totals: Dict[str, Dict[str, float]], existing_inventory: Dict, inventory_index: Dict[str, str], name_map: Dict[str, str]):
+    qty_map: Dict[str, float] = {name: rec.get("qty", 0.0) for name, rec in totals.items()}
+    rate_map: Dict[str, float] = {name: rec.get("rate", 0.0) for name, rec in totals.items()}
 
     # Preserve inventory-only items that have no matching purchase/sale history.
     for inv_name, data in existing_inventory.items():
         n = _normalize(inv_name)
-        canonical = _canonical_name(n, existing_inventory, name_map, inv_name)
+        canonical = _canonical_name(n, inventory_index, name_map, inv_name)
         if canonical not in qty_map:
             qty_map[canonical] = _to_float(data.get("stock", 0))
             rate_map[canonical] = _to_float(data.get("rate", 0))
@@ -205,10 +252,10 @@ def _rebuild_inventory(purchases: List[dict], sales: List[dict], existing_invent
     return rebuilt
 
 
-def ensure_data_consistency() -> Dict[str, int]:
-    purchases = _load_json(PURCHASE_FILE, [])
-    sales = _load_json(SALES_FILE, [])
-    inventory = _load_json(INVENTORY_FILE, {})
+def _load_all():
+    purchases = _load_records(load_purchases)
+    sales = _load_records(load_sales)
+    inventory = _load_records(load_inventory)
 
     if not isinstance(purchases, list):
         purchases = []
@@ -216,19 +263,60 @@ def ensure_data_consistency() -> Dict[str, int]:
         sales = []
     if not isinstance(inventory, dict):
         inventory = {}
+    return purchases, sales, inventory
+
+
+def _make_checkpoint(purchases: List[dict], sales: List[dict], totals: Dict, name_map: Dict[str, str]) -> Dict:
+    return {
+        "version": CHECKPOINT_VERSION,
+        "purchase_count": len(purchases),
+        "last_purchase_id": str(purchases[-1].get("purchase_id", "")) if purchases else "",
+        "max_purchase_no": max([id_number(p.get("purchase_id"), "P") for p in purchases] or [0]),
+        "sales_count": len(sales),
+        "last_invoice_no": str(sales[-1].get("invoice_no", "")) if sales else "",
+        "max_invoice_no": max([id_number(s.get("invoice_no"), "INV") for s in sales] or [0]),
+        "cancelled": sorted(str(s.get("invoice_no", "")) for s in sales if s.get("cancelled")),
+        "totals": totals,
+        "names": name_map,
+    }
+
+
+def _fix_inventory(inventory: Dict, touched, totals: Dict) -> bool:
+    changed = False
+    for name in touched:
+        rec = totals.get(name, {})
+        want = {
+            "stock": round(_to_float(rec.get("qty", 0)), 2),
+            "rate": round(_to_float(rec.get("rate", 0)), 2),
+        }
+        if inventory.get(name) != want:
+            inventory[name] = want
+            changed = True
+    return changed
+
+
+def ensure_data_consistency() -> Dict[str, int]:
+    """
+    Deep verify: re-sanitize every purchase and sale and rebuild the whole
+    inventory from history. Also resets the incremental checkpoint.
+    """
+    purchases, sales, inventory = _load_all()
 
     name_map: Dict[str, str] = {}
-    purchase_changed = _sanitize_purchase_records(purchases, inventory, name_map)
-    sales_changed = _sanitize_sales_records(sales, inventory, name_map)
-    rebuilt_inventory = _rebuild_inventory(purchases, sales, inventory, name_map)
+    inventory_index = _inventory_name_index(inventory)
+    purchase_changed = _sanitize_purchase_records(purchases, inventory_index, name_map)
+    sales_changed = _sanitize_sales_records(sales, inventory_index, name_map)
+    totals: Dict[str, Dict[str, float]] = {}
+    _fold_history(purchases, sales, inventory_index, name_map, totals)
+    rebuilt_inventory = _rebuild_inventory(totals, inventory, inventory_index, name_map)
     inventory_changed = rebuilt_inventory != inventory
 
     if purchase_changed:
-        _save_json(PURCHASE_FILE, purchases)
+        save_purchases(purchases)
     if sales_changed:
-        _save_json(SALES_FILE, sales)
+        save_sales(sales)
     if inventory_changed:
-        _save_json(INVENTORY_FILE, rebuilt_inventory)
+        save_inventory(rebuilt_inventory)
 
     return {
         "purchase_records": len(purchases),
@@ -237,6 +325,210 @@ def ensure_data_consistency() -> Dict[str, int]:
         "purchase_changed": int(purchase_changed),
         "sales_changed": int(sales_changed),
         "inventory_changed": int(inventory_changed),
+        "mode": "full",
+        "checkpoint": _make_checkpoint(purchases, sales, totals, name_map),
+    }
+
+
+def _checkpoint_matches(rows: List[dict], count, last_key, key_field) -> bool:
+    if not isinstance(count, int) or count < 0 or count > len(rows):
+        return False
+    if count == 0:
+        return not last_key
+    return str(rows[count - 1].get(key_field, "")) == str(last_key or "")
+
+
+def _save_sanitized(rows: List[dict], changed: List[dict], key_field: str, put, save_all):
+    if not changed:
+        return
+    if all(r.get(key_field) for r in changed):
+        for r in changed:
+            put(r)
+    else:
+        save_all(rows)
+
+
+def ensure_data_consistency_incremental(checkpoint: Dict) -> Dict[str, int]:
+    """
+    Fold only purchases/sales recorded after checkpoint into its per-item
+    running totals and fix inventory for the items they touch. Falls back
+    to the full rebuild when history no longer matches the checkpoint
+    (records removed or rewritten, restored backup, unknown version).
+    """
+    purchases, sales, inventory = _load_all()
+
+    if (
+        not isinstance(checkpoint, dict)
+        or checkpoint.get("version") != CHECKPOINT_VERSION
+        or not _checkpoint_matches(purchases, checkpoint.get("purchase_count"), checkpoint.get("last_purchase_id"), "purchase_id")
+        or not _checkpoint_matches(sales, checkpoint.get("sales_count"), checkpoint.get("last_invoice_no"), "invoice_no")
+    ):
+        return ensure_data_consistency()
+
+    totals: Dict[str, Dict[str, float]] = checkpoint.get("totals") or {}
+    name_map: Dict[str, str] = checkpoint.get("names") or {}
+    cancelled = set(checkpoint.get("cancelled") or [])
+    inventory_index = _inventory_name_index(inventory)
+
+    new_purchases = purchases[checkpoint["purchase_count"]:]
+    new_sales = sales[checkpoint["sales_count"]:]
+
+    changed_purchases = [p for p in new_purchases if _sanitize_purchase_records([p], inventory_index, name_map)]
+    changed_sales = [s for s in new_sales if _sanitize_sales_records([s], inventory_index, name_map)]
+
+    touched = _fold_history(new_purchases, new_sales, inventory_index, name_map, totals)
+
+    # Invoices cancelled since the checkpoint give their stock back.
+    for s in sales[:checkpoint["sales_count"]]:
+        if s.get("cancelled") and str(s.get("invoice_no", "")) not in cancelled:
+            touched.update(_fold_sale(s, inventory_index, name_map, totals, sign=1.0))
+
+    inventory_changed = _fix_inventory(inventory, touched, totals)
+
+    _save_sanitized(purchases, changed_purchases, "purchase_id", put_purchase, save_purchases)
+    _save_sanitized(sales, changed_sales, "invoice_no", put_sale, save_sales)
+    if inventory_changed:
+        save_inventory(inventory, items=touched)
+
+    return {
+        "purchase_records": len(new_purchases),
+        "sales_records": len(new_sales),
+        "inventory_items": len(touched),
+        "purchase_changed": int(bool(changed_purchases)),
+        "sales_changed": int(bool(changed_sales)),
+        "inventory_changed": int(inventory_changed),
+        "mode": "incremental",
+        "checkpoint": _make_checkpoint(purchases, sales, totals, name_map),
+    }
+
+
+# -------------------------------
+# Tail: only records written since the checkpoint
+# -------------------------------
+def _tail_marks() -> Dict:
+    """Where history ends now; saved with the checkpoint for _read_tail()."""
+    if sqlite_store.is_enabled():
+        return {"sqlite": sqlite_store.history_mark()}
+    return {"purchases": PURCHASE_STORE.tail_mark(), "sales": SALES_STORE.tail_mark()}
+
+
+def _split_tail(rows: List[dict], key_field: str, prefix: str, max_no):
+    """
+    Latest row per key, split into records created after the checkpoint and
+    updates of older ones. Ids come from counters and only grow, so a number
+    above the checkpoint's highest is a new record. (None, None) if an id
+    has no number to compare.
+    """
+    if not isinstance(max_no, int):
+        return None, None
+    latest: Dict[str, dict] = {}
+    for row in rows:
+        latest[str(row.get(key_field, ""))] = row
+    new, updated = [], []
+    for key, row in latest.items():
+        number = id_number(key, prefix)
+        if not number:
+            return None, None
+        (new if number > max_no else updated).append(row)
+    return new, updated
+
+
+def _read_tail(checkpoint: Dict):
+    """
+    (new purchases, new sales, updated older sales) since checkpoint without
+    loading the whole history, or None when only a full pass can tell.
+    """
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != CHECKPOINT_VERSION:
+        return None
+    marks = checkpoint.get("tail")
+    if not isinstance(marks, dict):
+        return None
+
+    if sqlite_store.is_enabled():
+        added = sqlite_store.history_since(marks.get("sqlite"))
+        if added is None:
+            return None
+        new_sales = added["sales"]
+        known = set(checkpoint.get("cancelled") or []) | {str(s.get("invoice_no", "")) for s in new_sales}
+        updated = [sqlite_store.get_sale(no) for no in sqlite_store.cancelled_invoice_numbers() if no not in known]
+        return added["purchases"], new_sales, [s for s in updated if s]
+
+    purchase_rows = PURCHASE_STORE.read_tail(marks.get("purchases"))
+    sales_rows = SALES_STORE.read_tail(marks.get("sales"))
+    if purchase_rows is None or sales_rows is None:
+        return None
+    new_purchases, _updated = _split_tail(purchase_rows, "purchase_id", "P", checkpoint.get("max_purchase_no"))
+    new_sales, updated_sales = _split_tail(sales_rows, "invoice_no", "INV", checkpoint.get("max_invoice_no"))
+    if new_purchases is None or new_sales is None:
+        return None
+    return new_purchases, new_sales, updated_sales
+
+
+def ensure_data_consistency_tail(checkpoint: Dict):
+    """
+    Startup fast path: fold only the purchases/sales written since
+    checkpoint, read from the end of the journals (or by seq in SQLite
+    mode), into its running totals. Returns None when the tail cannot be
+    read on its own (compacted journal, restored data...).
+    """
+    tail = _read_tail(checkpoint)
+    if tail is None:
+        return None
+    new_purchases, new_sales, updated_sales = tail
+
+    inventory = _load_records(load_inventory)
+    if not isinstance(inventory, dict):
+        inventory = {}
+    totals: Dict[str, Dict[str, float]] = checkpoint.get("totals") or {}
+    name_map: Dict[str, str] = checkpoint.get("names") or {}
+    cancelled = set(checkpoint.get("cancelled") or [])
+    inventory_index = _inventory_name_index(inventory)
+
+    changed_purchases = [p for p in new_purchases if _sanitize_purchase_records([p], inventory_index, name_map)]
+    changed_sales = [s for s in new_sales if _sanitize_sales_records([s], inventory_index, name_map)]
+
+    touched = _fold_history(new_purchases, new_sales, inventory_index, name_map, totals)
+    for s in updated_sales:
+        if s.get("cancelled") and str(s.get("invoice_no", "")) not in cancelled:
+            touched.update(_fold_sale(s, inventory_index, name_map, totals, sign=1.0))
+
+    inventory_changed = _fix_inventory(inventory, touched, totals)
+
+    for p in changed_purchases:
+        put_purchase(p)
+    for s in changed_sales:
+        put_sale(s)
+    if inventory_changed:
+        save_inventory(inventory, items=touched)
+
+    checkpoint = dict(checkpoint)
+    if new_purchases:
+        checkpoint["purchase_count"] += len(new_purchases)
+        checkpoint["last_purchase_id"] = str(new_purchases[-1].get("purchase_id", ""))
+        checkpoint["max_purchase_no"] = max(
+            [checkpoint.get("max_purchase_no", 0)] + [id_number(p.get("purchase_id"), "P") for p in new_purchases]
+        )
+    if new_sales:
+        checkpoint["sales_count"] += len(new_sales)
+        checkpoint["last_invoice_no"] = str(new_sales[-1].get("invoice_no", ""))
+        checkpoint["max_invoice_no"] = max(
+            [checkpoint.get("max_invoice_no", 0)] + [id_number(s.get("invoice_no"), "INV") for s in new_sales]
+        )
+    checkpoint["cancelled"] = sorted(
+        cancelled | {str(s.get("invoice_no", "")) for s in new_sales + updated_sales if s.get("cancelled")}
+    )
+    checkpoint["totals"] = totals
+    checkpoint["names"] = name_map
+
+    return {
+        "purchase_records": len(new_purchases),
+        "sales_records": len(new_sales),
+        "inventory_items": len(touched),
+        "purchase_changed": int(bool(changed_purchases)),
+        "sales_changed": int(bool(changed_sales)),
+        "inventory_changed": int(inventory_changed),
+        "mode": "tail",
+        "checkpoint": checkpoint,
     }
 
 
@@ -257,15 +549,25 @@ def _file_signature(path: str) -> Dict[str, float]:
 def _current_signature() -> Dict[str, Dict[str, float]]:
     return {
         "purchase": _file_signature(PURCHASE_FILE),
+        "purchase_journal": _file_signature(PURCHASE_JOURNAL_FILE),
         "sales": _file_signature(SALES_FILE),
+        "sales_journal": _file_signature(SALES_JOURNAL_FILE),
         "inventory": _file_signature(INVENTORY_FILE),
+        "sqlite_db": _file_signature(sqlite_store.DB_FILE),
+        "sqlite_wal": _file_signature(sqlite_store.DB_FILE + "-wal"),
     }
 
 
-def ensure_data_consistency_if_needed() -> Dict[str, int]:
-    current = _current_signature()
+def ensure_data_consistency_if_needed(deep: bool = False) -> Dict[str, int]:
+    """
+    Startup check. Skips when no data file changed since the last run,
+    otherwise folds in only the records written since (deep=True forces
+    the full rebuild; see scripts/check_data_consistency.py).
+    """
     state = _load_json(STATE_FILE, {})
-    if isinstance(state, dict) and state.get("signature") == current:
+    if not isinstance(state, dict):
+        state = {}
+    if not deep and state.get("signature") == _current_signature():
         return {
             "purchase_records": 0,
             "sales_records": 0,
@@ -276,7 +578,19 @@ def ensure_data_consistency_if_needed() -> Dict[str, int]:
             "skipped": 1,
         }
 
-    result = ensure_data_consistency()
-    _save_json(STATE_FILE, {"signature": current})
+    # Purchases, sales and inventory fixes land together with one flush.
+    with durable_io.group_commit():
+        if deep:
+            result = ensure_data_consistency()
+        else:
+            result = ensure_data_consistency_tail(state.get("checkpoint"))
+            if result is None:
+                result = ensure_data_consistency_incremental(state.get("checkpoint"))
+
+    # Signature and tail marks are taken after our own fixes so they do not
+    # trigger another pass.
+    checkpoint = result.pop("checkpoint")
+    checkpoint["tail"] = _tail_marks()
+    _save_json(STATE_FILE, {"signature": _current_signature(), "checkpoint": checkpoint})
     result["skipped"] = 0
     return result
@@ -2,11 +2,12 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 
-from sales import load_sales, save_sales
-from audit_log import write_audit_log
-from cash_ledger import add_cash_entry
+from sales import get_due_sales, receive_customer_payment
 from date_picker import open_date_picker
+from autocomplete import suggest, debounce
 from ui_theme import compact_form_grid
+from virtual_tree import VirtualTree
+from ui_tasks import TaskStatus
 
 
 class DueReportUI(ttk.Frame):
@@ -14,7 +15,6 @@ class DueReportUI(ttk.Frame):
         super().__init__(parent)
         self.pack(fill="both", expand=True)
 
-        self.all_sales = []
         self.filtered_rows = []
         self.tree_invoice_map = {}
         self.selected_customer = ""
@@ -46,7 +46,7 @@ class DueReportUI(ttk.Frame):
         ttk.Label(row1, text="Customer Name").pack(side="left", padx=(0, 3))
         self.name_e = ttk.Combobox(row1, state="normal", width=24)
         self.name_e.pack(side="left", padx=(0, 8))
-        self.name_e.bind("<KeyRelease>", self.on_customer_search)
+        self.name_e.bind("<KeyRelease>", debounce(self, self.on_customer_search))
         self.name_e.bind("<FocusOut>", self.on_name_focus_out)
         self.name_e.bind("<Down>", self.on_name_down_key)
 
@@ -55,14 +55,14 @@ class DueReportUI(ttk.Frame):
         self.phone_e.pack(side="left", padx=(0, 8))
         phone_vcmd = (self.register(self._validate_phone_input), "%P")
         self.phone_e.configure(validate="key", validatecommand=phone_vcmd)
-        self.phone_e.bind("<KeyRelease>", self._on_phone_change)
+        self.phone_e.bind("<KeyRelease>", debounce(self, self._on_phone_change))
         self.phone_e.bind("<FocusOut>", self.on_phone_focus_out)
         self.phone_e.bind("<Down>", self.on_phone_down_key)
 
         ttk.Label(row1, text="Item").pack(side="left", padx=(0, 3))
         self.item_e = ttk.Combobox(row1, state="normal", width=20)
         self.item_e.pack(side="left", padx=(0, 8))
-        self.item_e.bind("<KeyRelease>", self.on_item_search)
+        self.item_e.bind("<KeyRelease>", debounce(self, self.on_item_search))
         self.item_e.bind("<FocusOut>", self.on_item_focus_out)
         self.item_e.bind("<Down>", self.on_item_down_key)
 
@@ -116,6 +116,7 @@ class DueReportUI(ttk.Frame):
         xsb.grid(row=1, column=0, sticky="ew")
         self.tree.bind("<<TreeviewSelect>>", self.on_select_row)
         self.tree.bind("<Double-1>", self.on_row_double_click)
+        self.view = VirtualTree(self.tree, ysb)
         self._setup_sorting()
 
         bottom = ttk.Frame(self)
@@ -124,6 +125,8 @@ class DueReportUI(ttk.Frame):
         btns.pack(side="left")
         ttk.Button(btns, text="Export Excel", width=15, command=self.export_excel).pack(side="left", padx=5)
         ttk.Button(btns, text="Export PDF", width=15, command=self.export_pdf).pack(side="left", padx=5)
+        self.tasks = TaskStatus(bottom)
+        self.tasks.pack(side="left", padx=(10, 0))
 
         right_info = ttk.Frame(bottom)
         right_info.pack(side="right")
@@ -345,7 +348,7 @@ class DueReportUI(ttk.Frame):
         if not typed:
             self._hide_name_suggestions()
             return
-        matches = [v for v in self._customer_values_all if typed in v.lower()]
+        matches = suggest(self._customer_values_all, typed)
         self._show_name_suggestions(matches if matches else self._customer_values_all)
 
     def on_phone_search(self, event=None):
@@ -355,7 +358,7 @@ class DueReportUI(ttk.Frame):
         if not typed:
             self._hide_phone_suggestions()
             return
-        matches = [v for v in self._phone_values_all if typed in v]
+        matches = suggest(self._phone_values_all, typed)
         self._show_phone_suggestions(matches if matches else self._phone_values_all)
 
     def on_item_search(self, event=None):
@@ -365,7 +368,7 @@ class DueReportUI(ttk.Frame):
         if not typed:
             self._hide_item_suggestions()
             return
-        matches = [v for v in self._item_values_all if typed in v.lower()]
+        matches = suggest(self._item_values_all, typed)
         self._show_item_suggestions(matches if matches else self._item_values_all)
 
     def parse_date(self, value):
@@ -386,24 +389,28 @@ class DueReportUI(ttk.Frame):
         return dt.strftime("%d-%m-%Y %H:%M:%S")
 
     def load_due_data(self):
-        self.tree.delete(*self.tree.get_children())
-        self.filtered_rows = []
-        self.tree_invoice_map = {}
         self.selected_customer = ""
         self.selected_phone = ""
         self.selected_customer_var.set("Selected Customer: -")
 
-        self.all_sales = load_sales()
         name = self.name_e.get().strip().lower()
         phone = self.phone_e.get().strip()
         item = self.item_e.get().strip().lower()
         from_date = self.parse_date(self.from_date_e.get().strip())
         to_date = self.parse_date(self.to_date_e.get().strip())
+        self.tasks.run(
+            lambda task: self._read_due_data(task, name, phone, item, from_date, to_date),
+            on_done=self._show_due_data,
+            text="Loading dues...",
+        )
 
+    def _read_due_data(self, task, name, phone, item, from_date, to_date):
+        # Only open invoices; suggestions list the customers and items that have a due.
+        all_sales = get_due_sales()
         customer_values = set()
         phone_values = set()
         item_values = set()
-        for s in self.all_sales:
+        for s in all_sales:
             nm = str(s.get("customer_name", "")).strip()
             ph = str(s.get("phone", "")).strip()
             if nm:
@@ -414,18 +421,12 @@ class DueReportUI(ttk.Frame):
                 iname = str(it.get("item") or it.get("name") or "").strip()
                 if iname:
                     item_values.add(iname)
-        self._customer_values_all = sorted(customer_values, key=str.lower)
-        self._phone_values_all = sorted(phone_values)
-        self._item_values_all = sorted(item_values, key=str.lower)
-        self.name_e["values"] = self._customer_values_all
-        self.phone_e["values"] = self._phone_values_all
-        self.item_e["values"] = self._item_values_all
+        task.check()
 
+        filtered_rows = []
         total_due = 0.0
-        for s in self.all_sales:
+        for s in all_sales:
             due = float(s.get("due", 0) or 0)
-            if due <= 0:
-                continue
             sale_dt = self.parse_date(s.get("date"))
             if from_date and (not sale_dt or sale_dt < from_date):
                 continue
@@ -449,24 +450,39 @@ class DueReportUI(ttk.Frame):
                 f"{float(s.get('paid', s.get('paid_amount', 0)) or 0):.2f}",
                 f"{due:.2f}",
             )
-            self.filtered_rows.append((sale_dt or datetime.min, row, s))
+            filtered_rows.append((sale_dt or datetime.min, row, s))
             total_due += due
 
-        self.filtered_rows.sort(key=lambda x: x[0], reverse=True)
-        for _dt, row, sale in self.filtered_rows:
-            iid = self.tree.insert("", "end", values=row)
-            self.tree_invoice_map[iid] = sale
+        filtered_rows.sort(key=lambda x: x[0], reverse=True)
+        return {
+            "customers": sorted(customer_values, key=str.lower),
+            "phones": sorted(phone_values),
+            "items": sorted(item_values, key=str.lower),
+            "rows": filtered_rows,
+            "total_due": total_due,
+        }
+
+    def _show_due_data(self, data):
+        self._customer_values_all = data["customers"]
+        self._phone_values_all = data["phones"]
+        self._item_values_all = data["items"]
+        self.name_e["values"] = self._customer_values_all
+        self.phone_e["values"] = self._phone_values_all
+        self.item_e["values"] = self._item_values_all
 
-        self.total_due_var.set(f"Total Due: Rs{total_due:,.2f}")
+        self.filtered_rows = data["rows"]
+        self.tree_invoice_map = {str(idx): sale for idx, (_dt, _row, sale) in enumerate(self.filtered_rows)}
+        self.view.set_rows(row for _dt, row, _sale in self.filtered_rows)
+        self.total_due_var.set(f"Total Due: Rs{data['total_due']:,.2f}")
 
     def on_select_row(self, _event=None):
-        sel = self.tree.selection()
+        sel = self.view.selection()
         if not sel:
             self.selected_customer = ""
             self.selected_phone = ""
             self.selected_customer_var.set("Selected Customer: -")
             return
-        vals = self.tree.item(sel[0], "values")
+        vals = self.view.values(sel[0])
         if not vals:
             return
         self.selected_customer = str(vals[2]).strip()
@@ -487,68 +503,21 @@ class DueReportUI(ttk.Frame):
             return
 
         mode = self.pay_mode_cb.get().strip() or "Cash"
-        sales = load_sales()
-        targets = []
-        for s in sales:
-            due = float(s.get("due", 0) or 0)
-            if due <= 0:
-                continue
-            same_phone = self.selected_phone and str(s.get("phone", "")).strip() == self.selected_phone
-            same_name = str(s.get("customer_name", "")).strip().lower() == self.selected_customer.lower()
-            if same_phone or same_name:
-                targets.append(s)
-
-        if not targets:
-            messagebox.showerror("Error", "No due invoices found for selected customer.")
-            return
-
-        targets.sort(key=lambda x: self.parse_date(x.get("date")) or datetime.min, reverse=True)
-        remaining = round(pay_amount, 2)
-        changed_invoices = []
-
-        for inv in targets:
-            if remaining <= 0:
-                break
-            due_before = float(inv.get("due", 0) or 0)
-            paid_before = float(inv.get("paid", inv.get("paid_amount", 0)) or 0)
-            take = min(remaining, due_before)
-            if take <= 0:
-                continue
-            inv["paid"] = round(paid_before + take, 2)
-            inv["paid_amount"] = inv["paid"]
-            inv["due"] = round(max(due_before - take, 0.0), 2)
-            inv["last_payment_mode"] = mode
-            changed_invoices.append((inv.get("invoice_no", ""), due_before, inv["due"]))
-            remaining = round(remaining - take, 2)
-
-        used_amount = round(pay_amount - remaining, 2)
+        try:
+            used_amount, remaining, _updated = receive_customer_payment(
+                pay_amount,
+                payment_mode=mode,
+                phone=self.selected_phone,
+                customer_name=self.selected_customer,
+            )
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
         if used_amount <= 0:
             messagebox.showinfo("Info", "No due amount available for selected customer.")
             return
 
-        save_sales(sales)
-        write_audit_log(
-            user="admin",
-            module="due_payment",
-            action="receive_customer",
-            reference=self.selected_phone or self.selected_customer,
-            after={
-                "customer_name": self.selected_customer,
-                "phone": self.selected_phone,
-                "payment_mode": mode,
-                "paid_amount": used_amount,
-                "updated_invoices": [x[0] for x in changed_invoices],
-            },
-        )
-
-        if mode == "Cash":
-            add_cash_entry(
-                date=datetime.now().strftime("%Y-%m-%d"),
-                particulars=f"Customer Payment {self.selected_customer}",
-                cash_in=used_amount,
-                reference=self.selected_phone or self.selected_customer,
-            )
-
         msg = f"Payment saved for {self.selected_customer}. Amount adjusted: {used_amount:.2f}"
         if remaining > 0:
             msg += f"\nUnused amount: {remaining:.2f} (no remaining due)."
@@ -559,12 +528,12 @@ class DueReportUI(ttk.Frame):
     def export_excel(self):
         from export_excel import export_due_report_excel
 
-        export_due_report_excel()
+        self.tasks.run(lambda _task: export_due_report_excel(), text="Exporting Excel...")
 
     def export_pdf(self):
         from report_pdf import generate_due_report_pdf
 
-        generate_due_report_pdf()
+        self.tasks.run(lambda _task: generate_due_report_pdf(), text="Creating PDF...")
 
     def _setup_sorting(self):
         for col in self.tree["columns"]:
@@ -581,10 +550,7 @@ class DueReportUI(ttk.Frame):
             except Exception:
                 return (2, text.lower())
 
-        rows = [(self.tree.set(k, col), k) for k in self.tree.get_children("")]
-        rows.sort(key=lambda t: parse_value(t[0]), reverse=reverse)
-        for idx, (_, k) in enumerate(rows):
-            self.tree.move(k, "", idx)
+        self.view.sort(col, key=parse_value, reverse=reverse)
         self.tree.heading(col, command=lambda c=col: self._sort_tree_column(c, not reverse))
 
     def on_row_double_click(self, _event=None):
@@ -0,0 +1,275 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import data_cache
+
+
+# Crash-safe writes for the data/*.json files.
+#
+# write_json() serializes to "<path>.tmp", fsyncs it and os.replace()s it
+# over the target, so a crash leaves either the old file or the new one,
+# never a truncated mix. The directory is fsynced afterwards so the rename
+# itself survives a power cut (skipped where the OS does not support it).
+#
+# Inside group_commit() writes are staged instead: repeated writes of the
+# same file collapse to the last one, journal appends are batched per file,
+# and everything is flushed together on exit with one fsync per file and
+# one per directory. If the block raises, nothing staged reaches disk.
+#
+# group_commit(redo_log=...) additionally writes the whole staged set as
+# one JSON record to redo_log before touching any target, and removes it
+# once every file is in place. recover() replays a record left behind by
+# a crash, so a multi-file change is applied completely or not at all.
+# The record also holds each append target's size before the commit, and
+# replay truncates back to it first, so lines that were already appended
+# (audit segments are plain appends, not upserts) are not written twice.
+
+_lock = threading.RLock()
+_local = threading.local()
+
+
+class _Group:
+    def __init__(self, redo_log: Optional[str] = None, label: str = ""):
+        self.redo_log = redo_log
+        self.label = label
+        self.writes: Dict[str, bytes] = {}
+        self.removes: List[str] = []
+        self.appends: Dict[str, List[str]] = {}
+        self.callbacks: List[Callable[[], None]] = []
+
+    def touched(self) -> List[str]:
+        return list(self.writes) + self.removes + list(self.appends)
+
+
+def _group():
+    return getattr(_local, "group", None)
+
+
+def in_group() -> bool:
+    return _group() is not None
+
+
+def _fsync_dir(path: str):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(path or ".", os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path: str, payload: bytes) -> str:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def _append_now(path: str, lines: List[str]):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _dumps(data, indent) -> bytes:
+    return json.dumps(data, indent=indent).encode("utf-8")
+
+
+# -------------------------------
+# Write
+# -------------------------------
+def write_bytes(path: str, payload: bytes):
+    group = _group()
+    if group is not None:
+        group.writes[os.path.abspath(path)] = payload
+        return
+    with _lock:
+        os.replace(_write_temp(path, payload), path)
+        _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def write_json(path: str, data, indent: int = 4):
+    """Atomically replace path with data serialized as JSON."""
+    write_bytes(path, _dumps(data, indent))
+
+
+def append_lines(path: str, lines: List[str]):
+    """Append text lines (newline added) and fsync them."""
+    if not lines:
+        return
+    group = _group()
+    if group is not None:
+        group.appends.setdefault(os.path.abspath(path), []).extend(lines)
+        return
+    with _lock:
+        _append_now(path, lines)
+
+
+def remove(path: str):
+    """Delete path; inside a group, after staged writes are in place."""
+    group = _group()
+    if group is not None:
+        path = os.path.abspath(path)
+        if path not in group.removes:
+            group.removes.append(path)
+        # Anything staged for it so far is superseded by the delete.
+        group.writes.pop(path, None)
+        group.appends.pop(path, None)
+        return
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def after_commit(callback: Callable[[], None]):
+    """
+    Run callback once staged writes are on disk (immediately outside a
+    group). The same callback registered twice in one group runs once.
+    """
+    group = _group()
+    if group is None:
+        callback()
+    elif callback not in group.callbacks:
+        group.callbacks.append(callback)
+
+
+# -------------------------------
+# Group commit
+# -------------------------------
+def _apply(
+    writes: Dict[str, bytes],
+    removes: List[str],
+    appends: Dict[str, List[str]],
+    sizes: Optional[Dict[str, int]] = None,
+):
+    dirs = set()
+    temps = []
+    for path, payload in writes.items():
+        temps.append((_write_temp(path, payload), path))
+    for tmp_path, path in temps:
+        os.replace(tmp_path, path)
+        dirs.add(os.path.dirname(path))
+
+    # Journal truncation only after the snapshots it was folded into.
+    for path in removes:
+        if os.path.exists(path):
+            os.remove(path)
+        dirs.add(os.path.dirname(path))
+
+    # Appends go last so a snapshot is always in place before the lines
+    # that follow it. On replay, sizes cuts off what the interrupted commit
+    # had already appended.
+    for path, lines in appends.items():
+        if sizes and path in sizes and os.path.exists(path) and os.path.getsize(path) > sizes[path]:
+            with open(path, "r+b") as f:
+                f.truncate(sizes[path])
+        _append_now(path, lines)
+        dirs.add(os.path.dirname(path))
+
+    for d in dirs:
+        _fsync_dir(d)
+
+
+def _write_redo(group: _Group):
+    record = {
+        "label": group.label,
+        "writes": {path: payload.decode("utf-8") for path, payload in group.writes.items()},
+        "removes": group.removes,
+        "appends": group.appends,
+        # Removed files start from nothing when the appends are replayed.
+        "sizes": {
+            path: 0 if path in group.removes or not os.path.exists(path) else os.path.getsize(path)
+            for path in group.appends
+        },
+    }
+    payload = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    os.replace(_write_temp(group.redo_log, payload), group.redo_log)
+    _fsync_dir(os.path.dirname(os.path.abspath(group.redo_log)))
+
+
+def _commit(group: _Group):
+    with _lock, data_cache.applying():
+        if group.redo_log and (group.writes or group.removes or group.appends):
+            _write_redo(group)
+            _apply(group.writes, group.removes, group.appends)
+            os.remove(group.redo_log)
+        else:
+            _apply(group.writes, group.removes, group.appends)
+
+        touched = group.touched()
+        if touched:
+            # Callers stored the staged values in data_cache as they wrote;
+            # re-sign them now that the files match.
+            data_cache.refresh_touching(touched)
+
+    for callback in group.callbacks:
+        callback()
+
+
+def recover(redo_log: str) -> Optional[str]:
+    """
+    Finish a group commit interrupted by a crash. Returns the label of the
+    replayed record, or None if there was nothing to do. A torn record was
+    never committed and is discarded.
+    """
+    with _lock, data_cache.applying():
+        if not os.path.exists(redo_log):
+            return None
+        try:
+            with open(redo_log, "r", encoding="utf-8") as f:
+                record = json.loads(f.read())
+        except ValueError:
+            record = None
+        if isinstance(record, dict):
+            _apply(
+                {path: str(text).encode("utf-8") for path, text in (record.get("writes") or {}).items()},
+                list(record.get("removes") or []),
+                dict(record.get("appends") or {}),
+                {path: int(size) for path, size in (record.get("sizes") or {}).items()},
+            )
+        os.remove(redo_log)
+    data_cache.invalidate()
+    return str(record.get("label", "")) if isinstance(record, dict) else None
+
+
+@contextmanager
+def group_commit(redo_log: Optional[str] = None, label: str = ""):
+    """
+    Stage every write made by this thread until the block exits, then
+    flush them together. Nested blocks join the outermost one.
+    """
+    if in_group():
+        yield _group()
+        return
+
+    group = _Group(redo_log=redo_log, label=label)
+    _local.group = group
+    # Values cached while staging stay private to this thread until commit.
+    data_cache.begin_staging()
+    try:
+        yield group
+    except BaseException:
+        _local.group = None
+        data_cache.end_staging(discard=True)
+        if group.touched():
+            data_cache.invalidate(group.touched())
+        raise
+    _local.group = None
+    try:
+        _commit(group)
+    except BaseException:
+        data_cache.end_staging(discard=True)
+        data_cache.invalidate(group.touched())
+        raise
+    data_cache.end_staging()
@@ -3,7 +3,7 @@ import os
 import pandas as pd
 from datetime import datetime
 from tkinter import messagebox
-from sales import load_sales
+from sales import load_sales, get_due_sales
 from utils import app_dir
 from purchase import load_purchases
 from inventory import get_stock_valuation_summary
@@ -222,7 +222,8 @@ def export_purchase_supplier_filtered(supplier_name):
     return file_path
 
 def export_due_report_excel():
-    sales = load_sales()
+    # Oldest first, as in the sales file.
+    sales = reversed(get_due_sales())
     rows = []
     total_due = 0.0
 
@@ -2,35 +2,61 @@ import json
 import os
 from datetime import datetime
 from utils import app_dir
-from audit_log import write_audit_log
+from audit_log import write_audit_log, write_audit_logs, build_audit_entry
+import data_cache
+import durable_io
+import sqlite_store
 
 BASE_DIR = app_dir()
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 INVENTORY_FILE = os.path.join(DATA_DIR, "inventory.json")
-AUDIT_FILE = os.path.join(DATA_DIR, "audit_log.json")
 
 # -------------------------
 # File helpers
 # -------------------------
-def load_inventory():
+def _read_inventory():
     if not os.path.exists(INVENTORY_FILE):
         return {}
     with open(INVENTORY_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def save_inventory(data):
-    with open(INVENTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+def load_inventory():
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_inventory()
+    return data_cache.load(INVENTORY_FILE, _read_inventory)
+
+
+def _load_items(item_names):
+    # Inventory holding at least item_names; in SQLite mode only those rows.
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_inventory_items(item_names)
+    return load_inventory()
+
+
+def save_inventory(data, items=None):
+    """
+    Write inventory. items, if given, names the only entries that changed;
+    in SQLite mode just those rows are upserted (or deleted if missing
+    from data) instead of replacing the table.
+    """
+    if sqlite_store.is_enabled():
+        if items is None:
+            sqlite_store.save_inventory(data)
+        else:
+            sqlite_store.put_inventory_items({name: data.get(name) for name in items})
+        return
+    durable_io.write_json(INVENTORY_FILE, data, indent=4)
+    data_cache.store(INVENTORY_FILE, data)
 
 
 # -------------------------
 # STOCK INCREASE
 # -------------------------
 def add_stock(item_name, qty, rate=0, user="admin", reason="purchase"):
-    inv = load_inventory()
+    inv = _load_items([item_name])
     before = inv.get(item_name, {}).copy()
 
     if item_name in inv:
@@ -42,50 +68,93 @@ def add_stock(item_name, qty, rate=0, user="admin", reason="purchase"):
             "rate": rate
         }
 
-    save_inventory(inv)
-
-def write_audit_log(
-    user=None,
-    module=None,
-    action=None,
-    reference=None,
-    before=None,
-    after=None,
-    extra=None
-):
-    log = {
-        "user": user,
-        "module": module,
-        "action": action,
-        "reference": reference,
-        "before": before,
-        "after": after,
-        "timestamp": datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-    }
-
-    if extra:
-        log.update(extra)
+    save_inventory(inv, items=[item_name])
 
-    logs = []
-    if os.path.exists(AUDIT_FILE):
-        try:
-            with open(AUDIT_FILE, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-        except:
-            logs = []
+# -------------------------
+# BATCHED STOCK MOVEMENTS
+# -------------------------
+def apply_stock_movements(movements, user="admin", reason="", sync_overrides=True):
+    """
+    Apply several stock changes with one inventory read and one write.
 
-    # Keep persisted log in reverse chronological order (latest first).
-    logs.insert(0, log)
+    movements = [{"item": name, "qty": signed_delta, "rate": optional, "reason": optional}]
+    Positive qty adds stock (rate, if given, becomes the item rate);
+    negative qty removes it. Every line is validated against the summed
+    demand per item before anything is written, so a failing line leaves
+    inventory untouched. Audit entries are appended in one write and the
+    Item Summary available_qty overrides are synced in one pass.
 
-    with open(AUDIT_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, indent=2)
+    Returns {item_name: new_stock}.
+    """
+    lines = []
+    demand = {}
+    for m in movements:
+        item_name = str(m.get("item") or m.get("name") or "").strip()
+        if not item_name:
+            raise ValueError("Item name missing in stock movement")
+        qty = float(m.get("qty", 0) or 0)
+        lines.append((item_name, qty, m))
+        if qty < 0:
+            demand[item_name] = demand.get(item_name, 0.0) - qty
+
+    inv = _load_items({item_name for item_name, _qty, _m in lines})
+
+    for item_name, required in demand.items():
+        if item_name not in inv:
+            raise ValueError(f"Item not found: {item_name}")
+        available = float(inv[item_name].get("stock", 0) or 0)
+        if available < required:
+            raise ValueError(
+                f"Insufficient stock for {item_name}. Available: {available:.2f}, Required: {required:.2f}"
+            )
+
+    audit_entries = []
+    for item_name, qty, m in lines:
+        before = inv.get(item_name, {}).copy()
+        rate = m.get("rate")
+        if item_name in inv:
+            inv[item_name]["stock"] = float(inv[item_name].get("stock", 0) or 0) + qty
+            if qty > 0 and rate:
+                inv[item_name]["rate"] = rate
+        else:
+            inv[item_name] = {
+                "stock": qty,
+                "rate": rate or 0
+            }
+
+        audit_entries.append(
+            build_audit_entry(
+                user=user,
+                module="inventory",
+                action="stock_reduce" if qty < 0 else "stock_add",
+                reference=item_name,
+                before=before,
+                after=inv[item_name].copy(),
+                extra={"reason": m.get("reason") or reason}
+            )
+        )
+
+    new_stock = {item_name: float(inv[item_name].get("stock", 0) or 0) for item_name, _qty, _m in lines}
+
+    # Inventory, item master and override files are flushed together.
+    with durable_io.group_commit():
+        save_inventory(inv, items=new_stock)
+
+        from item_master import register_items
+        register_items(item_name for item_name, _qty, _m in lines)
+
+        if sync_overrides:
+            from item_summary_report import sync_item_summary_available_qty
+            sync_item_summary_available_qty(new_stock)
+    write_audit_logs(audit_entries)
+    return new_stock
 
 
 # -------------------------
 # STOCK REDUCE
 # -------------------------
 def reduce_stock(item_name, qty, user="admin", reason="sale"):
-    inv = load_inventory()
+    inv = _load_items([item_name])
 
     if item_name not in inv:
         raise ValueError(f"Item not found: {item_name}")
@@ -96,7 +165,7 @@ def reduce_stock(item_name, qty, user="admin", reason="sale"):
     before = inv[item_name].copy()
     inv[item_name]["stock"] -= qty
 
-    save_inventory(inv)
+    save_inventory(inv, items=[item_name])
 
     write_audit_log(
         user=user,
@@ -113,7 +182,7 @@ def reduce_stock(item_name, qty, user="admin", reason="sale"):
 # STOCK RESTORE (Invoice Cancel)
 # -------------------------
 def restore_stock(item_name, qty, user="admin", reason="invoice_cancel"):
-    inv = load_inventory()
+    inv = _load_items([item_name])
     before = inv.get(item_name, {}).copy()
 
     if item_name in inv:
@@ -121,7 +190,7 @@ def restore_stock(item_name, qty, user="admin", reason="invoice_cancel"):
     else:
         inv[item_name] = {"stock": qty, "rate": 0}
 
-    save_inventory(inv)
+    save_inventory(inv, items=[item_name])
 
     write_audit_log(
         user=user,
@@ -138,7 +207,7 @@ def restore_stock(item_name, qty, user="admin", reason="invoice_cancel"):
 # MANUAL ADJUSTMENT
 # -------------------------
 def adjust_stock(item_name, new_qty, user="admin", note="manual_adjustment"):
-    inv = load_inventory()
+    inv = _load_items([item_name])
 
     before = inv.get(item_name, {}).copy()
     inv[item_name] = {
@@ -146,7 +215,7 @@ def adjust_stock(item_name, new_qty, user="admin", note="manual_adjustment"):
         "rate": before.get("rate", 0)
     }
 
-    save_inventory(inv)
+    save_inventory(inv, items=[item_name])
     
    
 def get_total_stock_value():
@@ -193,6 +262,8 @@ def get_item_stock(item_name):
     """
     Used before billing to prevent over-sale
     """
+    if sqlite_store.is_enabled():
+        return sqlite_store.get_item_stock(item_name)
     inv = load_inventory()
     if item_name not in inv:
         return 0
@@ -0,0 +1,249 @@
+# item_aggregates.py
+
+import os
+import json
+import threading
+from utils import app_dir
+import data_cache
+import durable_io
+from journal_store import journal_path_for
+from item_master import load_item_master, save_item_master, register_name
+import sqlite_store
+
+# ================= PATH =================
+BASE_DIR = app_dir()
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+AGGREGATES_FILE = os.path.join(DATA_DIR, "item_aggregates.json")
+SIGNATURE_FILE = os.path.join(DATA_DIR, "item_aggregates.sig.json")
+PURCHASE_FILE = os.path.join(DATA_DIR, "purchase.json")
+SALES_FILE = os.path.join(DATA_DIR, "sales.json")
+
+# Per-item purchase/sale totals kept up to date by create_sale,
+# cancel_invoice and create_purchase, so the Item Summary does not rescan
+# history.
+#
+# item_aggregates.json:
+#   {"items": {key: {"label", "purchase_qty", "purchase_value",
+#                    "sale_qty", "sale_value"}}}
+# item_aggregates.sig.json:
+#   {"source": {...},   source files right after our last update
+#    "table": [...]}    item_aggregates.json as we wrote it
+#
+# Keys are item master keys. If purchases/sales changed without passing
+# through here (restore, manual edit, another process) the signature no
+# longer matches and the table is rebuilt on next read. The signature lives
+# in its own small file because inside a unit of work the source files only
+# change at commit: re-signing then rewrites a few bytes, not the table.
+
+_lock = threading.RLock()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _source_signature():
+    if sqlite_store.is_enabled():
+        # The db file changes on every write (customers, cash...), so use
+        # the history tables themselves.
+        return {"sqlite": sqlite_store.history_stamp()}
+    paths = [PURCHASE_FILE, journal_path_for(PURCHASE_FILE), SALES_FILE, journal_path_for(SALES_FILE)]
+    # Keyed relative to DATA_DIR so a copied or moved data folder is judged
+    # by its own files; lists, not tuples, so it compares equal after a
+    # JSON round trip.
+    return {os.path.relpath(path, DATA_DIR): list(data_cache.file_signature(path) or []) for path in paths}
+
+
+def _read_aggregates():
+    if not os.path.exists(AGGREGATES_FILE):
+        return {}
+    with open(AGGREGATES_FILE, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _read_signature():
+    if not os.path.exists(SIGNATURE_FILE):
+        return {}
+    with open(SIGNATURE_FILE, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _signed_source():
+    """Source signature the table on disk was built from, or None if unknown."""
+    data = data_cache.load(SIGNATURE_FILE, _read_signature)
+    if data.get("table") != list(data_cache.file_signature(AGGREGATES_FILE) or []):
+        # Table replaced or written without being signed (crash in between).
+        return None
+    return data.get("source")
+
+
+def _save_aggregates(items):
+    data = {"items": items}
+    durable_io.write_json(AGGREGATES_FILE, data, indent=2)
+    data_cache.store(AGGREGATES_FILE, data)
+    # Inside a group the table and sales/purchase files land at commit.
+    durable_io.after_commit(_sign_aggregates)
+
+
+def _sign_aggregates():
+    with _lock:
+        data = {
+            "source": _source_signature(),
+            "table": list(data_cache.file_signature(AGGREGATES_FILE) or []),
+        }
+        durable_io.write_json(SIGNATURE_FILE, data, indent=None)
+        data_cache.store(SIGNATURE_FILE, data)
+
+
+def _new_row(label):
+    return {
+        "label": label,
+        "purchase_qty": 0.0,
+        "purchase_value": 0.0,
+        "sale_qty": 0.0,
+        "sale_value": 0.0,
+    }
+
+
+def _apply_lines(items, master, lines, qty_field, value_field, sign):
+    changed_master = False
+    for line in lines or []:
+        name = line.get("item") or line.get("name")
+        if not name:
+            continue
+        key, added = register_name(master, name)
+        changed_master = changed_master or added
+        if not key:
+            continue
+        qty = _to_float(line.get("qty", 0))
+        rate = _to_float(line.get("rate", 0))
+        row = items.get(key)
+        if row is None:
+            row = _new_row(str(name).strip())
+        else:
+            row = dict(row)
+        row[qty_field] = row[qty_field] + sign * qty
+        row[value_field] = row[value_field] + sign * qty * rate
+        items[key] = row
+    return changed_master
+
+
+# ================= BUILD / VERIFY =================
+def _compute_from_history():
+    from purchase import load_purchases
+    from sales import load_sales
+
+    master = load_item_master()
+    items = {}
+    changed_master = False
+
+    for p in load_purchases():
+        changed_master |= _apply_lines(items, master, p.get("items", []), "purchase_qty", "purchase_value", 1.0)
+    for s in load_sales():
+        if s.get("cancelled"):
+            continue
+        changed_master |= _apply_lines(items, master, s.get("items", []), "sale_qty", "sale_value", 1.0)
+
+    if changed_master:
+        save_item_master(master)
+    return items
+
+
+def rebuild_item_aggregates():
+    """Recompute the whole table from purchases and sales."""
+    with _lock:
+        signature = _source_signature()
+        items = _compute_from_history()
+        # Only keep the result if nothing was written while we were scanning.
+        if _source_signature() == signature:
+            _save_aggregates(items)
+        return items
+
+
+def verify_item_aggregates(tolerance=0.01):
+    """
+    Compare the stored table with a fresh scan of history.
+
+    Returns a list of (key, field, stored, expected) for every mismatch;
+    an empty list means the table is correct.
+    """
+    with _lock:
+        stored = (_read_aggregates().get("items") or {})
+        expected = _compute_from_history()
+
+    problems = []
+    for key in sorted(set(stored) | set(expected)):
+        have = stored.get(key) or _new_row("")
+        want = expected.get(key) or _new_row("")
+        for field in ("purchase_qty", "purchase_value", "sale_qty", "sale_value"):
+            a = _to_float(have.get(field, 0))
+            b = _to_float(want.get(field, 0))
+            if abs(a - b) > tolerance:
+                problems.append((key, field, round(a, 2), round(b, 2)))
+    return problems
+
+
+def load_item_aggregates():
+    """{key: row} for every item; rebuilt first if history changed behind our back."""
+    with _lock:
+        data = data_cache.load(AGGREGATES_FILE, _read_aggregates)
+        if _signed_source() != _source_signature() or not isinstance(data.get("items"), dict):
+            return rebuild_item_aggregates()
+        return dict(data["items"])
+
+
+# ================= INCREMENTAL UPDATES =================
+def _update(lines, qty_field, value_field, sign, expected_signature):
+    with _lock:
+        data = data_cache.load(AGGREGATES_FILE, _read_aggregates)
+        items = data.get("items")
+        if _signed_source() != expected_signature or not isinstance(items, dict):
+            # Table was already behind; a rebuild picks up this write too.
+            rebuild_item_aggregates()
+            return
+
+        items = dict(items)
+        master = load_item_master()
+        if _apply_lines(items, master, lines, qty_field, value_field, sign):
+            save_item_master(master)
+        _save_aggregates(items)
+
+
+def begin_update():
+    """
+    Source signature to pass to record_*; take it just before writing the
+    purchase/sale so the update can tell whether the table was current.
+    """
+    return _source_signature()
+
+
+def record_purchase(record, before_signature):
+    _update(record.get("items", []), "purchase_qty", "purchase_value", 1.0, before_signature)
+
+
+def record_sale(record, before_signature):
+    if record.get("cancelled"):
+        return
+    _update(record.get("items", []), "sale_qty", "sale_value", 1.0, before_signature)
+
+
+def record_sale_cancel(record, before_signature):
+    _update(record.get("items", []), "sale_qty", "sale_value", -1.0, before_signature)
+
+
+def record_sale_update(before_signature):
+    """A sales write that leaves item totals unchanged (due payments)."""
+    _update([], "sale_qty", "sale_value", 1.0, before_signature)
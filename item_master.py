@@ -0,0 +1,220 @@
+# item_master.py
+
+import os
+import json
+import re
+import threading
+from utils import app_dir
+import data_cache
+import durable_io
+
+# ================= PATH =================
+BASE_DIR = app_dir()
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+ITEM_MASTER_FILE = os.path.join(DATA_DIR, "item_master.json")
+
+# Canonical item identities shared by reports.
+#
+# {
+#   "items":   {key: {"label": "Rice"}},      canonical items, registration order
+#   "aliases": {normalized: key},             every known spelling -> canonical key
+#   "merges":  {normalized: key}              explicit merge rules (win over matching)
+#   "merge_log": {normalized: {"key", "label", "aliases", "merges"}}
+#                                             what each merge moved, so it can be undone
+# }
+#
+# Lookups are plain dict hits. The loose substring match the Item Summary
+# used to run for every invoice line now happens once, when a spelling is
+# first registered, and its result is stored as an alias.
+
+_lock = threading.RLock()
+
+SECTIONS = ("items", "aliases", "merges", "merge_log")
+
+
+def normalize_item_name(value):
+    text = str(value or "").strip().lower()
+    return re.sub(r"[^a-z0-9]+", "", text)
+
+
+def _empty_master():
+    return {section: {} for section in SECTIONS}
+
+
+def _read_master():
+    if not os.path.exists(ITEM_MASTER_FILE):
+        return _empty_master()
+    with open(ITEM_MASTER_FILE, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return _empty_master()
+    if not isinstance(data, dict):
+        return _empty_master()
+    for section in SECTIONS:
+        if not isinstance(data.get(section), dict):
+            data[section] = {}
+    return data
+
+
+def load_item_master():
+    # Sections are copied so callers can register names and only the saved
+    # result reaches the shared cache.
+    master = data_cache.load(ITEM_MASTER_FILE, _read_master)
+    return {section: dict(master.get(section) or {}) for section in SECTIONS}
+
+
+def save_item_master(master):
+    durable_io.write_json(ITEM_MASTER_FILE, master, indent=2)
+    data_cache.store(ITEM_MASTER_FILE, master)
+
+
+# ================= LOOKUP =================
+def resolve_key(master, normalized):
+    """Canonical key for an already-normalized name, or None if unknown."""
+    if not normalized:
+        return None
+    key = master["merges"].get(normalized) or master["aliases"].get(normalized)
+    if key:
+        return key
+    if normalized in master["items"]:
+        return normalized
+    return None
+
+
+def resolve_item_key(item_name):
+    return resolve_key(load_item_master(), normalize_item_name(item_name))
+
+
+def _match_existing(master, normalized):
+    # Same rule find_existing_key applied per line: first canonical key that
+    # contains, or is contained in, the new name.
+    for key in master["items"].keys():
+        if normalized in key or key in normalized:
+            return key
+    return None
+
+
+def register_name(master, item_name):
+    """
+    Resolve item_name in master, adding it (as a new item or an alias of a
+    matching one) if it has not been seen before. Mutates master in place.
+
+    Returns (key, changed).
+    """
+    normalized = normalize_item_name(item_name)
+    if not normalized:
+        return None, False
+
+    key = resolve_key(master, normalized)
+    if key:
+        return key, False
+
+    key = _match_existing(master, normalized)
+    if key:
+        master["aliases"][normalized] = key
+    else:
+        key = normalized
+        master["items"][key] = {"label": str(item_name).strip()}
+    return key, True
+
+
+def register_items(item_names):
+    """Register several names with one read and at most one write."""
+    with _lock:
+        master = load_item_master()
+        changed = False
+        for name in item_names:
+            _key, added = register_name(master, name)
+            changed = changed or added
+        if changed:
+            save_item_master(master)
+
+
+# ================= MERGE RULES =================
+def merge_items(source_name, target_name):
+    """
+    Fold source_name into target_name. Every spelling that resolved to the
+    source now resolves to the target, and the rule is kept so later
+    registrations cannot split them again.
+    """
+    source = normalize_item_name(source_name)
+    target_norm = normalize_item_name(target_name)
+    if not source or not target_norm:
+        raise ValueError("Both item names are required")
+
+    with _lock:
+        master = load_item_master()
+        target, _added = register_name(master, target_name)
+        source_key = resolve_key(master, source)
+        if source_key == target:
+            raise ValueError("Items are already the same")
+
+        entry = {
+            "key": source_key or source,
+            "label": (master["items"].get(source_key) or {}).get("label") or str(source_name).strip(),
+            "aliases": [],
+            "merges": [],
+        }
+        if source_key:
+            for alias, key in list(master["aliases"].items()):
+                if key == source_key:
+                    master["aliases"][alias] = target
+                    entry["aliases"].append(alias)
+            for alias, key in list(master["merges"].items()):
+                if key == source_key:
+                    master["merges"][alias] = target
+                    entry["merges"].append(alias)
+            master["items"].pop(source_key, None)
+            master["merges"][source_key] = target
+        master["merges"][source] = target
+        master["merge_log"][source] = entry
+        save_item_master(master)
+    return target
+
+
+def remove_merge_rule(item_name):
+    """
+    Undo merge_items(item_name, ...): the source becomes its own item again
+    and the spellings the merge moved point back at it. Item aggregates are
+    rebuilt, since totals recorded while merged sit under the target.
+    """
+    normalized = normalize_item_name(item_name)
+    with _lock:
+        master = load_item_master()
+        target = master["merges"].pop(normalized, None)
+        if target is None:
+            return False
+
+        entry = master["merge_log"].pop(normalized, None) or {
+            "key": normalized,
+            "label": str(item_name).strip(),
+            "aliases": [],
+            "merges": [],
+        }
+        source_key = entry["key"]
+        if source_key != normalized and master["merges"].get(source_key) == target:
+            del master["merges"][source_key]
+        for alias in entry.get("aliases") or []:
+            if master["aliases"].get(alias) == target:
+                master["aliases"][alias] = source_key
+        for alias in entry.get("merges") or []:
+            if master["merges"].get(alias) == target:
+                master["merges"][alias] = source_key
+        if master["aliases"].get(normalized) == target:
+            master["aliases"].pop(normalized)
+        master["items"].setdefault(source_key, {"label": entry.get("label") or str(item_name).strip()})
+        save_item_master(master)
+
+    from item_aggregates import rebuild_item_aggregates
+    rebuild_item_aggregates()
+    return True
+
+
+def merge_rules():
+    """[(source, target label)] for every explicit merge, sorted by source."""
+    master = load_item_master()
+    labels = {key: row.get("label") or key for key, row in master["items"].items()}
+    return [(source, labels.get(key, key)) for source, key in sorted(master["merges"].items())]
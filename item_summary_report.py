@@ -2,9 +2,12 @@
 
 import os
 import json
-import re
 from collections import defaultdict
 from utils import app_dir
+import data_cache
+import durable_io
+from item_master import load_item_master, save_item_master, register_name, resolve_key, normalize_item_name
+from item_aggregates import load_item_aggregates
 
 # ================= PATH =================
 BASE_DIR = app_dir()
@@ -17,7 +20,7 @@ OVERRIDES_FILE = os.path.join(DATA_DIR, "item_summary_overrides.json")
 
 
 # ================= LOAD HELPERS =================
-def load_json(path):
+def _read_json(path):
     if not os.path.exists(path):
         return {} if path in (INVENTORY_FILE, OVERRIDES_FILE) else []
     with open(path, "r", encoding="utf-8") as f:
@@ -27,9 +30,13 @@ def load_json(path):
             return {} if path in (INVENTORY_FILE, OVERRIDES_FILE) else []
 
 
+def load_json(path):
+    return data_cache.load(path, lambda: _read_json(path))
+
+
 def save_json(path, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    durable_io.write_json(path, data, indent=2)
+    data_cache.store(path, data)
 
 
 def to_float(value):
@@ -39,21 +46,6 @@ def to_float(value):
         return 0.0
 
 
-def normalize_item_name(value):
-    text = str(value or "").strip().lower()
-    return re.sub(r"[^a-z0-9]+", "", text)
-
-
-def find_existing_key(summary, normalized_name):
-    if normalized_name in summary:
-        return normalized_name
-
-    for key in summary.keys():
-        if normalized_name in key or key in normalized_name:
-            return key
-    return normalized_name
-
-
 def set_item_summary_override(item_name, available_qty=None, purchase_price=None, selling_price=None):
     key = normalize_item_name(item_name)
     if not key:
@@ -101,15 +93,53 @@ def adjust_item_summary_available_qty(item_name, delta_qty):
     save_json(OVERRIDES_FILE, overrides)
 
 
+def sync_item_summary_available_qty(stock_by_item):
+    """
+    Set available_qty overrides to the given real stock for many items with
+    one read and one write of the overrides file.
+    """
+    overrides = load_json(OVERRIDES_FILE)
+    if not isinstance(overrides, dict):
+        overrides = {}
+
+    changed = False
+    for item_name, stock in stock_by_item.items():
+        key = normalize_item_name(item_name)
+        if not key:
+            continue
+        rec = overrides.get(key)
+        if not isinstance(rec, dict):
+            rec = {}
+        rec["item"] = str(item_name).strip()
+        rec["available_qty"] = round(to_float(stock), 2)
+        overrides[key] = rec
+        changed = True
+
+    if changed:
+        save_json(OVERRIDES_FILE, overrides)
+
+
 # ================= MAIN REPORT FUNCTION =================
 def get_item_summary_report():
-    purchases = load_json(PURCHASE_FILE)
-    sales = load_json(SALES_FILE)
-    inventory = load_json(INVENTORY_FILE)
+    from inventory import load_inventory
+
+    # Purchase/sale totals come from the materialized per-item table, so
+    # the report is O(items) rather than a scan of all history.
+    aggregates = load_item_aggregates()
+    inventory = load_inventory()
     overrides = load_json(OVERRIDES_FILE)
     if not isinstance(overrides, dict):
         overrides = {}
 
+    master = load_item_master()
+    master_changed = False
+
+    def find_key(name):
+        nonlocal master_changed
+        key, added = register_name(master, name)
+        master_changed = master_changed or added
+        return key
+
     summary = defaultdict(lambda: {
         "label": "",
         "purchase_qty": 0.0,
@@ -119,58 +149,26 @@ def get_item_summary_report():
         "inventory_qty": 0.0
     })
 
-    # ===== PURCHASE CALCULATION =====
-    for p in purchases:
-        items = p.get("items", [])
-        for item in items:
-            name = item.get("item") or item.get("name")
-
-            if not name:
-                continue
-            normalized = normalize_item_name(name)
-            key = find_existing_key(summary, normalized)
-            if not key:
-                continue
-            qty = to_float(item.get("qty", 0))
-            rate = to_float(item.get("rate", 0))
-
-            if not summary[key]["label"]:
-                summary[key]["label"] = str(name).strip()
-
-            summary[key]["purchase_qty"] += qty
-            summary[key]["purchase_value"] += qty * rate
-
-    # ===== SALES CALCULATION =====
-    for s in sales:
-        if s.get("cancelled"):
-            continue
-        items = s.get("items", [])
-        for item in items:
-            name = item.get("item") or item.get("name")
-            if not name:
-                continue
-            normalized = normalize_item_name(name)
-            key = find_existing_key(summary, normalized)
-            if not key:
-                continue
-            qty = to_float(item.get("qty", 0))
-            rate = to_float(item.get("rate", 0))
-
-            if not summary[key]["label"]:
-                summary[key]["label"] = str(name).strip()
-
-            summary[key]["sale_qty"] += qty
-            summary[key]["sale_value"] += qty * rate
+    # ===== PURCHASE / SALES TOTALS =====
+    for agg_key, agg in aggregates.items():
+        # Re-resolve so merges made after the totals were recorded apply.
+        key = resolve_key(master, agg_key) or agg_key
+        if not summary[key]["label"]:
+            summary[key]["label"] = str(agg.get("label") or "").strip()
+        for field in ("purchase_qty", "purchase_value", "sale_qty", "sale_value"):
+            summary[key][field] += to_float(agg.get(field, 0))
 
     # ===== INVENTORY QTY (fallback / display label source) =====
     for item_name, data in inventory.items():
-        normalized = normalize_item_name(item_name)
-        key = find_existing_key(summary, normalized)
+        key = find_key(item_name)
         if not key:
             continue
         summary[key]["label"] = str(item_name).strip()
         summary[key]["inventory_qty"] = to_float(data.get("stock", 0))
 
+    if master_changed:
+        save_item_master(master)
+
     # ===== FINAL FORMAT =====
     report_rows = []
 
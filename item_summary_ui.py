@@ -6,6 +6,8 @@ import re
 from item_summary_report import get_item_summary_report, set_item_summary_override
 from purchase import load_purchases
 from sales import load_sales
+from virtual_tree import VirtualTree
+from ui_tasks import TaskStatus
 
 
 class ItemSummaryUI(ttk.Frame):
@@ -65,6 +67,8 @@ class ItemSummaryUI(ttk.Frame):
             variable=self.show_selected_only_var,
             command=self.render_rows
         ).pack(side="left")
+        self.tasks = TaskStatus(self)
+        self.tasks.pack(anchor="w", pady=(0, 4))
 
         columns = ("selected", "item", "available_qty", "selling_price") if self.restricted_view else ("selected", "item", "available_qty", "purchase_price", "selling_price")
         table_frame = ttk.Frame(self)
@@ -117,12 +121,16 @@ class ItemSummaryUI(ttk.Frame):
         self.tree.tag_configure("qty_negative", background="#fde2e2", foreground="#8b1d1d")
         self.tree.tag_configure("qty_zero", background="#fff1df", foreground="#8a4b00")
         self.tree.tag_configure("qty_positive", background="#eaf3ff", foreground="#0f3b73")
+        self.view = VirtualTree(self.tree, ysb)
         self.update_heading_labels()
 
         self.load_data()
 
     def load_data(self):
-        self.all_rows = get_item_summary_report()
+        self.tasks.run(lambda _task: get_item_summary_report(), on_done=self._show_data, text="Loading items...")
+
+    def _show_data(self, rows):
+        self.all_rows = rows
         self.render_rows()
 
     def on_search_change(self, _event=None):
@@ -205,9 +213,8 @@ class ItemSummaryUI(ttk.Frame):
         )
 
     def render_rows(self):
-        for iid in self.tree.get_children():
-            self.tree.delete(iid)
-
+        rows = []
+        tags = []
         for row in self.get_filtered_rows():
             item_name = str(row["item"])
             qty_value = self.to_float(row.get("available_qty", 0))
@@ -232,7 +239,10 @@ class ItemSummaryUI(ttk.Frame):
             else:
                 row_tag = "qty_positive"
 
-            self.tree.insert("", "end", values=values, tags=(row_tag,))
+            rows.append(values)
+            tags.append((row_tag,))
+
+        self.view.set_rows(rows, tags)
 
     def on_tree_click(self, event):
         if self.tree.identify("region", event.x, event.y) != "cell":
@@ -249,10 +259,14 @@ class ItemSummaryUI(ttk.Frame):
         item_name = self.tree.set(iid, "item")
         if item_name in self.selected_items:
             self.selected_items.remove(item_name)
+            if self.show_selected_only_var.get():
+                # The unchecked row no longer passes the filter.
+                self.render_rows()
+            else:
+                self.view.set_value(iid, "selected", self.UNCHECKED_BOX)
         else:
             self.selected_items.add(item_name)
-
-        self.render_rows()
+            self.view.set_value(iid, "selected", self.CHECKED_BOX)
         return None
 
     def on_tree_double_click(self, event):
@@ -346,9 +360,9 @@ class ItemSummaryUI(ttk.Frame):
             item_names = sorted({str(x).strip() for x in self.selected_items if str(x).strip()})
         else:
             # Fallback: use currently selected tree rows.
-            selected_rows = self.tree.selection()
+            selected_rows = self.view.selection()
             for iid in selected_rows:
-                item_name = self.tree.set(iid, "item")
+                item_name = self.view.value(iid, "item")
                 if item_name:
                     item_names.append(str(item_name).strip())
             item_names = sorted(set(item_names))
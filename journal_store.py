@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import data_cache
+import durable_io
+
+
+# Journal lines folded into the snapshot once this many have accumulated.
+DEFAULT_COMPACT_EVERY = 500
+
+
+def journal_path_for(snapshot_path: str) -> str:
+    root, _ext = os.path.splitext(snapshot_path)
+    return f"{root}.journal.jsonl"
+
+
+class JournalStore:
+    """
+    List-of-records store backed by a JSON snapshot (the existing data/*.json
+    file) plus an append-only JSON-lines journal next to it.
+
+    Each journal line is {"op": "put", "row": {...}} and upserts by key_field,
+    so a new invoice costs one appended line and an fsync. The journal is
+    folded into the snapshot every compact_every lines, or whenever the full
+    list is saved. A plain data/*.json tree with no journal loads unchanged.
+    """
+
+    def __init__(self, snapshot_path: str, key_field: str, compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path_for(snapshot_path)
+        self.key_field = key_field
+        self.compact_every = max(1, int(compact_every))
+        self._lock = threading.RLock()
+        self._journal_lines: Optional[int] = None
+        self._paths = (self.snapshot_path, self.journal_path)
+        # key -> position for the cached row list, so put() can patch it in place.
+        self._positions_for: Optional[List[dict]] = None
+        self._positions: Dict[str, int] = {}
+
+    # -------------------------------
+    # Read
+    # -------------------------------
+    def _read_snapshot(self) -> List[dict]:
+        if not os.path.exists(self.snapshot_path):
+            return []
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+
+    def _read_journal(self) -> List[dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+        ops = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append is skipped.
+                    continue
+        return ops
+
+    def tail_mark(self) -> dict:
+        """Where the journal ends now; read_tail(mark) later returns what was put since."""
+        with self._lock:
+            try:
+                offset = os.path.getsize(self.journal_path)
+            except OSError:
+                offset = 0
+            return {
+                "snapshot": list(data_cache.file_signature(self.snapshot_path) or []),
+                "offset": offset,
+            }
+
+    def read_tail(self, mark) -> Optional[List[dict]]:
+        """
+        Rows put since tail_mark() returned mark, in journal order (a key
+        put twice appears twice). None if the snapshot was rewritten or the
+        journal truncated since, i.e. only a full load can tell.
+        """
+        if not isinstance(mark, dict) or not isinstance(mark.get("offset"), int):
+            return None
+        with self._lock:
+            if list(data_cache.file_signature(self.snapshot_path) or []) != mark.get("snapshot"):
+                return None
+            try:
+                with open(self.journal_path, "rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() < mark["offset"]:
+                        return None
+                    f.seek(mark["offset"])
+                    data = f.read()
+            except OSError:
+                return [] if mark["offset"] == 0 else None
+
+        rows = []
+        for line in data.decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError:
+                continue
+            row = op.get("row") if isinstance(op, dict) else None
+            if op.get("op") == "put" and isinstance(row, dict):
+                rows.append(row)
+        return rows
+
+    def load(self) -> List[dict]:
+        """Current rows; parsed once and served from data_cache until a file changes."""
+        with self._lock:
+            return data_cache.load(self._paths, self._load_uncached)
+
+    def _load_uncached(self) -> List[dict]:
+        with self._lock:
+            self._positions_for = None
+            rows = self._read_snapshot()
+            ops = self._read_journal()
+            self._journal_lines = len(ops)
+            if not ops:
+                return rows
+
+            positions: Dict[str, int] = {}
+            for idx, row in enumerate(rows):
+                if isinstance(row, dict) and row.get(self.key_field) is not None:
+                    positions[str(row[self.key_field])] = idx
+
+            for op in ops:
+                row = op.get("row") if isinstance(op, dict) else None
+                if op.get("op") != "put" or not isinstance(row, dict):
+                    continue
+                key = str(row.get(self.key_field, ""))
+                if key in positions:
+                    rows[positions[key]] = row
+                else:
+                    positions[key] = len(rows)
+                    rows.append(row)
+            return rows
+
+    # -------------------------------
+    # Write
+    # -------------------------------
+    def save(self, rows: List[dict]):
+        """Rewrite the snapshot with rows and reset the journal."""
+        with self._lock:
+            durable_io.write_json(self.snapshot_path, rows, indent=4)
+            # Truncate only after the snapshot is durable; replaying a stale
+            # journal onto the new snapshot is harmless because puts upsert.
+            durable_io.remove(self.journal_path)
+            self._journal_lines = 0
+            self._positions_for = None
+            data_cache.store(self._paths, rows)
+
+    def put(self, row: dict):
+        """Insert or replace one record by key_field with a single journal append."""
+        if not isinstance(row, dict) or row.get(self.key_field) is None:
+            raise ValueError(f"Journal row requires '{self.key_field}'")
+
+        with self._lock:
+            if self._journal_lines is None:
+                self._journal_lines = len(self._read_journal())
+            cached = data_cache.peek(self._paths)
+
+            line = json.dumps({"op": "put", "row": row}, ensure_ascii=False)
+            durable_io.append_lines(self.journal_path, [line])
+            self._journal_lines += 1
+
+            if cached is not None:
+                self._apply_to_cached(cached, row)
+                data_cache.refresh(self._paths)
+
+            if self._journal_lines >= self.compact_every:
+                self.compact()
+
+    append = put
+
+    def get(self, key) -> Optional[dict]:
+        """The current row with key_field == key, or None."""
+        found = self.get_many([key])
+        return found[0] if found else None
+
+    def get_many(self, keys) -> List[dict]:
+        """Current rows for keys, in the order given; missing keys are skipped."""
+        with self._lock:
+            rows = self._shared_rows()
+            positions = self._index_positions(rows)
+            found = []
+            for key in keys:
+                idx = positions.get(str(key))
+                if idx is not None:
+                    found.append(rows[idx])
+            return found
+
+    def _shared_rows(self) -> List[dict]:
+        # The cached list itself rather than load()'s copy, so the position
+        # map built against it is reused until the files change.
+        rows = data_cache.peek(self._paths)
+        if rows is None:
+            rows = self.load()
+            shared = data_cache.peek(self._paths)
+            if shared is not None:
+                rows = shared
+        return rows
+
+    def _index_positions(self, rows: List[dict]) -> Dict[str, int]:
+        if self._positions_for is not rows:
+            self._positions = {
+                str(r.get(self.key_field)): idx
+                for idx, r in enumerate(rows)
+                if isinstance(r, dict) and r.get(self.key_field) is not None
+            }
+            self._positions_for = rows
+        return self._positions
+
+    def _apply_to_cached(self, rows: List[dict], row: dict):
+        self._index_positions(rows)
+        key = str(row.get(self.key_field))
+        if key in self._positions:
+            rows[self._positions[key]] = row
+        else:
+            self._positions[key] = len(rows)
+            rows.append(row)
+
+    def compact(self):
+        with self._lock:
+            self.save(self.load())
@@ -6,21 +6,23 @@ import csv
 from datetime import datetime
 
 from inventory import get_total_stock_value
-from audit_log import write_audit_log, set_current_audit_user
+from audit_log import write_audit_log, set_current_audit_user, load_audit_logs
 from data_consistency import ensure_data_consistency_if_needed
+from transaction import recover_pending_transaction
 from ui_theme import setup_style
+from ui_tasks import run_task
 from sales import load_sales
 from purchase import load_purchases
 from inventory import load_inventory
 from customers import load_customers
 from suppliers import load_suppliers
 from utils import app_dir
+from shop_managers import load_shop_manager_accounts, save_shop_manager_accounts
 
 
 ADMIN_PASSWORD = "admin123"
 SHOP_MANAGER_PASSWORD = "sm123"
 REGISTRATION_AUTH_KEY = "12345679"
-SHOP_MANAGER_USERS_FILE = os.path.join("data", "shop_manager_users.json")
 
 
 def _now_text():
@@ -37,70 +39,6 @@ def _parse_ts(value):
     return datetime.min
 
 
-def load_shop_manager_accounts():
-    path = os.path.join(app_dir(), SHOP_MANAGER_USERS_FILE)
-    if not os.path.exists(path):
-        return []
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception:
-        return []
-
-    if not isinstance(data, list):
-        return []
-
-    # Backward compatibility: older format was list of passwords.
-    if data and isinstance(data[0], str):
-        migrated = []
-        for idx, raw_pwd in enumerate(data, start=1):
-            pwd = str(raw_pwd or "").strip()
-            if not pwd:
-                continue
-            migrated.append(
-                {
-                    "username": f"SM-{idx:03d}",
-                    "password": pwd,
-                    "created_on": "",
-                    "last_login": "",
-                    "is_active": True,
-                    "is_deleted": False,
-                    "deleted_on": "",
-                }
-            )
-        save_shop_manager_accounts(migrated)
-        return migrated
-
-    normalized = []
-    for rec in data:
-        if not isinstance(rec, dict):
-            continue
-        username = str(rec.get("username", "")).strip() or f"SM-{len(normalized) + 1:03d}"
-        password = str(rec.get("password", "")).strip()
-        if not password:
-            continue
-        normalized.append(
-            {
-                "username": username,
-                "password": password,
-                "created_on": str(rec.get("created_on", "")).strip(),
-                "last_login": str(rec.get("last_login", "")).strip(),
-                "is_active": bool(rec.get("is_active", True)),
-                "is_deleted": bool(rec.get("is_deleted", False)),
-                "deleted_on": str(rec.get("deleted_on", "")).strip(),
-            }
-        )
-    return normalized
-
-
-def save_shop_manager_accounts(accounts):
-    path = os.path.join(app_dir(), SHOP_MANAGER_USERS_FILE)
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    accounts = sorted(accounts, key=lambda a: str(a.get("username", "")).lower())
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(accounts, f, indent=2)
-
-
 def load_registered_shop_manager_passwords():
     return [
         a.get("password", "")
@@ -187,7 +125,8 @@ def save_registered_shop_manager_passwords(passwords):
 
 
 def preload_system_files():
-    # Load and normalize core data before UI starts.
+    # Load and normalize core data. Runs in the background while the login
+    # screen is up; recover_pending_transaction() must run before the UI.
     ensure_data_consistency_if_needed()
     load_sales()
     load_purchases()
@@ -242,6 +181,30 @@ class App(tk.Tk):
         
         self.show_frame("LoginFrame")
 
+        self.data_ready = False
+        self._ready_callbacks = []
+        run_task(self, lambda _task: preload_system_files(), on_done=self._on_data_ready, on_error=self._on_preload_error)
+
+    def when_data_ready(self, callback):
+        if self.data_ready:
+            callback()
+        elif callback not in self._ready_callbacks:
+            self._ready_callbacks.append(callback)
+
+    def _on_data_ready(self, _result=None):
+        self.data_ready = True
+        self.frames["LoginFrame"].status_var.set("")
+        callbacks, self._ready_callbacks = self._ready_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _on_preload_error(self, e):
+        messagebox.showwarning(
+            "Startup",
+            f"Data check did not finish. Reports may be incomplete until the next start.\n\n{e}"
+        )
+        self._on_data_ready()
+
     def show_frame(self, name):
         frame = self.frames[name]
         frame.tkraise()
@@ -319,7 +282,15 @@ class LoginFrame(ttk.Frame):
             style="Subtle.TLabel"
         ).pack(pady=(8, 0))
 
+        self.status_var = tk.StringVar(value="Preparing data...")
+        ttk.Label(center, textvariable=self.status_var, style="Subtle.TLabel").pack(pady=(8, 0))
+
     def check_login(self):
+        if not self.app.data_ready:
+            # Log in as soon as the startup data check finishes.
+            self.status_var.set("Preparing data, logging in shortly...")
+            self.app.when_data_ready(self.check_login)
+            return
         pwd = self.pwd.get().strip()
         registered_passwords = load_registered_shop_manager_passwords()
         audit_identity = None
@@ -847,14 +818,10 @@ class DashboardFrame(ttk.Frame):
 
                 detail_tree.delete(*detail_tree.get_children())
                 sales_tree.delete(*sales_tree.get_children())
-                path = os.path.join(app_dir(), "data", "audit_log.json")
-                logs = []
-                if os.path.exists(path):
-                    try:
-                        with open(path, "r", encoding="utf-8") as f:
-                            logs = json.load(f)
-                    except Exception:
-                        logs = []
+                try:
+                    logs = load_audit_logs()
+                except Exception:
+                    logs = []
 
                 manager_actions = [
                     r for r in logs
@@ -1098,5 +1065,5 @@ class DashboardFrame(ttk.Frame):
 # START
 # ==================================================
 if __name__ == "__main__":
-    preload_system_files()
+    recover_pending_transaction()
     App().mainloop()
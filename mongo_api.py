@@ -1,23 +1,59 @@
 import os
+import asyncio
 from functools import lru_cache
 from pymongo import MongoClient
 from pymongo.errors import PyMongoError
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
 
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except Exception:
+    AsyncIOMotorClient = None
 
-@lru_cache(maxsize=1)
-def _client():
+
+# MONGODB_URI=mongomock://... runs against an in-memory mongomock database
+# (tests and local runs without a server; mongomock is in requirements-dev.txt).
+MOCK_SCHEME = "mongomock://"
+
+
+def _uri() -> str:
     uri = (os.getenv("MONGODB_URI") or "").strip()
     if not uri:
         raise RuntimeError("MONGODB_URI is not set")
-    return MongoClient(
-        uri,
-        serverSelectionTimeoutMS=15000,
-        connectTimeoutMS=15000,
-        socketTimeoutMS=15000,
-        tls=True,
-        retryWrites=True,
-    )
+    return uri
+
+
+def _is_mock() -> bool:
+    return (os.getenv("MONGODB_URI") or "").strip().startswith(MOCK_SCHEME)
+
+
+def _client_options() -> dict:
+    # Shared by the sync and async clients; pool sizes are per process.
+    return {
+        "serverSelectionTimeoutMS": 15000,
+        "connectTimeoutMS": 15000,
+        "socketTimeoutMS": 15000,
+        "tls": True,
+        "retryWrites": True,
+        "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE") or 50),
+        "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE") or 0),
+    }
+
+
+@lru_cache(maxsize=1)
+def _client():
+    uri = _uri()
+    if _is_mock():
+        import mongomock
+        return mongomock.MongoClient()
+    return MongoClient(uri, **_client_options())
+
+
+@lru_cache(maxsize=1)
+def _async_client():
+    if AsyncIOMotorClient is None:
+        raise RuntimeError("motor is not installed")
+    return AsyncIOMotorClient(_uri(), **_client_options())
 
 
 def is_configured() -> bool:
@@ -32,6 +68,8 @@ def get_db():
 
 
 def ping() -> bool:
+    if _is_mock():
+        return True
     try:
         _client().admin.command("ping")
         return True
@@ -43,6 +81,17 @@ def collection(name: str):
     return get_db()[str(name).strip()]
 
 
+def async_collection(name: str):
+    """
+    Collection for async handlers: Motor against a real server. The
+    mongomock stand-in (or a missing motor) is wrapped so the same awaitable
+    calls run the sync driver in a worker thread.
+    """
+    if _is_mock() or AsyncIOMotorClient is None:
+        return _ThreadedCollection(collection(name))
+    return _async_client()[get_db().name][str(name).strip()]
+
+
 def ensure_indexes() -> dict:
     db = get_db()
     created = {}
@@ -52,21 +101,28 @@ def ensure_indexes() -> dict:
         db["sales"].create_index([("date", DESCENDING)], name="ix_sales_date_desc"),
         db["sales"].create_index([("customer_name", ASCENDING)], name="ix_sales_customer"),
         db["sales"].create_index([("phone", ASCENDING)], name="ix_sales_phone"),
+        db["sales"].create_index([("date_key", DESCENDING), ("invoice_no", DESCENDING)], name="ix_sales_date_key"),
+        db["sales"].create_index([("due", ASCENDING), ("date_key", DESCENDING)], name="ix_sales_due"),
     ]
 
     created["purchases"] = [
         db["purchases"].create_index([("purchase_id", ASCENDING)], unique=True, name="uq_purchase_id"),
         db["purchases"].create_index([("date", DESCENDING)], name="ix_purchase_date_desc"),
         db["purchases"].create_index([("supplier_name", ASCENDING)], name="ix_purchase_supplier"),
+        db["purchases"].create_index([("date_key", DESCENDING), ("purchase_id", DESCENDING)], name="ix_purchase_date_key"),
+        db["purchases"].create_index([("due", ASCENDING), ("date_key", DESCENDING)], name="ix_purchase_due"),
     ]
 
     created["inventory"] = [
         db["inventory"].create_index([("item", ASCENDING)], unique=True, name="uq_inventory_item"),
     ]
 
+    created["item_rollup"] = ensure_item_rollup_indexes(db["item_rollup"])
+
     created["audit_log"] = [
         db["audit_log"].create_index([("timestamp", DESCENDING)], name="ix_audit_ts_desc"),
         db["audit_log"].create_index([("user", ASCENDING)], name="ix_audit_user"),
+        db["audit_log"].create_index([("date_key", DESCENDING), ("_id", DESCENDING)], name="ix_audit_date_key"),
     ]
 
     created["cash_ledger"] = [
@@ -75,3 +131,109 @@ def ensure_indexes() -> dict:
     ]
 
     return created
+
+
+def ensure_item_rollup_indexes(col) -> list:
+    """Indexes of item_rollup; also applied to the collection a rebuild fills before renaming it in."""
+    return [
+        col.create_index([("item", ASCENDING)], unique=True, name="uq_item_rollup_item"),
+        # item_key for prefix search; _id breaks ties between equal keys when paging.
+        col.create_index([("item_key", ASCENDING), ("_id", ASCENDING)], name="ix_item_rollup_key_id"),
+    ]
+
+
+def seed_sequence(name: str, highest: int):
+    """Make sure sequence name will not hand out highest or below (migration, first use)."""
+    # $max keeps this safe if several workers seed at the same time.
+    collection("counters").update_one({"_id": name}, {"$max": {"seq": int(highest)}}, upsert=True)
+
+
+def next_sequence(name: str) -> int:
+    """
+    Atomically allocate the next number of a named sequence stored in the
+    counters collection ({"_id": name, "seq": last}) with a single
+    find_one_and_update. Seed it with seed_sequence() first (migration, API
+    startup); a missing counter starts from 1.
+    """
+    doc = collection("counters").find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc["seq"])
+
+
+# -------------------------------
+# Async stand-in
+# -------------------------------
+# The subset of Motor's collection/cursor API render_api uses, backed by a
+# sync collection. Each call runs in the default executor.
+async def _in_thread(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(None, lambda: fn(*args, **kwargs))
+
+
+class _ThreadedCursor:
+    def __init__(self, make):
+        # make() builds the sync cursor; deferred so aggregate() runs in the
+        # worker thread too.
+        self._make = make
+        self._chain = []
+        self._rows = None
+        self._batch = 100
+
+    def sort(self, *args, **kwargs):
+        self._chain.append(("sort", args, kwargs))
+        return self
+
+    def limit(self, n):
+        self._chain.append(("limit", (n,), {}))
+        return self
+
+    def batch_size(self, n):
+        self._batch = max(1, int(n))
+        return self
+
+    def _take(self, n):
+        if self._rows is None:
+            cursor = self._make()
+            for name, args, kwargs in self._chain:
+                cursor = getattr(cursor, name)(*args, **kwargs)
+            self._rows = iter(cursor)
+        rows = []
+        for row in self._rows:
+            rows.append(row)
+            if n is not None and len(rows) >= n:
+                break
+        return rows
+
+    async def to_list(self, length=None):
+        return await _in_thread(self._take, length)
+
+    async def __aiter__(self):
+        while True:
+            rows = await _in_thread(self._take, self._batch)
+            for row in rows:
+                yield row
+            if len(rows) < self._batch:
+                return
+
+
+class _ThreadedCollection:
+    def __init__(self, col):
+        self._col = col
+
+    def find(self, *args, **kwargs):
+        return _ThreadedCursor(lambda: self._col.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        return _ThreadedCursor(lambda: self._col.aggregate(pipeline, **kwargs))
+
+    async def find_one(self, *args, **kwargs):
+        return await _in_thread(self._col.find_one, *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs):
+        return await _in_thread(self._col.count_documents, *args, **kwargs)
+
+    async def estimated_document_count(self, *args, **kwargs):
+        return await _in_thread(self._col.estimated_document_count, *args, **kwargs)
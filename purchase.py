@@ -3,6 +3,11 @@ import json
 import os
 from datetime import datetime
 from utils import app_dir
+from journal_store import JournalStore
+import sqlite_store
+import item_aggregates
+from transaction import unit_of_work
+from counters import next_sequence, id_number
 
 # ================= PATH =================
 BASE_DIR = app_dir()
@@ -10,36 +15,47 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 PURCHASE_FILE = os.path.join(DATA_DIR, "purchase.json")
+# purchase.json stays the snapshot; new purchases go to purchase.journal.jsonl.
+PURCHASE_STORE = JournalStore(PURCHASE_FILE, key_field="purchase_id")
 
 
 # ================= FILE HELPERS =================
 def load_purchases():
-    if not os.path.exists(PURCHASE_FILE):
-        return []
-    with open(PURCHASE_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_purchases()
+    return PURCHASE_STORE.load()
 
 
 def save_purchases(data):
-    with open(PURCHASE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    if sqlite_store.is_enabled():
+        sqlite_store.save_purchases(data)
+        return
+    PURCHASE_STORE.save(data)
+
+
+def put_purchase(record):
+    # Insert or update one purchase with a single journal append.
+    if sqlite_store.is_enabled():
+        sqlite_store.put_purchase(record)
+        return
+    PURCHASE_STORE.put(record)
 
 
 # ================= PURCHASE ID =================
-def generate_purchase_id(purchases):
-    if not purchases:
-        return "P0001"
-    last = purchases[-1]["purchase_id"]
-    num = int(last.replace("P", ""))
-    return f"P{num + 1:04d}"
+def generate_purchase_id(purchases=None):
+    # O(1) counter in counters.json; history is scanned only to seed it the
+    # first time (or after counters.json was deleted).
+    num = next_sequence(
+        "purchase_id",
+        seed=lambda: max(
+            [id_number(p.get("purchase_id"), "P") for p in (purchases if purchases is not None else load_purchases())] or [0]
+        ),
+    )
+    return f"P{num:04d}"
 
 
 # ================= CORE SAVE =================
 def create_purchase(supplier_id, supplier_name, items, payment_type, paid_amount):
-    purchases = load_purchases()
-
-    purchase_id = generate_purchase_id(purchases)
-
     purchase_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     subtotal = sum(i["qty"] * i["rate"] for i in items)
@@ -51,31 +67,36 @@ def create_purchase(supplier_id, supplier_name, items, payment_type, paid_amount
     if due < 0:
         due = 0.0
 
-    record = {
-        "purchase_id": purchase_id,
-        "date": purchase_date,
-        "supplier_id": supplier_id,
-        "supplier_name": supplier_name,
-        "items": items,
-        "subtotal": round(subtotal, 2),
-        "gst_total": round(gst_total, 2),
-        "grand_total": round(grand_total, 2),
-        "paid_amount": paid,
-        "due": due,
-        "payment_mode": payment_type
-    }
-
-    purchases.append(record)
-    save_purchases(purchases)
-
-    # 🔹 Cash Ledger Entry
-    if payment_type == "Cash" and paid > 0:
-        from cash_ledger import add_cash_entry
-        add_cash_entry(
-            date=purchase_date,
-            particulars=f"Cash Purchase {purchase_id}",
-            cash_out=paid,
-            reference=purchase_id
-        )
+    # The id is only used up if the purchase commits.
+    with unit_of_work("purchase"):
+        purchase_id = generate_purchase_id()
+
+        record = {
+            "purchase_id": purchase_id,
+            "date": purchase_date,
+            "supplier_id": supplier_id,
+            "supplier_name": supplier_name,
+            "items": items,
+            "subtotal": round(subtotal, 2),
+            "gst_total": round(gst_total, 2),
+            "grand_total": round(grand_total, 2),
+            "paid_amount": paid,
+            "due": due,
+            "payment_mode": payment_type
+        }
+
+        before = item_aggregates.begin_update()
+        put_purchase(record)
+        item_aggregates.record_purchase(record, before)
+
+        # 🔹 Cash Ledger Entry
+        if payment_type == "Cash" and paid > 0:
+            from cash_ledger import add_cash_entry
+            add_cash_entry(
+                date=purchase_date,
+                particulars=f"Cash Purchase {purchase_id}",
+                cash_out=paid,
+                reference=purchase_id
+            )
 
     return record
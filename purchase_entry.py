@@ -4,9 +4,10 @@ from tkinter import ttk, messagebox
 
 from audit_log import write_audit_log
 from suppliers import get_all_suppliers, add_supplier
-from inventory import add_stock, get_available_items, get_item_stock
+from inventory import apply_stock_movements, get_available_items
 from purchase import create_purchase
-from item_summary_report import adjust_item_summary_available_qty, set_item_summary_override
+from transaction import unit_of_work
+from autocomplete import suggest, debounce
 from ui_theme import compact_form_grid
 
 UNIT_OPTIONS = ["Nos", "Kg", "Litre", "Metre"]
@@ -44,7 +45,7 @@ class PurchaseEntry(ttk.Frame):
         )
         self.supplier_cb.grid(row=0, column=1, padx=5)
         
-        self.supplier_cb.bind("<KeyRelease>", self.filter_suppliers)
+        self.supplier_cb.bind("<KeyRelease>", debounce(self, self.filter_suppliers))
         self.supplier_cb.bind("<<ComboboxSelected>>", self.autofill_supplier)
         self.supplier_cb.bind("<FocusOut>", self.on_supplier_focus_out)
         self.supplier_cb.bind("<Down>", self.on_supplier_down_key)
@@ -90,7 +91,7 @@ class PurchaseEntry(ttk.Frame):
 
         self.item_entry = ttk.Combobox(add, width=25, values=self.item_values_all)
         self.item_entry.grid(row=0, column=1, padx=5)
-        self.item_entry.bind("<KeyRelease>", self.filter_items_live)
+        self.item_entry.bind("<KeyRelease>", debounce(self, self.filter_items_live))
         self.item_entry.bind("<FocusOut>", self.on_item_focus_out)
         self.item_entry.bind("<Down>", self.on_item_down_key)
 
@@ -313,7 +314,7 @@ class PurchaseEntry(ttk.Frame):
             self._hide_supplier_suggestions()
             return
 
-        matches = [n for n in self.supplier_values_all if typed in n.lower()]
+        matches = suggest(self.supplier_values_all, typed)
         self.supplier_cb["values"] = matches if matches else self.supplier_values_all
         self._show_supplier_suggestions(matches)
 
@@ -422,7 +423,7 @@ class PurchaseEntry(ttk.Frame):
             self._hide_item_suggestions()
             return
 
-        matches = [n for n in self.item_values_all if typed in n.lower()]
+        matches = suggest(self.item_values_all, typed)
         self.item_entry.configure(values=matches if matches else self.item_values_all)
         self._show_item_suggestions(matches)
 
@@ -583,32 +584,28 @@ class PurchaseEntry(ttk.Frame):
             messagebox.showerror("Error", "Invalid paid amount")
             return
 
-        record = create_purchase(
-            supplier_id=supplier_id,
-            supplier_name=supplier_name,
-            items=self.items,
-            payment_type=self.pay_mode_var.get().strip() or "Cash",
-            paid_amount=paid
-        )
+        with unit_of_work("purchase entry"):
+            record = create_purchase(
+                supplier_id=supplier_id,
+                supplier_name=supplier_name,
+                items=self.items,
+                payment_type=self.pay_mode_var.get().strip() or "Cash",
+                paid_amount=paid
+            )
 
-        for i in self.items:
-            add_stock(
-                item_name=i["item"],
-                qty=i["qty"],
-                rate=i["rate"]
+            # One inventory write for all lines; also forces Item Summary
+            # available qty to match real inventory stock after purchase save.
+            apply_stock_movements(
+                [{"item": i["item"], "qty": i["qty"], "rate": i["rate"]} for i in self.items],
+                reason="purchase"
+            )
+
+            write_audit_log(
+                user="admin",
+                module="purchase",
+                action="create",
+                reference=record["purchase_id"]
             )
-            # Keep Item Summary available_qty override (if any) in sync with purchase stock addition.
-            adjust_item_summary_available_qty(i["item"], i["qty"])
-            # Force Item Summary available qty to match real inventory stock after purchase save.
-            current_stock = get_item_stock(i["item"])
-            set_item_summary_override(i["item"], available_qty=current_stock)
-
-        write_audit_log(
-            user="admin",
-            module="purchase",
-            action="create",
-            reference=record["purchase_id"]
-        )
 
         messagebox.showinfo("Saved", "Purchase saved successfully")
         self.reset_form_for_next_purchase()
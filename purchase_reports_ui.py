@@ -10,6 +10,9 @@ from report_pdf import generate_purchase_report_pdf, generate_purchase_items_pdf
 from utils_print import print_pdf
 from utils import app_dir
 from date_picker import open_date_picker
+from autocomplete import suggest, debounce
+from virtual_tree import VirtualTree
+from ui_tasks import TaskStatus
 from ui_theme import compact_form_grid
 
 
@@ -18,7 +21,7 @@ class PurchaseReportsUI(ttk.Frame):
         super().__init__(parent)
         self.pack(fill="both", expand=True)
 
-        self.purchases = load_purchases()
+        self.purchases = []
         self.filtered_rows = []
         self.filtered_purchases = []
         self.row_purchase_map = {}
@@ -30,6 +33,7 @@ class PurchaseReportsUI(ttk.Frame):
         self.supplier_suggest_list = None
 
         self.build_ui()
+        self.load_filter_values()
 
     # ==================================================
     # UI
@@ -94,14 +98,14 @@ class PurchaseReportsUI(ttk.Frame):
         ttk.Label(filter_frame, text="Item").grid(row=2, column=0, sticky="w")
         self.item_cb = ttk.Combobox(filter_frame, width=30)
         self.item_cb.grid(row=2, column=1, columnspan=3, sticky="w")
-        self.item_cb.bind("<KeyRelease>", self.on_item_search)
+        self.item_cb.bind("<KeyRelease>", debounce(self, self.on_item_search))
         self.item_cb.bind("<FocusOut>", self.on_item_focus_out)
         self.item_cb.bind("<Down>", self.on_item_down_key)
 
         ttk.Label(filter_frame, text="Supplier").grid(row=3, column=0, sticky="w")
         self.supplier_cb = ttk.Combobox(filter_frame, width=30)
         self.supplier_cb.grid(row=3, column=1, columnspan=3, sticky="w")
-        self.supplier_cb.bind("<KeyRelease>", self.on_supplier_search)
+        self.supplier_cb.bind("<KeyRelease>", debounce(self, self.on_supplier_search))
         self.supplier_cb.bind("<FocusOut>", self.on_supplier_focus_out)
         self.supplier_cb.bind("<Down>", self.on_supplier_down_key)
 
@@ -109,8 +113,6 @@ class PurchaseReportsUI(ttk.Frame):
         self.supplier_cb.grid_remove()
         compact_form_grid(filter_frame)
 
-        self.load_filter_values()
-
         table_wrap = ttk.Frame(self)
         table_wrap.pack(fill="both", expand=True, padx=30, pady=10)
 
@@ -135,9 +137,12 @@ class PurchaseReportsUI(ttk.Frame):
         self.tree.pack(fill="both", expand=True)
         self.tree.bind("<Double-1>", self.on_row_double_click)
         self.tree.bind("<<TreeviewSelect>>", self.on_selection_change)
+        self.view = VirtualTree(self.tree)
 
         action_bar = ttk.Frame(self)
         action_bar.pack(pady=10)
+        self.tasks = TaskStatus(self)
+        self.tasks.pack(anchor="w", padx=30)
 
         ttk.Button(
             action_bar, text="Export Excel",
@@ -178,16 +183,17 @@ class PurchaseReportsUI(ttk.Frame):
     # LOAD FILTER VALUES
     # ==================================================
     def load_filter_values(self):
+        self.tasks.run(self._read_filter_values, on_done=self._apply_filter_values, text="Loading purchases...")
+
+    def _read_filter_values(self, _task):
+        purchases = load_purchases()
         items = set()
-        for p in self.purchases:
+        for p in purchases:
             for it in p.get("items", []):
                 item_name = it.get("item") or it.get("name")
                 if item_name:
                     items.add(item_name)
 
-        self.item_values_all = sorted(items)
-        self.item_cb["values"] = self.item_values_all
-
         suppliers = get_all_suppliers()
         supplier_names = []
         for s in suppliers.values():
@@ -199,24 +205,37 @@ class PurchaseReportsUI(ttk.Frame):
             name = str(raw_name or "").strip()
             if name:
                 supplier_names.append(name)
-        self.supplier_values_all = sorted(set(supplier_names), key=str.lower)
+        return purchases, sorted(items), sorted(set(supplier_names), key=str.lower)
+
+    def _apply_filter_values(self, result):
+        self.purchases, self.item_values_all, self.supplier_values_all = result
+        self.item_cb["values"] = self.item_values_all
         self.supplier_cb["values"] = self.supplier_values_all
 
     # ==================================================
     # LOAD REPORT
     # ==================================================
     def load_report(self):
-        self.tree.delete(*self.tree.get_children())
-        self.filtered_rows.clear()
-        self.filtered_purchases.clear()
-        self.row_purchase_map.clear()
-
+        if self.tasks.busy("Loading purchases..."):
+            self.after(100, self.load_report)
+            return
         mode = self.filter_var.get()
         from_d = self.parse_date(self.from_date.get().strip())
         to_d = self.parse_date(self.to_date.get().strip())
+        supplier = self.supplier_cb.get()
+        selected_item = self.item_cb.get()
+        purchases = self.purchases
+
+        def work(task):
+            return self._filter_purchases(task, purchases, mode, from_d, to_d, supplier, selected_item)
 
+        self.tasks.run(work, on_done=self._show_report, text="Loading report...")
+
+    def _filter_purchases(self, task, purchases, mode, from_d, to_d, supplier, selected_item):
         filtered_with_key = []
-        for i, p in enumerate(self.purchases, start=1):
+        for i, p in enumerate(purchases, start=1):
+            if i % 2000 == 0:
+                task.check()
             raw_date = p.get("date", "")
             p_date = self.parse_date(raw_date)
 
@@ -226,11 +245,10 @@ class PurchaseReportsUI(ttk.Frame):
                 continue
 
             if mode == "supplier":
-                if p.get("supplier_name") != self.supplier_cb.get():
+                if p.get("supplier_name") != supplier:
                     continue
 
             if mode == "item":
-                selected_item = self.item_cb.get()
                 if selected_item:
                     found = any((it.get("item") or it.get("name")) == selected_item for it in p.get("items", []))
                     if not found:
@@ -248,24 +266,25 @@ class PurchaseReportsUI(ttk.Frame):
             filtered_with_key.append((p_date or datetime.min, row, p))
 
         filtered_with_key.sort(key=lambda x: x[0], reverse=True)
-        for _sort_date, row, p in filtered_with_key:
-            self.filtered_rows.append(row)
-            self.filtered_purchases.append(p)
-            iid = self.tree.insert("", "end", values=row)
-            self.row_purchase_map[iid] = p
+        return [row for _d, row, _p in filtered_with_key], [p for _d, _row, p in filtered_with_key]
+
+    def _show_report(self, result):
+        self.filtered_rows, self.filtered_purchases = result
+        self.row_purchase_map = {str(idx): p for idx, p in enumerate(self.filtered_purchases)}
+        self.view.set_rows(self.filtered_rows)
 
         if not self.filtered_rows:
             messagebox.showinfo("Info", "No records found")
         self.on_selection_change()
 
     def on_selection_change(self, _event=None):
-        selected = self.tree.selection()
+        selected = self.view.selection()
         if not selected:
             self.selected_summary_var.set("Selected: 0 | Amount: 0.00")
             return
         amount = 0.0
         for iid in selected:
-            vals = self.tree.item(iid, "values")
+            vals = self.view.values(iid)
             if not vals:
                 continue
             try:
@@ -300,7 +319,7 @@ class PurchaseReportsUI(ttk.Frame):
             self.item_cb["values"] = self.item_values_all
             self._hide_item_suggestions()
             return
-        filtered = [name for name in self.item_values_all if typed in name.lower()]
+        filtered = suggest(self.item_values_all, typed)
         self.item_cb["values"] = filtered
         if self.filter_var.get() != "item":
             return
@@ -383,7 +402,7 @@ class PurchaseReportsUI(ttk.Frame):
             self._hide_supplier_suggestions()
             return
 
-        filtered = [name for name in self.supplier_values_all if typed in name.lower()]
+        filtered = suggest(self.supplier_values_all, typed)
         self.supplier_cb["values"] = filtered
         if self.filter_var.get() != "supplier":
             return
@@ -465,7 +484,7 @@ class PurchaseReportsUI(ttk.Frame):
             return
         purchase = self.row_purchase_map.get(iid)
         if purchase is None:
-            idx = self.tree.index(iid)
+            idx = self.view.row_index(iid)
             if idx < 0 or idx >= len(self.filtered_purchases):
                 return
             purchase = self.filtered_purchases[idx]
@@ -650,12 +669,19 @@ class PurchaseReportsUI(ttk.Frame):
     # ==================================================
     def export_excel(self):
         from export_excel import export_purchase_report_excel
-        export_purchase_report_excel(self.filtered_rows)
+        rows = list(self.filtered_rows)
+        self.tasks.run(lambda _task: export_purchase_report_excel(rows), text="Exporting Excel...")
 
     def export_pdf(self):
-        generate_purchase_report_pdf(self.filtered_rows)
+        rows = list(self.filtered_rows)
+        self.tasks.run(lambda _task: generate_purchase_report_pdf(rows), text="Creating PDF...")
 
     def print_report(self):
-        path = generate_purchase_report_pdf(self.filtered_rows)
-        print_pdf(path)
+        rows = list(self.filtered_rows)
+        self.tasks.run(
+            lambda _task: generate_purchase_report_pdf(rows),
+            on_done=print_pdf,
+            text="Creating PDF...",
+            key="print",
+        )
 
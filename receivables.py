@@ -0,0 +1,237 @@
+# receivables.py
+
+import os
+import json
+import threading
+from utils import app_dir
+import data_cache
+import durable_io
+from journal_store import journal_path_for
+import sqlite_store
+
+# ================= PATH =================
+BASE_DIR = app_dir()
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+RECEIVABLES_FILE = os.path.join(DATA_DIR, "receivables.json")
+SIGNATURE_FILE = os.path.join(DATA_DIR, "receivables.sig.json")
+SALES_FILE = os.path.join(DATA_DIR, "sales.json")
+
+# Open invoices per customer, kept up to date by create_sale,
+# cancel_invoice and the due payment functions in sales.py, so the due
+# report and payment allocation read one customer's invoices instead of
+# scanning every sale.
+#
+# receivables.json:
+#   {"customers": {key: {"name", "phone", "due",
+#                        "invoices": [{"invoice_no", "date_key", "due"}]}}}
+# receivables.sig.json:
+#   {"source": {...},   sales files right after our last update
+#    "table": [...]}    receivables.json as we wrote it
+#
+# key is the phone, or "name:<lowercased name>" for sales without one.
+# Only invoices with due > 0 that are not cancelled are listed, newest
+# first (the order payments are allocated in). As with item_aggregates, a
+# sales change that did not pass through here is noticed through the
+# signature file and the index is rebuilt on next read. In SQLite mode the sales
+# table already has a partial index on due > 0 and is queried directly.
+
+_lock = threading.RLock()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _source_signature():
+    paths = [SALES_FILE, journal_path_for(SALES_FILE)]
+    # Relative keys, as in item_aggregates.
+    return {os.path.relpath(path, DATA_DIR): list(data_cache.file_signature(path) or []) for path in paths}
+
+
+def _read_receivables():
+    if not os.path.exists(RECEIVABLES_FILE):
+        return {}
+    with open(RECEIVABLES_FILE, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _read_signature():
+    if not os.path.exists(SIGNATURE_FILE):
+        return {}
+    with open(SIGNATURE_FILE, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _signed_source():
+    """Sales signature the index on disk was built from, or None if unknown."""
+    data = data_cache.load(SIGNATURE_FILE, _read_signature)
+    if data.get("table") != list(data_cache.file_signature(RECEIVABLES_FILE) or []):
+        return None
+    return data.get("source")
+
+
+def _save_receivables(customers):
+    data = {"customers": customers}
+    durable_io.write_json(RECEIVABLES_FILE, data, indent=None)
+    data_cache.store(RECEIVABLES_FILE, data)
+    # Inside a group the index and the sales files land at commit.
+    durable_io.after_commit(_sign_receivables)
+
+
+def _sign_receivables():
+    with _lock:
+        data = {
+            "source": _source_signature(),
+            "table": list(data_cache.file_signature(RECEIVABLES_FILE) or []),
+        }
+        durable_io.write_json(SIGNATURE_FILE, data, indent=None)
+        data_cache.store(SIGNATURE_FILE, data)
+
+
+def customer_key(phone, name):
+    phone = str(phone or "").strip()
+    if phone:
+        return phone
+    return "name:" + str(name or "").strip().lower()
+
+
+def _is_open(sale):
+    return not sale.get("cancelled") and _to_float(sale.get("due", 0)) > 0
+
+
+def _place(customers, sale):
+    """Add, update or drop one invoice in customers (changed in place)."""
+    invoice_no = str(sale.get("invoice_no", "")).strip()
+    if not invoice_no:
+        return
+    key = customer_key(sale.get("phone"), sale.get("customer_name"))
+    row = customers.get(key)
+    invoices = [inv for inv in (row or {}).get("invoices", []) if inv.get("invoice_no") != invoice_no]
+
+    if _is_open(sale):
+        entry = {
+            "invoice_no": invoice_no,
+            "date_key": sqlite_store.date_key(sale.get("date")),
+            "due": round(_to_float(sale.get("due", 0)), 2),
+        }
+        # Newest first; an invoice goes after others with the same date.
+        pos = 0
+        while pos < len(invoices) and invoices[pos]["date_key"] >= entry["date_key"]:
+            pos += 1
+        invoices.insert(pos, entry)
+
+    if not invoices:
+        customers.pop(key, None)
+        return
+    customers[key] = {
+        "name": str(sale.get("customer_name", "")).strip() or (row or {}).get("name", ""),
+        "phone": str(sale.get("phone", "")).strip(),
+        "due": round(sum(inv["due"] for inv in invoices), 2),
+        "invoices": invoices,
+    }
+
+
+# ================= BUILD =================
+def _compute_from_history():
+    from sales import load_sales
+
+    customers = {}
+    for s in load_sales():
+        if _is_open(s):
+            _place(customers, s)
+    return customers
+
+
+def rebuild_receivables():
+    """Recompute the whole index from sales."""
+    with _lock:
+        signature = _source_signature()
+        customers = _compute_from_history()
+        # Only keep the result if nothing was written while we were scanning.
+        if _source_signature() == signature:
+            _save_receivables(customers)
+        return customers
+
+
+def _load_customers():
+    with _lock:
+        data = data_cache.load(RECEIVABLES_FILE, _read_receivables)
+        if _signed_source() != _source_signature() or not isinstance(data.get("customers"), dict):
+            return rebuild_receivables()
+        return data["customers"]
+
+
+# ================= INCREMENTAL UPDATES =================
+def begin_update():
+    """
+    Source signature to pass to record_sales; take it just before writing
+    the sales so the update can tell whether the index was current.
+    """
+    if sqlite_store.is_enabled():
+        return None
+    return _source_signature()
+
+
+def record_sales(records, before_signature):
+    """Apply invoices just written by put_sale (new, paid or cancelled)."""
+    if sqlite_store.is_enabled():
+        return
+    with _lock:
+        data = data_cache.load(RECEIVABLES_FILE, _read_receivables)
+        customers = data.get("customers")
+        if _signed_source() != before_signature or not isinstance(customers, dict):
+            # Index was already behind; a rebuild picks up these writes too.
+            rebuild_receivables()
+            return
+
+        customers = dict(customers)
+        for record in records:
+            _place(customers, record)
+        _save_receivables(customers)
+
+
+# ================= QUERIES =================
+def open_invoice_numbers(phone="", name=""):
+    """
+    Invoice numbers with a due, newest first: every customer's, or those
+    of the customer with this phone or name.
+    """
+    customers = _load_customers()
+    phone = str(phone or "").strip()
+    name = str(name or "").strip().lower()
+    if not phone and not name:
+        rows = list(customers.values())
+    else:
+        rows = [customers[phone]] if phone in customers else []
+        if name:
+            rows += [
+                row for key, row in customers.items()
+                if key != phone and str(row.get("name", "")).strip().lower() == name
+            ]
+    invoices = [inv for row in rows for inv in row.get("invoices", [])]
+    if len(rows) > 1:
+        invoices.sort(key=lambda inv: inv["date_key"], reverse=True)
+    return [inv["invoice_no"] for inv in invoices]
+
+
+def due_customers():
+    """[{"customer", "phone", "due"}] for every customer with an open invoice."""
+    if sqlite_store.is_enabled():
+        return sqlite_store.due_customers()
+    return [
+        {"customer": row.get("name", ""), "phone": row.get("phone", ""), "due": row.get("due", 0.0)}
+        for row in _load_customers().values()
+    ]
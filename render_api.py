@@ -1,11 +1,17 @@
 from typing import Optional, List
 import os
+import re
+import asyncio
 import json
+import time
+import io
+import tempfile
+import zipfile
 from datetime import datetime
-from pathlib import Path
 
-from fastapi import FastAPI, Header, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 
 from cash_ledger import add_cash_entry
@@ -16,13 +22,28 @@ try:
         is_configured as mongo_is_configured,
         collection as mongo_collection,
         ensure_indexes as mongo_ensure_indexes,
+        ensure_item_rollup_indexes,
         ping as mongo_ping,
+        next_sequence as mongo_next_sequence,
+        seed_sequence as mongo_seed_sequence,
+        async_collection as mongo_async_collection,
     )
+    from pymongo import UpdateOne
+    from pymongo.errors import DuplicateKeyError
+    from bson import ObjectId, json_util
 except Exception:
     mongo_is_configured = None
     mongo_collection = None
     mongo_ensure_indexes = None
+    ensure_item_rollup_indexes = None
     mongo_ping = None
+    mongo_next_sequence = None
+    mongo_seed_sequence = None
+    mongo_async_collection = None
+    UpdateOne = None
+    DuplicateKeyError = None
+    ObjectId = None
+    json_util = None
 
 
 app = FastAPI(
@@ -37,6 +58,9 @@ def _startup_init_indexes():
     if _mongo_enabled() and mongo_ensure_indexes:
         try:
             mongo_ensure_indexes()
+            _seed_sequences()
+            _backfill_date_keys()
+            _ensure_item_rollup()
         except Exception:
             # Keep API booting; /health will show degraded if mongo is unreachable.
             pass
@@ -102,6 +126,137 @@ def _require_mongo():
         )
 
 
+# Stored alongside "date" on sales/purchases: "YYYY-MM-DD HH:MM:SS" sorts
+# and range-filters correctly as a string, so list endpoints can sort,
+# filter and limit in Mongo. Left out of API responses.
+DATE_KEY = "date_key"
+ROW_PROJECTION = {"_id": 0, DATE_KEY: 0}
+SALES_SORT = [(DATE_KEY, -1), ("invoice_no", -1)]
+PURCHASES_SORT = [(DATE_KEY, -1), ("purchase_id", -1)]
+AUDIT_SORT = [(DATE_KEY, -1), ("_id", -1)]
+# Field each collection's date_key is derived from.
+DATE_SOURCE_FIELDS = {"sales": "date", "purchases": "date", "audit_log": "timestamp"}
+
+
+def _date_key(value) -> str:
+    parsed = _parse_date(str(value or ""))
+    return "" if parsed == datetime.min else parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _backfill_date_keys():
+    """Add date_key to documents written before it existed."""
+    for coll_name, source in DATE_SOURCE_FIELDS.items():
+        col = mongo_collection(coll_name)
+        ops = [
+            UpdateOne({"_id": rec["_id"]}, {"$set": {DATE_KEY: _date_key(rec.get(source))}})
+            for rec in col.find({DATE_KEY: {"$exists": False}}, {source: 1})
+        ]
+        for start in range(0, len(ops), 1000):
+            col.bulk_write(ops[start:start + 1000], ordered=False)
+
+
+# -------------------------------
+# Keyset pagination / streaming
+# -------------------------------
+# List endpoints page with after=<date_key>,<id> taken from the previous
+# page's next_after, so page N costs the same as page 1. format=ndjson
+# streams every matching row straight from the cursor instead.
+STREAM_BATCH_SIZE = 500
+
+
+def _after_filter(after: str, sort) -> dict:
+    date_field, id_field = sort[0][0], sort[1][0]
+    date_part, sep, id_part = str(after or "").partition(",")
+    if not sep or not id_part.strip():
+        raise HTTPException(status_code=400, detail="after must be '<date>,<id>'.")
+    key = id_part.strip()
+    if id_field == "_id":
+        try:
+            key = ObjectId(key)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid after cursor.")
+    date_part = date_part.strip()
+    return {
+        "$or": [
+            {date_field: {"$lt": date_part}},
+            {date_field: date_part, id_field: {"$lt": key}},
+        ]
+    }
+
+
+def _cursor_token(row: dict, sort) -> str:
+    id_value = row.get(sort[1][0], "")
+    return f"{row.get(DATE_KEY, '')},{id_value}"
+
+
+def _public_row(row: dict) -> dict:
+    row.pop(DATE_KEY, None)
+    row.pop("_id", None)
+    return row
+
+
+async def _stream_rows(cursor):
+    async for row in cursor:
+        yield json.dumps(_jsonable_doc(_public_row(row)), ensure_ascii=False, default=str) + "\n"
+
+
+async def _list_response(coll_name: str, query: dict, sort, limit: int = 0, after: str = "", fmt: str = "json", count=None):
+    """
+    One page of rows (limit 0 = all) plus next_after, or with fmt="ndjson"
+    a streaming response of every row matching query after the cursor.
+    count: total to report; defaults to count_documents(query).
+    """
+    _require_mongo()
+    col = mongo_async_collection(coll_name)
+    page_query = {"$and": [query, _after_filter(after, sort)]} if after else query
+    # _id is kept only when it is the tie-breaker of the cursor.
+    projection = None if sort[1][0] == "_id" else {"_id": 0}
+    cursor = col.find(page_query, projection).sort(sort)
+
+    if str(fmt or "").strip().lower() == "ndjson":
+        return StreamingResponse(
+            _stream_rows(cursor.batch_size(STREAM_BATCH_SIZE)),
+            media_type="application/x-ndjson",
+        )
+
+    if limit:
+        cursor = cursor.limit(limit)
+    rows = await cursor.to_list(length=None)
+    next_after = _cursor_token(rows[-1], sort) if limit and len(rows) == limit else None
+    rows = [_public_row(r) for r in rows]
+    total = count if count is not None else await col.count_documents(query)
+    return {"count": total, "rows": rows, "next_after": next_after}
+
+
+def _contains(text: str) -> dict:
+    return {"$regex": re.escape(text), "$options": "i"}
+
+
+def _ledger_query(customer="", phone="", item="", from_date="", to_date="") -> dict:
+    c = str(customer or "").strip()
+    p = str(phone or "").strip()
+    it = str(item or "").strip()
+    fd = str(from_date or "").strip()
+    td = str(to_date or "").strip()
+
+    query = {"cancelled": {"$ne": True}}
+    if c:
+        query["customer_name"] = _contains(c)
+    if p:
+        query["phone"] = _contains(p)
+    if it:
+        query["$or"] = [{"items.item": _contains(it)}, {"items.name": _contains(it)}]
+    date_range = {}
+    if fd:
+        date_range["$gte"] = fd
+    if td:
+        # Whole to_date day included.
+        date_range["$lte"] = td + " 23:59:59"
+    if date_range:
+        query[DATE_KEY] = date_range
+    return query
+
+
 def _mongo_load_rows(coll_name: str) -> List[dict]:
     _require_mongo()
     rows = []
@@ -112,78 +267,170 @@ def _mongo_load_rows(coll_name: str) -> List[dict]:
     return rows
 
 
-def _mongo_replace_rows(coll_name: str, rows: List[dict]):
+# Writes touch only the documents a request changes: one insert per new
+# sale/purchase, update_one for edits and $inc bulk_writes for stock, so
+# concurrent requests do not overwrite each other's rows.
+def _mongo_insert_row(coll_name: str, rec: dict):
     _require_mongo()
-    col = mongo_collection(coll_name)
-    col.delete_many({})
-    if rows:
-        col.insert_many(rows)
+    # insert_one adds _id to the dict it is given; keep the caller's clean.
+    doc = dict(rec)
+    if "date" in doc:
+        doc[DATE_KEY] = _date_key(doc.get("date"))
+    mongo_collection(coll_name).insert_one(doc)
+    _invalidate_dashboard_cache()
 
 
-def _load_sales_rows() -> List[dict]:
-    return _mongo_load_rows("sales")
+# Edits are optimistic: a document carries a "version" that every update
+# checks and bumps, so an update based on a stale read matches nothing and
+# the caller re-reads and retries instead of overwriting another request.
+VERSION_FIELD = "version"
+UPDATE_RETRIES = 5
 
 
-def _save_sales_rows(rows: List[dict]):
-    _mongo_replace_rows("sales", rows)
+def _mongo_update_row(coll_name: str, key_field: str, key: str, fields: dict, version=None) -> bool:
+    """$set fields if the document is still at version (None = never versioned)."""
+    _require_mongo()
+    expected = {"$exists": False} if version is None else version
+    result = mongo_collection(coll_name).update_one(
+        {key_field: key, VERSION_FIELD: expected},
+        {"$set": fields, "$inc": {VERSION_FIELD: 1}},
+    )
+    if not result.modified_count:
+        return False
+    _invalidate_dashboard_cache()
+    return True
 
 
-def _load_purchase_rows() -> List[dict]:
-    return _mongo_load_rows("purchases")
+def _insert_sale_row(rec: dict):
+    _mongo_insert_row("sales", rec)
+
+
+def _find_sale_row(invoice_no: str) -> Optional[dict]:
+    _require_mongo()
+    return mongo_collection("sales").find_one({"invoice_no": invoice_no}, ROW_PROJECTION)
 
 
-def _save_purchase_rows(rows: List[dict]):
-    _mongo_replace_rows("purchases", rows)
+def _insert_purchase_row(rec: dict):
+    _mongo_insert_row("purchases", rec)
 
 
-def _load_inventory_map() -> dict:
-    inv = {}
-    for rec in _mongo_load_rows("inventory"):
-        item = str(rec.get("item", "")).strip()
+def _apply_stock_deltas(lines: List[dict], set_rate: bool):
+    """
+    One bulk_write of $inc stock updates for lines [{"item", "qty", "rate"}]
+    (qty signed). Missing items are created. With set_rate, a positive rate
+    replaces the item rate (purchases); otherwise it only seeds new items.
+    """
+    _require_mongo()
+    ops = []
+    for line in lines:
+        item = str(line.get("item") or "").strip()
         if not item:
             continue
-        inv[item] = {
-            "stock": _safe_float(rec.get("stock", 0)),
-            "rate": _safe_float(rec.get("rate", 0)),
-        }
-    return inv
-
+        rate = _safe_float(line.get("rate", 0))
+        update = {"$inc": {"stock": _safe_float(line.get("qty", 0))}}
+        if set_rate and rate > 0:
+            update["$set"] = {"rate": rate}
+        else:
+            update["$setOnInsert"] = {"rate": rate if not set_rate else 0.0}
+        ops.append(UpdateOne({"item": item}, update, upsert=True))
+    if ops:
+        mongo_collection("inventory").bulk_write(ops, ordered=True)
+        _invalidate_dashboard_cache()
+
+
+def _reserve_stock(items: List[dict]) -> List[tuple]:
+    """
+    Take sale quantities out of inventory with one conditional $inc per item
+    ({"stock": {"$gte": qty}}), so parallel sales cannot oversell. If an item
+    is short, what was already taken is put back and a 400 raised. Returns
+    [(item, qty)] for _release_stock.
+    """
+    _require_mongo()
+    wanted = {}
+    for i in items:
+        item = str(i.get("item") or i.get("name") or "").strip()
+        qty = _safe_float(i.get("qty", 0))
+        if item and qty > 0:
+            wanted[item] = wanted.get(item, 0.0) + qty
 
-def _save_inventory_map(inv: dict):
-    rows = []
-    for item, rec in inv.items():
-        rows.append(
-            {
-                "item": item,
-                "stock": round(_safe_float(rec.get("stock", 0)), 2),
-                "rate": round(_safe_float(rec.get("rate", 0)), 2),
-            }
-        )
-    _mongo_replace_rows("inventory", rows)
+    col = mongo_collection("inventory")
+    taken = []
+    try:
+        for item, qty in wanted.items():
+            result = col.update_one({"item": item, "stock": {"$gte": qty}}, {"$inc": {"stock": -qty}})
+            if not result.modified_count:
+                available = _get_item_stock_api(item)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Insufficient stock for {item}. Available: {available:.2f}, Required: {qty:.2f}",
+                )
+            taken.append((item, qty))
+    except BaseException:
+        _release_stock(taken)
+        raise
+    _invalidate_dashboard_cache()
+    return taken
+
+
+def _release_stock(taken: List[tuple]):
+    if not taken:
+        return
+    ops = [UpdateOne({"item": item}, {"$inc": {"stock": qty}}) for item, qty in taken]
+    mongo_collection("inventory").bulk_write(ops, ordered=False)
+    _invalidate_dashboard_cache()
 
 
 def _get_item_stock_api(item_name: str) -> float:
-    inv = _load_inventory_map()
-    return _safe_float(inv.get(item_name, {}).get("stock", 0))
+    _require_mongo()
+    rec = mongo_collection("inventory").find_one({"item": item_name}, {"_id": 0, "stock": 1})
+    return _safe_float((rec or {}).get("stock", 0))
 
 
 def _add_stock_api(item_name: str, qty: float, rate: float = 0.0):
-    inv = _load_inventory_map()
-    before = inv.get(item_name, {"stock": 0.0, "rate": 0.0})
-    inv[item_name] = {
-        "stock": _safe_float(before.get("stock", 0)) + _safe_float(qty),
-        "rate": _safe_float(rate) if _safe_float(rate) > 0 else _safe_float(before.get("rate", 0)),
-    }
-    _save_inventory_map(inv)
+    _apply_stock_deltas([{"item": item_name, "qty": qty, "rate": rate}], set_rate=True)
 
 
-def _get_total_stock_value_api() -> float:
-    total = 0.0
-    for _, rec in _load_inventory_map().items():
-        qty = max(_safe_float(rec.get("stock", 0)), 0.0)
-        rate = _safe_float(rec.get("rate", 0))
-        total += qty * rate
-    return round(total, 2)
+def _num(expr) -> dict:
+    # Aggregation counterpart of _safe_float: missing or bad values count as 0.
+    return {"$convert": {"input": expr, "to": "double", "onError": 0.0, "onNull": 0.0}}
+
+
+async def _sum_fields(coll_name: str, match: dict, fields: dict) -> dict:
+    """One $group over coll_name: {"count": n, name: sum(expr), ...}."""
+    _require_mongo()
+    group = {"_id": None, "count": {"$sum": 1}}
+    for name, expr in fields.items():
+        group[name] = {"$sum": _num(expr)}
+    cursor = mongo_async_collection(coll_name).aggregate([{"$match": match}, {"$group": group}])
+    rows = await cursor.to_list(length=None)
+    out = rows[0] if rows else {}
+    return {name: out.get(name, 0) for name in ["count"] + list(fields)}
+
+
+async def _get_total_stock_value_api() -> float:
+    totals = await _sum_fields(
+        "inventory",
+        {},
+        {"value": {"$multiply": [{"$max": [_num("$stock"), 0.0]}, _num("$rate")]}},
+    )
+    return round(_safe_float(totals["value"]), 2)
+
+
+# Dashboard totals are cached for a few seconds so frequent polling does
+# not rerun the aggregations; writes made through this process drop the
+# cached copy at once, the TTL bounds staleness from other workers.
+# Requests arriving while the totals are being computed await the same
+# task ("pending") instead of starting their own. A write bumps
+# "generation", so a computation that started before it is not cached.
+DASHBOARD_CACHE_SECONDS = float(os.getenv("DASHBOARD_CACHE_SECONDS", "10") or 0)
+_dashboard_cache = {"value": None, "expires": 0.0, "pending": None, "generation": 0}
+
+
+def _invalidate_dashboard_cache():
+    _dashboard_cache["value"] = None
+    _dashboard_cache["expires"] = 0.0
+    _dashboard_cache["pending"] = None
+    _dashboard_cache["generation"] += 1
 
 
 def _round_amount_by_rule(value):
@@ -193,33 +440,53 @@ def _round_amount_by_rule(value):
     return float(int(amount))
 
 
-def _generate_seq_id(prefix: str, rows: List[dict], key: str) -> str:
+# Id counters: key field -> (prefix, collection). They are seeded at
+# startup and after a restore, never on the request path, so a scan cannot
+# race another worker's $inc. If a counter is still behind the data (the
+# startup seed failed), the unique index rejects the insert and
+# _insert_with_new_id re-seeds and takes the next number.
+SEQUENCES = {
+    "invoice_no": ("INV", "sales"),
+    "purchase_id": ("P", "purchases"),
+}
+
+
+def _highest_used(key: str) -> int:
+    prefix, coll_name = SEQUENCES[key]
     max_no = 0
-    for r in rows:
+    for r in mongo_collection(coll_name).find({}, {"_id": 0, key: 1}):
         text = str(r.get(key, "")).strip().upper()
         if text.startswith(prefix):
             try:
                 max_no = max(max_no, int(text.replace(prefix, "")))
             except Exception:
                 continue
-    return f"{prefix}{max_no + 1:04d}"
+    return max_no
 
 
-def _create_sale_api(customer_name, phone, items, payment_mode, paid_amount, discount_percent):
-    sales_rows = _load_sales_rows()
-    inv = _load_inventory_map()
+def _seed_sequences():
+    for key in SEQUENCES:
+        mongo_seed_sequence(key, _highest_used(key))
 
-    for i in items:
-        item = i.get("item") or i.get("name")
-        qty = _safe_float(i.get("qty", 0))
-        available = _safe_float(inv.get(item, {}).get("stock", 0))
-        if available < qty:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock for {item}. Available: {available:.2f}, Required: {qty:.2f}",
-            )
 
-    invoice_no = _generate_seq_id("INV", sales_rows, "invoice_no")
+def _insert_with_new_id(rec: dict, key: str, insert) -> str:
+    """Set rec[key] to the next id and insert(rec), moving past ids already taken."""
+    _require_mongo()
+    prefix, _coll_name = SEQUENCES[key]
+    for attempt in range(UPDATE_RETRIES):
+        rec[key] = f"{prefix}{mongo_next_sequence(key):04d}"
+        try:
+            insert(rec)
+            return rec[key]
+        except DuplicateKeyError:
+            if attempt == UPDATE_RETRIES - 1:
+                raise
+            mongo_seed_sequence(key, _highest_used(key))
+    return rec[key]
+
+
+def _create_sale_api(customer_name, phone, items, payment_mode, paid_amount, discount_percent):
+    _require_mongo()
     subtotal = sum(_safe_float(i.get("taxable", _safe_float(i.get("qty", 0)) * _safe_float(i.get("rate", 0)))) for i in items)
     gst_total = sum(_safe_float(i.get("cgst", 0)) + _safe_float(i.get("sgst", 0)) + _safe_float(i.get("igst", 0)) for i in items)
     gross_total = round(sum(_safe_float(i.get("total", 0)) for i in items), 2)
@@ -229,47 +496,43 @@ def _create_sale_api(customer_name, phone, items, payment_mode, paid_amount, dis
     paid = _safe_float(paid_amount)
     due = round(max(grand_total - paid, 0.0), 2)
 
-    rec = {
-        "invoice_no": invoice_no,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "customer_name": customer_name,
-        "phone": phone,
-        "items": items,
-        "subtotal": round(subtotal, 2),
-        "gst_total": round(gst_total, 2),
-        "gross_total": gross_total,
-        "discount_percent": round(discount_percent, 2),
-        "discount_amount": discount_amount,
-        "grand_total": grand_total,
-        "paid": paid,
-        "paid_amount": paid,
-        "due": due,
-        "payment_mode": payment_mode,
-    }
-    sales_rows.append(rec)
-
-    for i in items:
-        item = i.get("item") or i.get("name")
-        qty = _safe_float(i.get("qty", 0))
-        cur = inv.get(item, {"stock": 0.0, "rate": _safe_float(i.get("rate", 0))})
-        inv[item] = {"stock": _safe_float(cur.get("stock", 0)) - qty, "rate": _safe_float(cur.get("rate", i.get("rate", 0)))}
-
-    _save_sales_rows(sales_rows)
-    _save_inventory_map(inv)
+    # Stock is taken first; if the invoice cannot be written it goes back.
+    taken = _reserve_stock(items)
+    try:
+        rec = {
+            "invoice_no": None,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "customer_name": customer_name,
+            "phone": phone,
+            "items": items,
+            "subtotal": round(subtotal, 2),
+            "gst_total": round(gst_total, 2),
+            "gross_total": gross_total,
+            "discount_percent": round(discount_percent, 2),
+            "discount_amount": discount_amount,
+            "grand_total": grand_total,
+            "paid": paid,
+            "paid_amount": paid,
+            "due": due,
+            "payment_mode": payment_mode,
+            VERSION_FIELD: 1,
+        }
+        invoice_no = _insert_with_new_id(rec, "invoice_no", _insert_sale_row)
+    except BaseException:
+        _release_stock(taken)
+        raise
+    _bump_item_rollup(items, "sqty", "sval")
     return invoice_no
 
 
 def _create_purchase_api(supplier_id, supplier_name, items, payment_mode, paid_amount):
-    purchases = _load_purchase_rows()
-    inv = _load_inventory_map()
-    purchase_id = _generate_seq_id("P", purchases, "purchase_id")
     subtotal = sum(_safe_float(i.get("qty", 0)) * _safe_float(i.get("rate", 0)) for i in items)
     gst_total = sum(_safe_float(i.get("qty", 0)) * _safe_float(i.get("rate", 0)) * (_safe_float(i.get("gst", 0)) / 100.0) for i in items)
     grand_total = round(subtotal + gst_total, 2)
     paid = _safe_float(paid_amount)
     due = round(max(grand_total - paid, 0.0), 2)
     rec = {
-        "purchase_id": purchase_id,
+        "purchase_id": None,
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "supplier_id": supplier_id,
         "supplier_name": supplier_name,
@@ -281,55 +544,160 @@ def _create_purchase_api(supplier_id, supplier_name, items, payment_mode, paid_a
         "due": due,
         "payment_mode": payment_mode,
     }
-    purchases.append(rec)
-    for i in items:
-        item = i.get("item")
-        qty = _safe_float(i.get("qty", 0))
-        rate = _safe_float(i.get("rate", 0))
-        cur = inv.get(item, {"stock": 0.0, "rate": rate})
-        inv[item] = {"stock": _safe_float(cur.get("stock", 0)) + qty, "rate": rate if rate > 0 else _safe_float(cur.get("rate", 0))}
-    _save_purchase_rows(purchases)
-    _save_inventory_map(inv)
+    _insert_with_new_id(rec, "purchase_id", _insert_purchase_row)
+    _apply_stock_deltas(
+        [{"item": i.get("item"), "qty": _safe_float(i.get("qty", 0)), "rate": i.get("rate", 0)} for i in items],
+        set_rate=True,
+    )
+    _bump_item_rollup(items, "pqty", "pval")
     return rec
 
 
-def _item_summary_api():
-    sales = _load_sales_rows()
-    purchases = _load_purchase_rows()
-    inv = _load_inventory_map()
-    stats = {}
-    for p in purchases:
-        for i in p.get("items", []):
-            name = str(i.get("item") or i.get("name") or "").strip()
-            if not name:
-                continue
-            rec = stats.setdefault(name, {"pqty": 0.0, "pval": 0.0, "sqty": 0.0, "sval": 0.0})
-            q = _safe_float(i.get("qty", 0)); r = _safe_float(i.get("rate", 0))
-            rec["pqty"] += q; rec["pval"] += q * r
-    for s in sales:
-        if s.get("cancelled"):
+# -------------------------------
+# Item rollup
+# -------------------------------
+# item_rollup holds running purchase/sale totals per item
+# ({item, item_key, pqty, pval, sqty, sval}); item_key is the lowercased
+# name used for ordering, prefix search and paging. Creates $inc it in the
+# same request, and _rebuild_item_rollup() recomputes it from history with
+# $unwind/$group when it is empty or on /admin/reconcile. A rebuild fills
+# ITEM_ROLLUP_BUILD and renames it over item_rollup, so readers never see a
+# half-built table.
+ITEM_ROLLUP = "item_rollup"
+ITEM_ROLLUP_BUILD = "item_rollup_build"
+
+
+def _line_name(line: dict) -> str:
+    return str(line.get("item") or line.get("name") or "").strip()
+
+
+def _bump_item_rollup(items: List[dict], qty_field: str, value_field: str):
+    _require_mongo()
+    ops = []
+    for i in items:
+        name = _line_name(i)
+        if not name:
             continue
-        for i in s.get("items", []):
-            name = str(i.get("item") or i.get("name") or "").strip()
-            if not name:
-                continue
-            rec = stats.setdefault(name, {"pqty": 0.0, "pval": 0.0, "sqty": 0.0, "sval": 0.0})
-            q = _safe_float(i.get("qty", 0)); r = _safe_float(i.get("rate", 0))
-            rec["sqty"] += q; rec["sval"] += q * r
-    rows = []
-    names = sorted(set(list(stats.keys()) + list(inv.keys())), key=lambda x: x.lower())
+        q = _safe_float(i.get("qty", 0))
+        r = _safe_float(i.get("rate", 0))
+        ops.append(
+            UpdateOne(
+                {"item": name},
+                {"$inc": {qty_field: q, value_field: q * r}, "$setOnInsert": {"item_key": name.lower()}},
+                upsert=True,
+            )
+        )
+    if ops:
+        mongo_collection(ITEM_ROLLUP).bulk_write(ops, ordered=False)
+
+
+def _history_totals(coll_name: str, match: dict) -> dict:
+    pipeline = [
+        {"$match": match},
+        {"$unwind": "$items"},
+        {"$project": {
+            "name": {"$trim": {"input": {"$toString": {"$ifNull": ["$items.item", {"$ifNull": ["$items.name", ""]}]}}}},
+            "qty": _num("$items.qty"),
+            "rate": _num("$items.rate"),
+        }},
+        {"$match": {"name": {"$ne": ""}}},
+        {"$group": {"_id": "$name", "qty": {"$sum": "$qty"}, "value": {"$sum": {"$multiply": ["$qty", "$rate"]}}}},
+    ]
+    return {row["_id"]: row for row in mongo_collection(coll_name).aggregate(pipeline, allowDiskUse=True)}
+
+
+def _rebuild_item_rollup() -> int:
+    """Recompute item_rollup from all purchases, non-cancelled sales and inventory."""
+    _require_mongo()
+    bought = _history_totals("purchases", {})
+    sold = _history_totals("sales", {"cancelled": {"$ne": True}})
+    names = set(bought) | set(sold)
+    for rec in mongo_collection("inventory").find({}, {"_id": 0, "item": 1}):
+        name = str(rec.get("item", "")).strip()
+        if name:
+            names.add(name)
+
+    docs = []
     for name in names:
-        st = stats.get(name, {"pqty": 0.0, "pval": 0.0, "sqty": 0.0, "sval": 0.0})
-        pqty = st["pqty"]; sqty = st["sqty"]
+        bought_row = bought.get(name, {})
+        sold_row = sold.get(name, {})
+        docs.append({
+            "item": name,
+            "item_key": name.lower(),
+            "pqty": _safe_float(bought_row.get("qty", 0)),
+            "pval": _safe_float(bought_row.get("value", 0)),
+            "sqty": _safe_float(sold_row.get("qty", 0)),
+            "sval": _safe_float(sold_row.get("value", 0)),
+        })
+    build = mongo_collection(ITEM_ROLLUP_BUILD)
+    build.drop()
+    ensure_item_rollup_indexes(build)
+    for start in range(0, len(docs), 1000):
+        build.insert_many(docs[start:start + 1000], ordered=False)
+    if docs:
+        build.rename(ITEM_ROLLUP, dropTarget=True)
+    else:
+        build.drop()
+        mongo_collection(ITEM_ROLLUP).delete_many({})
+    return len(docs)
+
+
+def _ensure_item_rollup():
+    if not mongo_collection(ITEM_ROLLUP).estimated_document_count():
+        _rebuild_item_rollup()
+
+
+async def _item_summary_api(q: str = "", limit: int = 0, after: str = "") -> dict:
+    """
+    Rows ordered by item name; q is a case-insensitive name prefix, after
+    the next_after ("<item_key>,<_id>") of the previous page.
+    """
+    _require_mongo()
+    query = {}
+    prefix = str(q or "").strip().lower()
+    if prefix:
+        # Anchored, case-sensitive on item_key, so the index is used.
+        query["item_key"] = {"$regex": "^" + re.escape(prefix)}
+    col = mongo_async_collection(ITEM_ROLLUP)
+    count = await col.count_documents(query)
+    if after:
+        key_part, sep, id_part = str(after).rpartition(",")
+        try:
+            last_id = ObjectId(id_part.strip())
+        except Exception:
+            raise HTTPException(status_code=400, detail="after must be '<item_key>,<id>'.")
+        if not sep:
+            raise HTTPException(status_code=400, detail="after must be '<item_key>,<id>'.")
+        query = {"$and": [query, {"$or": [
+            {"item_key": {"$gt": key_part}},
+            {"item_key": key_part, "_id": {"$gt": last_id}},
+        ]}]}
+
+    cursor = col.find(query).sort([("item_key", 1), ("_id", 1)])
+    if limit:
+        cursor = cursor.limit(limit)
+    stats = await cursor.to_list(length=None)
+    stock_rows = await mongo_async_collection("inventory").find(
+        {"item": {"$in": [st.get("item") for st in stats]}}, {"_id": 0, "item": 1, "stock": 1}
+    ).to_list(length=None)
+    inv = {rec.get("item"): rec for rec in stock_rows}
+
+    rows = []
+    for st in stats:
+        name = st.get("item", "")
+        pqty = _safe_float(st.get("pqty", 0)); sqty = _safe_float(st.get("sqty", 0))
         rows.append(
             {
                 "item": name,
                 "available_qty": round(_safe_float(inv.get(name, {}).get("stock", pqty - sqty)), 2),
-                "purchase_price": round((st["pval"] / pqty), 2) if pqty else 0.0,
-                "selling_price": round((st["sval"] / sqty), 2) if sqty else 0.0,
+                "purchase_price": round((_safe_float(st.get("pval", 0)) / pqty), 2) if pqty else 0.0,
+                "selling_price": round((_safe_float(st.get("sval", 0)) / sqty), 2) if sqty else 0.0,
             }
         )
-    return rows
+    next_after = None
+    if limit and len(stats) == limit:
+        next_after = f"{stats[-1].get('item_key', '')},{stats[-1]['_id']}"
+    return {"count": count, "items": rows, "next_after": next_after}
 
 
 def _jsonable_doc(rec: dict) -> dict:
@@ -344,29 +712,137 @@ def _jsonable_doc(rec: dict) -> dict:
     return out
 
 
-def _mongo_backup_file() -> str:
-    _require_mongo()
-    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out_dir = Path("/tmp")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / f"billing_inventory_backup_{stamp}.json"
-    collections = [
-        "sales",
-        "purchases",
-        "inventory",
-        "customers",
-        "suppliers",
-        "audit_log",
-        "cash_ledger",
-        "shop_managers",
-    ]
-    payload = {"generated_at": datetime.now().isoformat(), "db": os.getenv("MONGODB_DB_NAME", ""), "collections": {}}
-    for cname in collections:
-        docs = [_jsonable_doc(d) for d in mongo_collection(cname).find({})]
-        payload["collections"][cname] = docs
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
-    return str(out_path)
+# -------------------------------
+# Backup / restore
+# -------------------------------
+# A backup is a zip (deflate) with one NDJSON member per collection plus
+# manifest.json, written straight from the cursors into the response, so
+# memory stays at one batch whatever the database size. Rows are MongoDB
+# extended JSON (bson.json_util), so _id, dates and other BSON types come
+# back as they were. Restore spools the upload to a temp file, parses the
+# whole archive before touching the database, then loads each member into
+# a staging collection and renames it over the live one. Id counters are
+# left out: a missing counter re-seeds itself from the restored rows.
+BACKUP_COLLECTIONS = [
+    "sales",
+    "purchases",
+    "inventory",
+    "customers",
+    "suppliers",
+    "audit_log",
+    "cash_ledger",
+    "shop_managers",
+]
+BACKUP_BATCH_SIZE = 1000
+
+
+class _ChunkSink:
+    """Write-only file object for zipfile; the backup generator drains it."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _stream_backup_zip():
+    sink = _ChunkSink()
+    counts = {}
+    # No seek/tell on the sink: zipfile writes data descriptors instead.
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for cname in BACKUP_COLLECTIONS:
+            counts[cname] = 0
+            with zf.open(f"{cname}.ndjson", "w", force_zip64=True) as member:
+                for doc in mongo_collection(cname).find({}).batch_size(BACKUP_BATCH_SIZE):
+                    line = json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n"
+                    member.write(line.encode("utf-8"))
+                    counts[cname] += 1
+                    if counts[cname] % BACKUP_BATCH_SIZE == 0:
+                        yield sink.drain()
+            yield sink.drain()
+        manifest = {
+            "generated_at": datetime.now().isoformat(),
+            "db": os.getenv("MONGODB_DB_NAME", ""),
+            "format": "ndjson-extjson",
+            "counts": counts,
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+    yield sink.drain()
+
+
+def _backup_docs(zf, cname):
+    """Documents of one archive member; ValueError names the first bad line."""
+    with io.TextIOWrapper(zf.open(f"{cname}.ndjson"), encoding="utf-8") as lines:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                doc = json_util.loads(line)
+            except Exception as exc:
+                raise ValueError(f"{cname}.ndjson line {line_no}: {exc}")
+            if not isinstance(doc, dict):
+                raise ValueError(f"{cname}.ndjson line {line_no}: not a document")
+            yield doc
+
+
+def _restore_backup_zip(fileobj) -> dict:
+    """Replace each collection found in the archive with its NDJSON rows."""
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Backup must be a zip produced by /admin/mongo/backup.")
+    with zf:
+        names = set(zf.namelist())
+        members = [cname for cname in BACKUP_COLLECTIONS if f"{cname}.ndjson" in names]
+        if not members:
+            raise HTTPException(status_code=400, detail="Backup contains no collections.")
+
+        # Parse everything first: a bad archive must not cost any data.
+        try:
+            for cname in members:
+                for _doc in _backup_docs(zf, cname):
+                    pass
+        except (ValueError, zipfile.BadZipFile) as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid backup: {exc}")
+
+        restored = {}
+        for cname in members:
+            staging = mongo_collection(f"{cname}_restore")
+            staging.drop()
+            batch = []
+            restored[cname] = 0
+            for doc in _backup_docs(zf, cname):
+                batch.append(doc)
+                if len(batch) >= BACKUP_BATCH_SIZE:
+                    staging.insert_many(batch, ordered=False)
+                    restored[cname] += len(batch)
+                    batch = []
+            if batch:
+                staging.insert_many(batch, ordered=False)
+                restored[cname] += len(batch)
+            if restored[cname]:
+                staging.rename(cname, dropTarget=True)
+            else:
+                staging.drop()
+                mongo_collection(cname).delete_many({})
+
+    # Renamed collections carry only the _id index.
+    mongo_ensure_indexes()
+    _seed_sequences()
+    _backfill_date_keys()
+    _rebuild_item_rollup()
+    _invalidate_dashboard_cache()
+    return restored
 
 
 def _load_shop_manager_accounts():
@@ -402,22 +878,34 @@ def _load_shop_manager_accounts():
     return rows
 
 
-def _save_shop_manager_accounts(rows: List[dict]):
-    safe = []
+def _save_shop_manager_account(row: dict):
+    """Insert or replace one account, keyed by username."""
+    _require_mongo()
+    safe = {
+        "username": str(row.get("username", "")).strip(),
+        "password": str(row.get("password", "")).strip(),
+        "is_active": bool(row.get("is_active", True)),
+        "is_deleted": bool(row.get("is_deleted", False)),
+        "created_on": str(row.get("created_on", "")).strip(),
+        "last_login": str(row.get("last_login", "")).strip(),
+    }
+    mongo_collection("shop_managers").replace_one({"username": safe["username"]}, safe, upsert=True)
+
+
+def _delete_shop_manager_account(username: str):
+    _require_mongo()
+    mongo_collection("shop_managers").delete_many({"username": username})
+
+
+def _persist_default_shop_manager(rows: List[dict]):
+    # _load_shop_manager_accounts supplies SM-DEFAULT when nothing is stored;
+    # keep it once the collection gets its first real account.
+    _require_mongo()
+    if mongo_collection("shop_managers").count_documents({}, limit=1):
+        return
     for r in rows:
-        if not isinstance(r, dict):
-            continue
-        safe.append(
-            {
-                "username": str(r.get("username", "")).strip(),
-                "password": str(r.get("password", "")).strip(),
-                "is_active": bool(r.get("is_active", True)),
-                "is_deleted": bool(r.get("is_deleted", False)),
-                "created_on": str(r.get("created_on", "")).strip(),
-                "last_login": str(r.get("last_login", "")).strip(),
-            }
-        )
-    _mongo_replace_rows("shop_managers", safe)
+        if str(r.get("username", "")) == "SM-DEFAULT":
+            _save_shop_manager_account(r)
 
 
 def _safe_float(value):
@@ -442,10 +930,6 @@ def _parse_date(date_text: str) -> datetime:
     return datetime.min
 
 
-def _sort_rows(rows, key_name="date"):
-    return sorted(rows, key=lambda r: _parse_date(str(r.get(key_name, ""))), reverse=True)
-
-
 def _require_role(x_user_role: Optional[str], allowed: List[str]):
     role = (x_user_role or "").strip().lower()
     if role not in [a.lower() for a in allowed]:
@@ -523,138 +1007,178 @@ def reconcile_data(x_api_key: Optional[str] = Header(default=None)):
     _require_api_key(x_api_key)
     _require_mongo()
     created = mongo_ensure_indexes() if mongo_ensure_indexes else {}
-    return {"ok": True, "mongo_only": True, "indexes": created}
+    _backfill_date_keys()
+    items = _rebuild_item_rollup()
+    return {"ok": True, "mongo_only": True, "indexes": created, "item_rollup": items}
 
 
-@app.get("/dashboard/summary")
-def dashboard_summary():
-    sales = _load_sales_rows()
-    purchases = _load_purchase_rows()
-
-    total_sales = sum(_safe_float(s.get("grand_total", 0)) for s in sales if not s.get("cancelled"))
-    total_sales_paid = sum(_safe_float(s.get("paid", s.get("paid_amount", 0))) for s in sales if not s.get("cancelled"))
-    total_sales_due = sum(_safe_float(s.get("due", 0)) for s in sales if not s.get("cancelled"))
-
-    total_purchase = sum(_safe_float(p.get("grand_total", p.get("total_amount", 0))) for p in purchases)
-    total_purchase_paid = sum(_safe_float(p.get("paid_amount", p.get("paid", 0))) for p in purchases)
-    total_purchase_due = sum(_safe_float(p.get("due", p.get("due_amount", 0))) for p in purchases)
-
+async def _dashboard_summary_api() -> dict:
+    sales = await _sum_fields(
+        "sales",
+        {"cancelled": {"$ne": True}},
+        {
+            "total": "$grand_total",
+            "paid": {"$ifNull": ["$paid", "$paid_amount"]},
+            "due": "$due",
+        },
+    )
+    purchase = await _sum_fields(
+        "purchases",
+        {},
+        {
+            "total": {"$ifNull": ["$grand_total", "$total_amount"]},
+            "paid": {"$ifNull": ["$paid_amount", "$paid"]},
+            "due": {"$ifNull": ["$due", "$due_amount"]},
+        },
+    )
     return {
         "sales": {
-            "count": len([s for s in sales if not s.get("cancelled")]),
-            "total": round(total_sales, 2),
-            "paid": round(total_sales_paid, 2),
-            "due": round(total_sales_due, 2),
+            "count": int(sales["count"]),
+            "total": round(_safe_float(sales["total"]), 2),
+            "paid": round(_safe_float(sales["paid"]), 2),
+            "due": round(_safe_float(sales["due"]), 2),
         },
         "purchase": {
-            "count": len(purchases),
-            "total": round(total_purchase, 2),
-            "paid": round(total_purchase_paid, 2),
-            "due": round(total_purchase_due, 2),
+            "count": int(purchase["count"]),
+            "total": round(_safe_float(purchase["total"]), 2),
+            "paid": round(_safe_float(purchase["paid"]), 2),
+            "due": round(_safe_float(purchase["due"]), 2),
         },
-        "stock_value": round(_get_total_stock_value_api(), 2),
+        "stock_value": await _get_total_stock_value_api(),
     }
 
 
+@app.get("/dashboard/summary")
+async def dashboard_summary():
+    cache = _dashboard_cache
+    if cache["value"] is not None and time.monotonic() < cache["expires"]:
+        return cache["value"]
+    pending = cache["pending"]
+    if pending is None:
+        pending = asyncio.ensure_future(_fill_dashboard_cache(cache["generation"]))
+        cache["pending"] = pending
+    # shield: a client disconnecting does not cancel the others' result.
+    return await asyncio.shield(pending)
+
+
+async def _fill_dashboard_cache(generation: int):
+    cache = _dashboard_cache
+    started = time.monotonic()
+    try:
+        value = await _dashboard_summary_api()
+    finally:
+        if cache["pending"] is asyncio.current_task():
+            cache["pending"] = None
+    if cache["generation"] == generation:
+        cache["value"] = value
+        cache["expires"] = started + DASHBOARD_CACHE_SECONDS
+    return value
+
+
 @app.get("/items/summary")
-def items_summary():
-    rows = _item_summary_api()
-    return {"count": len(rows), "items": rows}
+async def items_summary(q: str = "", limit: int = 0, after: str = ""):
+    return await _item_summary_api(q=q, limit=max(0, min(limit, 2000)), after=after)
 
 
 @app.get("/sales")
-def sales(limit: int = 100):
-    data = _sort_rows(_load_sales_rows(), key_name="date")
-    return {"count": len(data), "rows": data[: max(1, min(limit, 1000))]}
+async def sales(limit: int = 100, after: str = "", format: str = "json"):
+    _require_mongo()
+    return await _list_response(
+        "sales",
+        {},
+        SALES_SORT,
+        limit=max(1, min(limit, 1000)),
+        after=after,
+        fmt=format,
+        count=await mongo_async_collection("sales").estimated_document_count(),
+    )
+
+
+@app.get("/sales/due-report")
+async def sales_due_report(
+    limit: int = 0,
+    after: str = "",
+    format: str = "json",
+    x_user_role: Optional[str] = Header(default=None),
+):
+    _require_role(x_user_role, ["admin", "shop_manager"])
+    return await _list_response("sales", {"due": {"$gt": 0}}, SALES_SORT, limit=max(0, limit), after=after, fmt=format)
 
 
 @app.get("/sales/{invoice_no}")
-def sales_invoice_detail(invoice_no: str, x_user_role: Optional[str] = Header(default=None)):
+async def sales_invoice_detail(invoice_no: str, x_user_role: Optional[str] = Header(default=None)):
     _require_role(x_user_role, ["admin", "shop_manager"])
     key = str(invoice_no or "").strip()
     if not key:
         raise HTTPException(status_code=400, detail="Invoice number is required.")
-    rows = _load_sales_rows()
-    for r in rows:
-        if str(r.get("invoice_no", "")).strip() == key:
-            return {"ok": True, "row": r}
+    _require_mongo()
+    row = await mongo_async_collection("sales").find_one({"invoice_no": key}, ROW_PROJECTION)
+    if row:
+        return {"ok": True, "row": row}
     raise HTTPException(status_code=404, detail="Invoice not found.")
 
 
-@app.get("/sales/due-report")
-def sales_due_report(x_user_role: Optional[str] = Header(default=None)):
-    _require_role(x_user_role, ["admin", "shop_manager"])
-    rows = [r for r in _load_sales_rows() if _safe_float(r.get("due", 0)) > 0]
-    rows = _sort_rows(rows, key_name="date")
-    return {"count": len(rows), "rows": rows}
-
-
 @app.get("/ledger/customer")
-def customer_ledger(
+async def customer_ledger(
     customer: str = "",
     phone: str = "",
     item: str = "",
     from_date: str = "",
     to_date: str = "",
+    limit: int = 0,
+    after: str = "",
+    format: str = "json",
     x_user_role: Optional[str] = Header(default=None),
 ):
     _require_role(x_user_role, ["admin", "shop_manager"])
-    c = str(customer or "").strip().lower()
-    p = str(phone or "").strip().lower()
-    it = str(item or "").strip().lower()
-    fd = str(from_date or "").strip()
-    td = str(to_date or "").strip()
-
-    rows = _load_sales_rows()
-    out = []
-    for r in rows:
-        if r.get("cancelled"):
-            continue
-        if c and c not in str(r.get("customer_name", "")).lower():
-            continue
-        if p and p not in str(r.get("phone", "")).lower():
-            continue
-        if it:
-            items_text = " ".join([str(i.get("item") or i.get("name") or "") for i in r.get("items", [])]).lower()
-            if it not in items_text:
-                continue
-        d = str(r.get("date", "")).strip()
-        if fd and d[:10] < fd:
-            continue
-        if td and d[:10] > td:
-            continue
-        out.append(r)
-    out = _sort_rows(out, key_name="date")
-    return {"count": len(out), "rows": out}
+    query = _ledger_query(customer, phone, item, from_date, to_date)
+    return await _list_response("sales", query, SALES_SORT, limit=max(0, limit), after=after, fmt=format)
 
 
 @app.get("/purchases")
-def purchases(limit: int = 100):
-    data = _sort_rows(_load_purchase_rows(), key_name="date")
-    return {"count": len(data), "rows": data[: max(1, min(limit, 1000))]}
+async def purchases(limit: int = 100, after: str = "", format: str = "json"):
+    _require_mongo()
+    return await _list_response(
+        "purchases",
+        {},
+        PURCHASES_SORT,
+        limit=max(1, min(limit, 1000)),
+        after=after,
+        fmt=format,
+        count=await mongo_async_collection("purchases").estimated_document_count(),
+    )
+
+
+@app.get("/purchases/due-report")
+async def purchase_due_report(
+    limit: int = 0,
+    after: str = "",
+    format: str = "json",
+    x_user_role: Optional[str] = Header(default=None),
+):
+    _require_role(x_user_role, ["admin", "shop_manager"])
+    query = {
+        "$or": [
+            {"due": {"$gt": 0}},
+            {"due": {"$exists": False}, "due_amount": {"$gt": 0}},
+        ]
+    }
+    return await _list_response("purchases", query, PURCHASES_SORT, limit=max(0, limit), after=after, fmt=format)
 
 
 @app.get("/purchases/{purchase_id}")
-def purchase_detail(purchase_id: str, x_user_role: Optional[str] = Header(default=None)):
+async def purchase_detail(purchase_id: str, x_user_role: Optional[str] = Header(default=None)):
     _require_role(x_user_role, ["admin", "shop_manager"])
     key = str(purchase_id or "").strip()
     if not key:
         raise HTTPException(status_code=400, detail="Purchase ID is required.")
-    rows = _load_purchase_rows()
-    for r in rows:
-        if str(r.get("purchase_id", "")).strip() == key:
-            return {"ok": True, "row": r}
+    _require_mongo()
+    row = await mongo_async_collection("purchases").find_one({"purchase_id": key}, ROW_PROJECTION)
+    if row:
+        return {"ok": True, "row": row}
     raise HTTPException(status_code=404, detail="Purchase not found.")
 
 
-@app.get("/purchases/due-report")
-def purchase_due_report(x_user_role: Optional[str] = Header(default=None)):
-    _require_role(x_user_role, ["admin", "shop_manager"])
-    rows = [r for r in _load_purchase_rows() if _safe_float(r.get("due", r.get("due_amount", 0))) > 0]
-    rows = _sort_rows(rows, key_name="date")
-    return {"count": len(rows), "rows": rows}
-
-
 @app.post("/auth/login")
 def auth_login(payload: LoginRequest):
     pwd = (payload.password or "").strip()
@@ -722,8 +1246,6 @@ def purchases_create(
         payment_mode=_normalize_mode(payload.payment_mode),
         paid_amount=paid,
     )
-    for i in items:
-        _add_stock_api(item_name=i["item"], qty=i["qty"], rate=i["rate"])
     write_audit_log(
         user=(x_user_name or "web_user"),
         module="purchase",
@@ -748,27 +1270,38 @@ def sales_pay_due(
     if pay <= 0:
         raise HTTPException(status_code=400, detail="Pay amount must be greater than 0.")
 
-    sales_rows = _load_sales_rows()
-    target = None
-    for s in sales_rows:
-        if str(s.get("invoice_no", "")) == invoice_no:
-            target = s
+    # Re-read and retry if another terminal paid against the invoice in between.
+    for _ in range(UPDATE_RETRIES):
+        target = _find_sale_row(invoice_no)
+        if not target:
+            raise HTTPException(status_code=404, detail="Invoice not found.")
+
+        due_before = _safe_float(target.get("due", 0))
+        paid_before = _safe_float(target.get("paid", target.get("paid_amount", 0)))
+        if due_before <= 0:
+            raise HTTPException(status_code=400, detail="No due available for this invoice.")
+        if pay > due_before:
+            raise HTTPException(status_code=400, detail=f"Pay amount cannot exceed due ({due_before:.2f}).")
+
+        target["paid"] = round(paid_before + pay, 2)
+        target["paid_amount"] = target["paid"]
+        target["due"] = round(max(due_before - pay, 0.0), 2)
+        target["last_payment_mode"] = mode
+        if _mongo_update_row(
+            "sales",
+            "invoice_no",
+            invoice_no,
+            {
+                "paid": target["paid"],
+                "paid_amount": target["paid_amount"],
+                "due": target["due"],
+                "last_payment_mode": mode,
+            },
+            version=target.get(VERSION_FIELD),
+        ):
             break
-    if not target:
-        raise HTTPException(status_code=404, detail="Invoice not found.")
-
-    due_before = _safe_float(target.get("due", 0))
-    paid_before = _safe_float(target.get("paid", target.get("paid_amount", 0)))
-    if due_before <= 0:
-        raise HTTPException(status_code=400, detail="No due available for this invoice.")
-    if pay > due_before:
-        raise HTTPException(status_code=400, detail=f"Pay amount cannot exceed due ({due_before:.2f}).")
-
-    target["paid"] = round(paid_before + pay, 2)
-    target["paid_amount"] = target["paid"]
-    target["due"] = round(max(due_before - pay, 0.0), 2)
-    target["last_payment_mode"] = mode
-    _save_sales_rows(sales_rows)
+    else:
+        raise HTTPException(status_code=409, detail="Invoice is being updated elsewhere. Please retry.")
 
     if mode.lower() == "cash":
         add_cash_entry(
@@ -793,20 +1326,45 @@ def sales_pay_due(
 def mongo_backup(x_api_key: Optional[str] = Header(default=None)):
     _require_api_key(x_api_key)
     _require_mongo()
-    path = _mongo_backup_file()
-    return FileResponse(
-        path=path,
-        media_type="application/json",
-        filename=os.path.basename(path),
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return StreamingResponse(
+        _stream_backup_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="billing_inventory_backup_{stamp}.zip"'},
     )
 
 
+@app.post("/admin/mongo/restore")
+async def mongo_restore(request: Request, x_api_key: Optional[str] = Header(default=None)):
+    """Body: the raw zip from /admin/mongo/backup. Replaces the collections it contains."""
+    _require_api_key(x_api_key)
+    _require_mongo()
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        restored = await run_in_threadpool(_restore_backup_zip, spool)
+    return {"ok": True, "restored": restored}
+
+
 @app.get("/audit/logs")
-def audit_logs(limit: int = 200, x_user_role: Optional[str] = Header(default=None)):
+async def audit_logs(
+    limit: int = 200,
+    after: str = "",
+    format: str = "json",
+    x_user_role: Optional[str] = Header(default=None),
+):
     _require_role(x_user_role, ["admin", "shop_manager"])
-    rows = _sort_rows(_mongo_load_rows("audit_log"), key_name="timestamp")
-    max_rows = max(1, min(limit, 2000))
-    return {"count": len(rows), "rows": rows[:max_rows]}
+    _require_mongo()
+    return await _list_response(
+        "audit_log",
+        {},
+        AUDIT_SORT,
+        limit=max(1, min(limit, 2000)),
+        after=after,
+        fmt=format,
+        count=await mongo_async_collection("audit_log").estimated_document_count(),
+    )
 
 
 @app.get("/admin/sm")
@@ -842,7 +1400,8 @@ def sm_create(payload: SmCreateRequest, x_user_role: Optional[str] = Header(defa
         raise HTTPException(status_code=400, detail="Username already exists.")
     if any(str(r.get("password", "")).strip() == pwd and not r.get("is_deleted", False) for r in rows):
         raise HTTPException(status_code=400, detail="Password already exists.")
-    rows.append(
+    _persist_default_shop_manager(rows)
+    _save_shop_manager_account(
         {
             "username": uname,
             "password": pwd,
@@ -852,7 +1411,6 @@ def sm_create(payload: SmCreateRequest, x_user_role: Optional[str] = Header(defa
             "last_login": "",
         }
     )
-    _save_shop_manager_accounts(rows)
     write_audit_log(user=(x_user_name or "web_user"), module="shop_manager_accounts", action="create", reference=uname)
     return {"ok": True, "username": uname}
 
@@ -873,7 +1431,8 @@ def sm_reset(payload: SmResetRequest, x_user_role: Optional[str] = Header(defaul
     if not target:
         raise HTTPException(status_code=404, detail="Shop manager not found.")
     target["password"] = new_pwd
-    _save_shop_manager_accounts(rows)
+    _persist_default_shop_manager(rows)
+    _save_shop_manager_account(target)
     write_audit_log(user=(x_user_name or "web_user"), module="shop_manager_accounts", action="reset_password", reference=uname)
     return {"ok": True, "username": uname}
 
@@ -883,10 +1442,11 @@ def sm_delete(username: str, x_user_role: Optional[str] = Header(default=None),
     _require_role(x_user_role, ["admin"])
     uname = str(username or "").strip()
     rows = _load_shop_manager_accounts()
-    kept = [r for r in rows if str(r.get("username", "")).strip().lower() != uname.lower()]
-    if len(kept) == len(rows):
+    matches = [r for r in rows if str(r.get("username", "")).strip().lower() == uname.lower()]
+    if not matches:
         raise HTTPException(status_code=404, detail="Shop manager not found.")
-    _save_shop_manager_accounts(kept)
+    for r in matches:
+        _delete_shop_manager_account(r.get("username", ""))
     write_audit_log(user=(x_user_name or "web_user"), module="shop_manager_accounts", action="delete", reference=uname)
     return {"ok": True, "username": uname}
 
@@ -12,7 +12,7 @@ from reportlab.platypus import (
 from reportlab.pdfgen import canvas
 from utils import app_dir
 
-from sales import load_sales
+from sales import load_sales, get_due_sales
 from purchase import load_purchases
 from config import COMPANY
 
@@ -53,7 +53,7 @@ def generate_due_report_pdf():
     data = [["Invoice", "Date", "Customer", "Phone", "Total", "Paid", "Due"]]
 
     total_due = 0.0
-    for s in load_sales():
+    for s in reversed(get_due_sales()):
         due = float(s.get("due", 0))
         if due > 0:
             data.append([
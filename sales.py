@@ -1,10 +1,15 @@
 import json
 import os
 from datetime import datetime, timedelta
-from inventory import reduce_stock, add_stock, get_item_stock
+from inventory import apply_stock_movements
 from utils import app_dir
 from audit_log import write_audit_log
-from item_summary_report import adjust_item_summary_available_qty, set_item_summary_override
+from journal_store import JournalStore
+import sqlite_store
+import item_aggregates
+import receivables
+from transaction import unit_of_work
+from counters import next_sequence, id_number
 
 
 
@@ -16,33 +21,53 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 SALES_FILE = os.path.join(DATA_DIR, "sales.json")
+# sales.json stays the snapshot; new invoices go to sales.journal.jsonl.
+SALES_STORE = JournalStore(SALES_FILE, key_field="invoice_no")
 
 
 # -------------------------------
 # File handling
 # -------------------------------
 def load_sales():
-    if not os.path.exists(SALES_FILE):
-        return []
-    with open(SALES_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_sales()
+    return SALES_STORE.load()
 
 
 def save_sales(data):
-    with open(SALES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
-        
-    
+    if sqlite_store.is_enabled():
+        sqlite_store.save_sales(data)
+        return
+    SALES_STORE.save(data)
+
+
+def put_sale(record):
+    # Insert or update one invoice with a single journal append.
+    if sqlite_store.is_enabled():
+        sqlite_store.put_sale(record)
+        return
+    SALES_STORE.put(record)
+
+
+def get_sale(invoice_no):
+    if sqlite_store.is_enabled():
+        return sqlite_store.get_sale(invoice_no)
+    return SALES_STORE.get(str(invoice_no or "").strip())
+
+
 # -------------------------------
 # Invoice number
 # -------------------------------
-def generate_invoice_no(sales):
-    if not sales:
-        return "INV0001"
-
-    last = sales[-1]["invoice_no"]
-    num = int(last.replace("INV", ""))
-    return f"INV{num + 1:04d}"
+def generate_invoice_no(sales=None):
+    # O(1) counter in counters.json; history is scanned only to seed it the
+    # first time (or after counters.json was deleted).
+    num = next_sequence(
+        "invoice_no",
+        seed=lambda: max(
+            [id_number(s.get("invoice_no"), "INV") for s in (sales if sales is not None else load_sales())] or [0]
+        ),
+    )
+    return f"INV{num:04d}"
 
 
 def _round_amount_by_rule(value):
@@ -64,22 +89,14 @@ def create_sale(customer_name, phone, items, payment_mode, paid_amount, discount
     if not customer_name or not phone:
         raise ValueError("Customer name and phone required")
 
-    sales = load_sales()
-    invoice_no = generate_invoice_no(sales)
-
-    # Validate stock before persisting invoice to avoid inconsistent saved sales.
+    # Stock itself is validated by apply_stock_movements before anything is written.
     for i in items:
         item_name = i.get("item") or i.get("name")
         qty = float(i.get("qty", 0) or 0)
         if not item_name:
             raise ValueError("Item name missing in invoice line")
-        available = float(get_item_stock(item_name) or 0)
         if qty <= 0:
             raise ValueError(f"Invalid quantity for item: {item_name}")
-        if available < qty:
-            raise ValueError(
-                f"Insufficient stock for {item_name}. Available: {available:.2f}, Required: {qty:.2f}"
-            )
 
     # ---------------- TOTALS ----------------
     subtotal = sum(i.get("taxable", i["qty"] * i["rate"]) for i in items)
@@ -101,59 +118,56 @@ def create_sale(customer_name, phone, items, payment_mode, paid_amount, discount
     due = round(grand_total - paid, 2)
     if due < 0:
         due = 0.0
-    # ---------------- RECORD ----------------
-    record = {
-        "invoice_no": invoice_no,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "customer_name": customer_name,
-        "phone": phone,
-        "items": items,
-        "subtotal": round(subtotal, 2),
-        "gst_total": round(gst_total, 2),
-        "gross_total": gross_total,
-        "discount_percent": round(discount_percent, 2),
-        "discount_amount": discount_amount,
-        "grand_total": grand_total,
-        "paid": paid,
-        "paid_amount": paid,
-        "due": due,
-        "payment_mode": payment_mode
-    }
+    # Id, stock, invoice, cash entry and audit lines commit together or not at all.
+    with unit_of_work("sale"):
+        invoice_no = generate_invoice_no()
+
+        # ---------------- RECORD ----------------
+        record = {
+            "invoice_no": invoice_no,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "customer_name": customer_name,
+            "phone": phone,
+            "items": items,
+            "subtotal": round(subtotal, 2),
+            "gst_total": round(gst_total, 2),
+            "gross_total": gross_total,
+            "discount_percent": round(discount_percent, 2),
+            "discount_amount": discount_amount,
+            "grand_total": grand_total,
+            "paid": paid,
+            "paid_amount": paid,
+            "due": due,
+            "payment_mode": payment_mode
+        }
 
-    # ---------------- STOCK REDUCE ----------------
-    # Reduce stock first; only then persist sale.
-    for i in items:
-        item_name = i.get("item") or i.get("name")
-        qty = i["qty"]
-        reduce_stock(item_name=item_name, qty=qty)
-        # Keep Item Summary available_qty synchronized with sale movement.
-        adjust_item_summary_available_qty(item_name, -qty)
-        set_item_summary_override(item_name, available_qty=get_item_stock(item_name))
+        # ---------------- STOCK REDUCE ----------------
+        # Reduce stock first (one inventory write for all lines); only then persist sale.
+        apply_stock_movements(
+            [{"item": i.get("item") or i.get("name"), "qty": -i["qty"]} for i in items],
+            reason="sale"
+        )
 
-    sales.append(record)
-    save_sales(sales)
+        before = item_aggregates.begin_update()
+        before_due = receivables.begin_update()
+        put_sale(record)
+        item_aggregates.record_sale(record, before)
+        receivables.record_sales([record], before_due)
 
-    from cash_ledger import add_cash_entry
+        from cash_ledger import add_cash_entry
 
-    if payment_mode == "Cash" and paid > 0:
-        add_cash_entry(
-            date=datetime.now().strftime("%Y-%m-%d"),
-            particulars=f"Cash Sale {invoice_no}",
-            cash_in=paid,
-            reference=invoice_no
-        )
+        if payment_mode == "Cash" and paid > 0:
+            add_cash_entry(
+                date=datetime.now().strftime("%Y-%m-%d"),
+                particulars=f"Cash Sale {invoice_no}",
+                cash_in=paid,
+                reference=invoice_no
+            )
 
     return invoice_no
 
 def cancel_invoice(invoice_no, reason, user="admin"):
-    sales = load_sales()
-    target = None
-
-    for s in sales:
-        if s["invoice_no"] == invoice_no:
-            target = s
-            break
-
+    target = get_sale(invoice_no)
     if not target:
         raise ValueError("Invoice not found")
 
@@ -167,32 +181,39 @@ def cancel_invoice(invoice_no, reason, user="admin"):
         "due": target["due"]
     }
 
-    # STOCK REVERSE
-    for item in target.get("items", []):
-        item_name = item.get("item") or item.get("name")
-        qty = item["qty"]
-        add_stock(item_name=item_name, qty=qty, rate=item["rate"])
-        # Sync Item Summary quantity on invoice cancellation (stock restore).
-        adjust_item_summary_available_qty(item_name, qty)
-        set_item_summary_override(item_name, available_qty=get_item_stock(item_name))
-
-    target["cancelled"] = True
-    target["cancel_reason"] = reason
-    target["cancelled_on"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    save_sales(sales)
-
-    write_audit_log(
-        user=user,
-        module="sales",
-        action="cancel_invoice",
-        reference=invoice_no,
-        before=before,
-        after={
-            "cancelled": True,
-            "reason": reason
-        }
-    )
+    with unit_of_work(f"cancel {invoice_no}"):
+        # STOCK REVERSE
+        apply_stock_movements(
+            [
+                {"item": item.get("item") or item.get("name"), "qty": item["qty"], "rate": item["rate"]}
+                for item in target.get("items", [])
+            ],
+            user=user,
+            reason="invoice_cancel"
+        )
+
+        target = dict(target)
+        target["cancelled"] = True
+        target["cancel_reason"] = reason
+        target["cancelled_on"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        stamp = item_aggregates.begin_update()
+        due_stamp = receivables.begin_update()
+        put_sale(target)
+        item_aggregates.record_sale_cancel(target, stamp)
+        receivables.record_sales([target], due_stamp)
+
+        write_audit_log(
+            user=user,
+            module="sales",
+            action="cancel_invoice",
+            reference=invoice_no,
+            before=before,
+            after={
+                "cancelled": True,
+                "reason": reason
+            }
+        )
 
     return True
 
@@ -201,6 +222,9 @@ def cancel_invoice(invoice_no, reason, user="admin"):
 # Customer ledger (date-wise)
 # -------------------------------
 def get_customer_ledger(phone):
+    if sqlite_store.is_enabled():
+        return sqlite_store.customer_ledger(phone)
+
     sales = load_sales()
     ledger = []
 
@@ -221,20 +245,133 @@ def get_customer_ledger(phone):
 # Due report
 # -------------------------------
 def get_due_customers():
-    sales = load_sales()
-    dues = {}
+    return receivables.due_customers()
 
-    for s in sales:
-        if s["due"] > 0:
-            phone = s["phone"]
-            dues.setdefault(phone, {
-                "customer": s["customer_name"],
+
+def get_due_sales(phone="", name=""):
+    """
+    Open invoices (due > 0, not cancelled), newest first: all of them, or
+    those of the customer with this phone or name. Read through the
+    receivables index instead of scanning every sale.
+    """
+    if sqlite_store.is_enabled():
+        return sqlite_store.due_sales(phone, name)
+    return SALES_STORE.get_many(receivables.open_invoice_numbers(phone, name))
+
+
+def _put_payments(changed):
+    # Due payments change no item totals; keep both indexes current.
+    stamp = item_aggregates.begin_update()
+    due_stamp = receivables.begin_update()
+    for record in changed:
+        put_sale(record)
+    item_aggregates.record_sale_update(stamp)
+    receivables.record_sales(changed, due_stamp)
+
+
+def receive_customer_payment(amount, payment_mode="Cash", phone="", customer_name="", user="admin"):
+    """
+    Allocate a payment over a customer's open invoices, newest first.
+    Only the invoices it settles are rewritten. Returns
+    (used_amount, unused_amount, updated invoice numbers).
+    """
+    amount = round(float(amount), 2)
+    if amount <= 0:
+        raise ValueError("Pay amount must be greater than 0.")
+
+    with unit_of_work("due payment"):
+        targets = get_due_sales(phone, customer_name)
+        if not targets:
+            raise ValueError("No due invoices found for selected customer.")
+
+        remaining = amount
+        changed = []
+        for inv in targets:
+            if remaining <= 0:
+                break
+            due_before = float(inv.get("due", 0) or 0)
+            paid_before = float(inv.get("paid", inv.get("paid_amount", 0)) or 0)
+            take = min(remaining, due_before)
+            if take <= 0:
+                continue
+            inv = dict(inv)
+            inv["paid"] = round(paid_before + take, 2)
+            inv["paid_amount"] = inv["paid"]
+            inv["due"] = round(max(due_before - take, 0.0), 2)
+            inv["last_payment_mode"] = payment_mode
+            changed.append(inv)
+            remaining = round(remaining - take, 2)
+
+        used_amount = round(amount - remaining, 2)
+        if not changed:
+            return 0.0, remaining, []
+
+        _put_payments(changed)
+        updated = [inv.get("invoice_no", "") for inv in changed]
+        write_audit_log(
+            user=user,
+            module="due_payment",
+            action="receive_customer",
+            reference=phone or customer_name,
+            after={
+                "customer_name": customer_name,
                 "phone": phone,
-                "due": 0.0
-            })
-            dues[phone]["due"] += s["due"]
+                "payment_mode": payment_mode,
+                "paid_amount": used_amount,
+                "updated_invoices": updated,
+            },
+        )
+
+        if payment_mode == "Cash":
+            from cash_ledger import add_cash_entry
+
+            add_cash_entry(
+                date=datetime.now().strftime("%Y-%m-%d"),
+                particulars=f"Customer Payment {customer_name}",
+                cash_in=used_amount,
+                reference=phone or customer_name,
+            )
+
+    return used_amount, remaining, updated
+
+
+def receive_invoice_payment(invoice_no, amount, user="admin"):
+    """Record a cash payment against one invoice. Returns the updated invoice."""
+    amount = round(float(amount), 2)
+    with unit_of_work(f"payment {invoice_no}"):
+        sale = get_sale(invoice_no)
+        if not sale:
+            raise ValueError("Invoice not found")
+        before_paid = float(sale.get("paid", sale.get("paid_amount", 0)) or 0)
+        before_due = float(sale.get("due", 0) or 0)
+        if amount <= 0 or amount > before_due:
+            raise ValueError(f"Amount must be between 1 and {before_due:.2f}")
+
+        sale = dict(sale)
+        sale["paid"] = round(before_paid + amount, 2)
+        sale["paid_amount"] = sale["paid"]
+        sale["due"] = round(before_due - amount, 2)
+        _put_payments([sale])
+
+        write_audit_log(
+            user=user,
+            module="payment",
+            action="receive",
+            reference=invoice_no,
+            before={"paid": before_paid, "due": before_due},
+            after={"paid": sale["paid"], "due": sale["due"]}
+        )
+
+        from cash_ledger import add_cash_entry
+
+        add_cash_entry(
+            date=datetime.now().strftime("%Y-%m-%d"),
+            particulars=f"Customer Payment {invoice_no}",
+            cash_in=amount,
+            reference=invoice_no
+        )
 
-    return list(dues.values())
+    return sale
 
 
 # -------------------------------
@@ -266,8 +403,11 @@ def get_sales_by_days(days):
     """
     days = 0 (today), 7, 30, 90, 180, 365
     """
-    sales = load_sales()
     cutoff = datetime.now() - timedelta(days=days)
+    if sqlite_store.is_enabled():
+        return sqlite_store.sales_between(from_key=cutoff.strftime("%Y-%m-%d %H:%M:%S"))
+
+    sales = load_sales()
 
     result = []
     for s in sales:
@@ -278,6 +418,70 @@ def get_sales_by_days(days):
     return result
 
 
+# -------------------------------
+# Filtered sales report
+# -------------------------------
+def _parse_sale_date(value):
+    text = str(value or "").strip()
+    for fmt in ("%d-%m-%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except Exception:
+            continue
+    return None
+
+
+def query_sales(from_date=None, to_date=None, item=None, customer=None):
+    """
+    Sales between from_date/to_date (datetimes, inclusive), optionally
+    containing an exact item line or a customer name substring.
+    Newest first. Uses indexed queries in SQLite mode.
+    """
+    item = str(item or "").strip()
+    customer = str(customer or "").strip().lower()
+
+    if sqlite_store.is_enabled():
+        return sqlite_store.sales_between(
+            from_key=from_date.strftime("%Y-%m-%d %H:%M:%S") if from_date else "",
+            to_key=to_date.strftime("%Y-%m-%d %H:%M:%S") if to_date else "",
+            item=item,
+            customer=customer,
+        )
+
+    rows = []
+    for s in load_sales():
+        sale_dt = _parse_sale_date(s.get("date"))
+        if from_date and (not sale_dt or sale_dt < from_date):
+            continue
+        if to_date and (not sale_dt or sale_dt > to_date):
+            continue
+        if item and not any((it.get("item") or it.get("name")) == item for it in s.get("items", [])):
+            continue
+        if customer and customer not in str(s.get("customer_name", "")).strip().lower():
+            continue
+        rows.append(s)
+
+    return sorted(rows, key=lambda x: _parse_sale_date(x.get("date")) or datetime.min, reverse=True)
+
+
+def get_sales_filter_values():
+    """(item names, customer names) seen in sales, for report filter dropdowns."""
+    if sqlite_store.is_enabled():
+        return sqlite_store.sale_item_names(), sqlite_store.sale_customer_names()
+
+    items = set()
+    customers = set()
+    for s in load_sales():
+        name = str(s.get("customer_name", "")).strip()
+        if name:
+            customers.add(name)
+        for it in s.get("items", []):
+            item_name = str(it.get("item") or it.get("name") or "").strip()
+            if item_name:
+                items.add(item_name)
+    return sorted(items, key=str.lower), sorted(customers, key=str.lower)
+
+
 # -------------------------------
 # Flat sales data (Excel friendly)
 # -------------------------------
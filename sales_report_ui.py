@@ -2,11 +2,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 
-from sales import load_sales
+from sales import get_sales_filter_values, query_sales
 from date_picker import open_date_picker
 from report_pdf import generate_sales_report_pdf
 from utils_print import print_pdf
+from autocomplete import suggest, debounce
 from ui_theme import compact_form_grid
+from virtual_tree import VirtualTree
+from ui_tasks import TaskStatus
 
 
 class SalesReportUI(ttk.Frame):
@@ -14,7 +17,6 @@ class SalesReportUI(ttk.Frame):
         super().__init__(parent)
         self.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.sales = []
         self.filtered_sales = []
         self.tree_invoice_map = {}
         self.item_values_all = []
@@ -65,14 +67,14 @@ class SalesReportUI(ttk.Frame):
         ttk.Label(filter_frame, text="Item").grid(row=2, column=0, sticky="w", pady=(6, 4))
         self.item_cb = ttk.Combobox(filter_frame, width=28, state="normal")
         self.item_cb.grid(row=2, column=1, columnspan=3, sticky="w", pady=(6, 4))
-        self.item_cb.bind("<KeyRelease>", self.on_item_search)
+        self.item_cb.bind("<KeyRelease>", debounce(self, self.on_item_search))
         self.item_cb.bind("<FocusOut>", self.on_item_focus_out)
         self.item_cb.bind("<Down>", self.on_item_down_key)
 
         ttk.Label(filter_frame, text="Customer").grid(row=3, column=0, sticky="w", pady=(2, 6))
         self.customer_cb = ttk.Combobox(filter_frame, width=28, state="normal")
         self.customer_cb.grid(row=3, column=1, columnspan=3, sticky="w", pady=(2, 6))
-        self.customer_cb.bind("<KeyRelease>", self.on_customer_search)
+        self.customer_cb.bind("<KeyRelease>", debounce(self, self.on_customer_search))
         self.customer_cb.bind("<FocusOut>", self.on_customer_focus_out)
         self.customer_cb.bind("<Down>", self.on_customer_down_key)
 
@@ -110,6 +112,7 @@ class SalesReportUI(ttk.Frame):
         xsb.grid(row=1, column=0, sticky="ew")
         self.tree.bind("<<TreeviewSelect>>", self.on_selection_change)
         self.tree.bind("<Double-1>", self.on_row_double_click)
+        self.view = VirtualTree(self.tree, ysb)
         self._setup_sorting()
 
         bottom = ttk.Frame(self)
@@ -119,6 +122,8 @@ class SalesReportUI(ttk.Frame):
         ttk.Label(bottom, textvariable=self.summary_var, font=("Arial", 10, "bold"), foreground="green").pack(
             side="left"
         )
+        self.tasks = TaskStatus(bottom)
+        self.tasks.pack(side="left", padx=(12, 0))
 
         actions = ttk.Frame(bottom)
         actions.pack(side="right")
@@ -273,19 +278,10 @@ class SalesReportUI(ttk.Frame):
         return dt.strftime("%d-%m-%Y %H:%M:%S")
 
     def load_data(self):
-        self.sales = load_sales()
-        items = set()
-        customers = set()
-        for s in self.sales:
-            name = str(s.get("customer_name", "")).strip()
-            if name:
-                customers.add(name)
-            for it in s.get("items", []):
-                item_name = str(it.get("item") or it.get("name") or "").strip()
-                if item_name:
-                    items.add(item_name)
-        self.item_values_all = sorted(items, key=str.lower)
-        self.customer_values_all = sorted(customers, key=str.lower)
+        self.tasks.run(lambda _task: get_sales_filter_values(), on_done=self._apply_filter_values, text="Loading sales...")
+
+    def _apply_filter_values(self, values):
+        self.item_values_all, self.customer_values_all = values
         self.item_cb["values"] = self.item_values_all
         self.customer_cb["values"] = self.customer_values_all
         self.load_report()
@@ -306,7 +302,7 @@ class SalesReportUI(ttk.Frame):
         if not typed:
             self._hide_item_suggestions()
             return
-        filtered = [v for v in self.item_values_all if typed in v.lower()]
+        filtered = suggest(self.item_values_all, typed)
         self._show_item_suggestions(filtered if filtered else self.item_values_all)
 
     def on_customer_search(self, event=None):
@@ -316,55 +312,41 @@ class SalesReportUI(ttk.Frame):
         if not typed:
             self._hide_customer_suggestions()
             return
-        filtered = [v for v in self.customer_values_all if typed in v.lower()]
+        filtered = suggest(self.customer_values_all, typed)
         self._show_customer_suggestions(filtered if filtered else self.customer_values_all)
 
     def load_report(self):
-        self.tree.delete(*self.tree.get_children())
-        self.filtered_sales = []
-        self.tree_invoice_map = {}
-
         mode = self.filter_var.get()
         from_d = self.parse_date(self.from_date.get().strip())
         to_d = self.parse_date(self.to_date.get().strip())
         selected_item = self.item_cb.get().strip()
         selected_customer = self.customer_cb.get().strip().lower()
 
-        rows = []
-        for s in self.sales:
-            sale_dt = self.parse_date(s.get("date"))
-            if from_d and (not sale_dt or sale_dt < from_d):
-                continue
-            if to_d and (not sale_dt or sale_dt > to_d):
-                continue
-
-            if mode == "item" and selected_item:
-                if not any((it.get("item") or it.get("name")) == selected_item for it in s.get("items", [])):
-                    continue
-            if mode == "customer" and selected_customer:
-                if selected_customer not in str(s.get("customer_name", "")).strip().lower():
-                    continue
-
-            rows.append(s)
-
-        rows = sorted(rows, key=lambda x: self.parse_date(x.get("date")) or datetime.min, reverse=True)
-        self.filtered_sales = rows
+        def work(task):
+            rows = query_sales(
+                from_date=from_d,
+                to_date=to_d,
+                item=selected_item if mode == "item" else None,
+                customer=selected_customer if mode == "customer" else None,
+            )
+            task.check()
+            totals = (
+                sum(self._to_float(s.get("grand_total", 0)) for s in rows),
+                sum(self._to_float(s.get("paid", s.get("paid_amount", 0))) for s in rows),
+                sum(self._to_float(s.get("due", 0)) for s in rows),
+            )
+            return rows, self._build_rows(rows), totals
 
-        total_sales = sum(self._to_float(s.get("grand_total", 0)) for s in rows)
-        total_paid = sum(self._to_float(s.get("paid", s.get("paid_amount", 0))) for s in rows)
-        total_due = sum(self._to_float(s.get("due", 0)) for s in rows)
-        self.summary_var.set(
-            f"TOTAL SALES: Rs {total_sales:.2f}   PAID: Rs {total_paid:.2f}   DUE: Rs {total_due:.2f}"
-        )
+        self.tasks.run(work, on_done=self._show_report, text="Loading sales...")
 
+    def _build_rows(self, rows):
+        values = []
         for s in rows:
             grand_total = self._to_float(s.get("grand_total", 0))
             paid = self._to_float(s.get("paid", s.get("paid_amount", 0)))
             due = self._to_float(s.get("due", max(grand_total - paid, 0)))
-            iid = self.tree.insert(
-                "",
-                "end",
-                values=(
+            values.append(
+                (
                     self.format_date(s.get("date", "")),
                     s.get("invoice_no", ""),
                     s.get("customer_name", ""),
@@ -372,20 +354,29 @@ class SalesReportUI(ttk.Frame):
                     f"{grand_total:.2f}",
                     f"{paid:.2f}",
                     f"{due:.2f}",
-                ),
+                )
             )
-            self.tree_invoice_map[iid] = s
+        return values
+
+    def _show_report(self, result):
+        rows, values, (total_sales, total_paid, total_due) = result
+        self.filtered_sales = rows
+        self.tree_invoice_map = {str(idx): s for idx, s in enumerate(rows)}
+        self.summary_var.set(
+            f"TOTAL SALES: Rs {total_sales:.2f}   PAID: Rs {total_paid:.2f}   DUE: Rs {total_due:.2f}"
+        )
+        self.view.set_rows(values)
 
         self.selected_summary_var.set("Selected: 0 | Total: 0.00 | Paid: 0.00 | Due: 0.00")
 
     def on_selection_change(self, _event=None):
-        selected = self.tree.selection()
+        selected = self.view.selection()
         if not selected:
             self.selected_summary_var.set("Selected: 0 | Total: 0.00 | Paid: 0.00 | Due: 0.00")
             return
         tot = paid = due = 0.0
         for iid in selected:
-            vals = self.tree.item(iid, "values")
+            vals = self.view.values(iid)
             if not vals:
                 continue
             tot += self._to_float(vals[4])
@@ -398,21 +389,27 @@ class SalesReportUI(ttk.Frame):
     def on_export_excel(self):
         from export_excel import export_sales_excel
 
-        path = export_sales_excel()
-        if not path:
-            messagebox.showinfo("Sales Report", "No sales data to export.")
+        def done(path):
+            if not path:
+                messagebox.showinfo("Sales Report", "No sales data to export.")
+
+        self.tasks.run(lambda _task: export_sales_excel(), on_done=done, text="Exporting Excel...")
 
     def on_export_pdf(self):
-        path = generate_sales_report_pdf()
-        if not path:
-            messagebox.showinfo("Sales Report", "No sales data to export.")
+        def done(path):
+            if not path:
+                messagebox.showinfo("Sales Report", "No sales data to export.")
+
+        self.tasks.run(lambda _task: generate_sales_report_pdf(), on_done=done, text="Creating PDF...")
 
     def on_print(self):
-        path = generate_sales_report_pdf()
-        if not path:
-            messagebox.showinfo("Sales Report", "No sales data to print.")
-            return
-        print_pdf(path)
+        def done(path):
+            if not path:
+                messagebox.showinfo("Sales Report", "No sales data to print.")
+                return
+            print_pdf(path)
+
+        self.tasks.run(lambda _task: generate_sales_report_pdf(), on_done=done, text="Creating PDF...", key="print")
 
     def _setup_sorting(self):
         for col in self.tree["columns"]:
@@ -429,10 +426,7 @@ class SalesReportUI(ttk.Frame):
             except Exception:
                 return (2, text.lower())
 
-        rows = [(self.tree.set(k, col), k) for k in self.tree.get_children("")]
-        rows.sort(key=lambda t: parse_value(t[0]), reverse=reverse)
-        for idx, (_, k) in enumerate(rows):
-            self.tree.move(k, "", idx)
+        self.view.sort(col, key=parse_value, reverse=reverse)
         self.tree.heading(col, command=lambda c=col: self._sort_tree_column(c, not reverse))
 
     def on_row_double_click(self, _event=None):
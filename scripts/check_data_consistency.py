@@ -0,0 +1,24 @@
+import sys
+
+from data_consistency import ensure_data_consistency_if_needed
+
+
+def main(argv):
+    deep = "--deep" in argv
+    result = ensure_data_consistency_if_needed(deep=deep)
+    if result.get("skipped"):
+        print("Data unchanged since the last check")
+        return 0
+
+    print(f"Consistency check ({result.get('mode', 'full')}):")
+    for key in ("purchase_records", "sales_records", "inventory_items"):
+        print(f"{key}: {result.get(key, 0)}")
+    fixed = [key for key in ("purchase_changed", "sales_changed", "inventory_changed") if result.get(key)]
+    print("Fixed: " + (", ".join(fixed) if fixed else "nothing"))
+    if not deep:
+        print("Run with --deep to re-check every record and rebuild inventory from history.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,42 @@
+import sys
+
+from item_aggregates import rebuild_item_aggregates
+from item_master import merge_items, merge_rules, remove_merge_rule
+
+USAGE = """Usage:
+  merge_items.py                     list merge rules
+  merge_items.py SOURCE TARGET       report SOURCE under TARGET from now on
+  merge_items.py --remove SOURCE     undo the merge of SOURCE"""
+
+
+def main(argv):
+    if not argv:
+        rules = merge_rules()
+        if not rules:
+            print("No merge rules")
+        for source, target in rules:
+            print(f"{source} -> {target}")
+        return 0
+
+    try:
+        if argv[0] == "--remove" and len(argv) == 2:
+            if not remove_merge_rule(argv[1]):
+                print(f"No merge rule for {argv[1]}")
+                return 1
+            print(f"Merge of {argv[1]} removed; item aggregates rebuilt")
+            return 0
+        if len(argv) == 2 and not argv[0].startswith("--"):
+            target = merge_items(argv[0], argv[1])
+            rebuild_item_aggregates()
+            print(f"{argv[0]} merged into {target}")
+            return 0
+    except ValueError as exc:
+        print(exc)
+        return 1
+
+    print(USAGE)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,23 +1,67 @@
+import argparse
+import hashlib
 import json
 import os
+import time
 from datetime import datetime
 
-from mongo_api import collection, is_configured
+from pymongo import ASCENDING, UpdateOne
+
+import durable_io
+from audit_log import iter_audit_logs
+from cash_ledger import load_cash_ledger
+from counters import id_number
+from customers import load_customers
+from inventory import load_inventory
+from mongo_api import collection, get_db, is_configured, seed_sequence
+from purchase import load_purchases
+from sales import load_sales
+from shop_managers import load_shop_manager_accounts
+from suppliers import load_suppliers
 from utils import app_dir
 
 
 DATA_DIR = os.path.join(app_dir(), "data")
-FILES = {
-    "sales": "sales.json",
-    "purchases": "purchase.json",
-    "inventory": "inventory.json",
-    "customers": "customers.json",
-    "suppliers": "suppliers.json",
-    "audit_log": "audit_log.json",
-    "cash_ledger": "cash_ledger.json",
-    "shop_managers": "shop_manager_users.json",
+# Every collection is read through its module's loader, so journal- and
+# segment-backed data not yet compacted is included and the SQLite backend
+# (APP_STORAGE_BACKEND=sqlite) migrates the same way as the JSON files.
+LOADERS = {
+    "sales": load_sales,
+    "purchases": load_purchases,
+    "inventory": load_inventory,
+    "customers": load_customers,
+    "suppliers": load_suppliers,
+    "audit_log": iter_audit_logs,
+    "cash_ledger": load_cash_ledger,
+    "shop_managers": load_shop_manager_accounts,
+}
+# Field each collection is upserted on. Collections without one (append-only
+# logs), and rows missing their key field (purchases saved before purchase
+# ids existed), are keyed on a content hash stored in MIGRATION_KEY.
+KEY_FIELDS = {
+    "sales": "invoice_no",
+    "purchases": "purchase_id",
+    "inventory": "item",
+    "customers": "phone",
+    "suppliers": "id",
+    "shop_managers": "username",
+}
+MIGRATION_KEY = "migration_key"
+# Id counters seeded from the migrated rows, so a running API continues
+# numbering after them (it also seeds at startup):
+# collection -> (counter name = key field, id prefix).
+SEQUENCES = {
+    "sales": ("invoice_no", "INV"),
+    "purchases": ("purchase_id", "P"),
 }
 
+# What has been written so far, per database and collection:
+# {"db": name, "collections": {coll: {key: row_hash}}}. Rows whose hash is
+# unchanged are skipped, so an interrupted run resumes where it stopped and
+# later runs only send new or edited rows.
+CHECKPOINT_FILE = os.path.join(DATA_DIR, ".mongo_migration.json")
+DEFAULT_BATCH_SIZE = 500
+
 
 def _load_json(path, default):
     if not os.path.exists(path):
@@ -29,53 +73,172 @@ def _load_json(path, default):
             return default
 
 
-def _ensure_list(name, data):
-    if isinstance(data, list):
-        return data
+def _iter_rows(name, data):
+    """Rows of a collection; dict-shaped files become one row per entry."""
     if isinstance(data, dict):
-        if name == "inventory":
-            rows = []
-            for item_name, rec in data.items():
-                if not isinstance(rec, dict):
-                    continue
-                rows.append(
-                    {
-                        "item": item_name,
-                        "stock": float(rec.get("stock", 0) or 0),
-                        "rate": float(rec.get("rate", 0) or 0),
-                    }
-                )
-            return rows
-    return []
-
-
-def migrate(overwrite=False):
+        for key, rec in data.items():
+            if not isinstance(rec, dict):
+                continue
+            if name == "inventory":
+                yield {
+                    "item": key,
+                    "stock": float(rec.get("stock", 0) or 0),
+                    "rate": float(rec.get("rate", 0) or 0),
+                }
+            else:
+                row = dict(rec)
+                key_field = KEY_FIELDS.get(name)
+                if key_field and not row.get(key_field):
+                    row[key_field] = key
+                yield row
+        return
+    for row in data or []:
+        if isinstance(row, dict):
+            yield row
+
+
+def _row_hash(row):
+    text = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def _load_checkpoint(db_name):
+    data = _load_json(CHECKPOINT_FILE, {})
+    if not isinstance(data, dict) or data.get("db") != db_name:
+        return {"db": db_name, "collections": {}}
+    data.setdefault("collections", {})
+    return data
+
+
+def _save_checkpoint(checkpoint):
+    durable_io.write_json(CHECKPOINT_FILE, checkpoint, indent=None)
+
+
+def _sync_collection(coll_name, rows, synced, batch_size, on_batch):
+    """Upsert new or changed rows in batches. Returns (written, unchanged, hashed)."""
+    col = collection(coll_name)
+    key_field = KEY_FIELDS.get(coll_name)
+    col.create_index([(MIGRATION_KEY, ASCENDING)], name="ix_migration_key", sparse=True)
+
+    written = unchanged = hashed = 0
+    seen = {}
+    ops, pending = [], {}
+
+    def flush():
+        nonlocal ops, pending, written
+        if ops:
+            col.bulk_write(ops, ordered=False)
+            written += len(ops)
+            synced.update(pending)
+            on_batch()
+        ops, pending = [], {}
+
+    for row in rows:
+        row_hash = _row_hash(row)
+        key = str(row.get(key_field) or "").strip() if key_field else ""
+        if key:
+            doc = dict(row)
+            match = {key_field: row.get(key_field)}
+        else:
+            hashed += 1
+            # Identical log lines stay distinct through their occurrence count.
+            seen[row_hash] = seen.get(row_hash, 0) + 1
+            key = f"{row_hash}:{seen[row_hash]}"
+            doc = dict(row, **{MIGRATION_KEY: key})
+            match = {MIGRATION_KEY: key}
+
+        if synced.get(key) == row_hash:
+            unchanged += 1
+            continue
+        doc.pop("_id", None)
+        doc.pop("_migrated_at", None)
+        ops.append(
+            UpdateOne(
+                match,
+                {"$set": doc, "$setOnInsert": {"_migrated_at": datetime.utcnow().isoformat()}},
+                upsert=True,
+            )
+        )
+        pending[key] = row_hash
+        if len(ops) >= batch_size:
+            flush()
+    flush()
+    return written, unchanged, hashed
+
+
+def migrate(overwrite=False, batch_size=DEFAULT_BATCH_SIZE, only=None, report=None):
+    """
+    Copy the desktop data (JSON files or the SQLite database) into MongoDB.
+
+    Rows are upserted in bulk_write batches keyed on KEY_FIELDS, and the
+    checkpoint is saved after every batch. Re-running resumes an interrupted
+    migration and, against a live install, syncs only what changed since.
+    Rows deleted locally are not removed remotely. overwrite empties each
+    collection and forgets the checkpoint first.
+    """
     if not is_configured():
         raise RuntimeError("Configure MONGODB_URI and MONGODB_DB_NAME before migration")
 
+    checkpoint = _load_checkpoint(get_db().name)
     result = {}
-    for coll_name, file_name in FILES.items():
-        path = os.path.join(DATA_DIR, file_name)
-        default = {} if coll_name == "inventory" else []
-        data = _load_json(path, default)
-        rows = _ensure_list(coll_name, data)
-
-        col = collection(coll_name)
+    for coll_name, loader in LOADERS.items():
+        if only and coll_name not in only:
+            continue
         if overwrite:
-            col.delete_many({})
-        if rows:
-            for r in rows:
-                if isinstance(r, dict):
-                    r.setdefault("_migrated_at", datetime.utcnow().isoformat())
-            col.insert_many(rows)
+            collection(coll_name).delete_many({})
+            checkpoint["collections"].pop(coll_name, None)
+            _save_checkpoint(checkpoint)
 
-        result[coll_name] = len(rows)
+        data = loader()
+        synced = checkpoint["collections"].setdefault(coll_name, {})
+        started = time.monotonic()
+        written, unchanged, hashed = _sync_collection(
+            coll_name,
+            _iter_rows(coll_name, data),
+            synced,
+            max(1, int(batch_size)),
+            lambda: _save_checkpoint(checkpoint),
+        )
+        if coll_name in SEQUENCES:
+            key_field, prefix = SEQUENCES[coll_name]
+            highest = max([id_number(row.get(key_field), prefix) for row in _iter_rows(coll_name, data)] or [0])
+            seed_sequence(key_field, highest)
+        seconds = time.monotonic() - started
+        result[coll_name] = {
+            "rows": written + unchanged,
+            "written": written,
+            "unchanged": unchanged,
+            "hashed": hashed,
+            "seconds": round(seconds, 2),
+        }
+        if report:
+            report(coll_name, result[coll_name])
 
     return result
 
 
+def _print_report(coll_name, stats):
+    rate = stats["written"] / stats["seconds"] if stats["seconds"] else 0.0
+    fallback = ""
+    if stats["hashed"] and coll_name in KEY_FIELDS:
+        # Rows with no key field, upserted on their content hash instead.
+        fallback = f", {stats['hashed']} without {KEY_FIELDS[coll_name]} keyed by content"
+    print(
+        f"{coll_name}: {stats['rows']} rows, {stats['written']} written, {stats['unchanged']} unchanged"
+        f"{fallback} in {stats['seconds']:.2f}s ({rate:.0f} rows/s)"
+    )
+
+
 if __name__ == "__main__":
-    out = migrate(overwrite=True)
-    print("Migration complete")
-    for k, v in out.items():
-        print(f"{k}: {v}")
+    parser = argparse.ArgumentParser(description="Copy desktop data into MongoDB (resumable, incremental).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--overwrite", action="store_true", help="empty each collection and start over")
+    parser.add_argument("--only", nargs="*", choices=sorted(LOADERS), help="collections to sync")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    out = migrate(overwrite=args.overwrite, batch_size=args.batch_size, only=args.only, report=_print_report)
+    total = sum(v["written"] for v in out.values())
+    seconds = time.monotonic() - started
+    print(f"Migration complete: {total} rows written in {seconds:.2f}s")
+    print("Run POST /admin/reconcile on the API to refresh date keys and the item rollup.")
@@ -0,0 +1,25 @@
+import sys
+
+from item_aggregates import rebuild_item_aggregates, verify_item_aggregates
+
+
+def main(argv):
+    if "--rebuild" in argv:
+        items = rebuild_item_aggregates()
+        print(f"Item aggregates rebuilt: {len(items)} items")
+        return 0
+
+    problems = verify_item_aggregates()
+    if not problems:
+        print("Item aggregates OK")
+        return 0
+
+    print(f"Item aggregates out of date ({len(problems)} mismatches):")
+    for key, field, stored, expected in problems:
+        print(f"{key}.{field}: stored {stored}, expected {expected}")
+    print("Run with --rebuild to recompute from purchases and sales.")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
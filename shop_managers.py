@@ -0,0 +1,71 @@
+import json
+import os
+
+from utils import app_dir
+import durable_io
+
+SHOP_MANAGER_USERS_FILE = os.path.join("data", "shop_manager_users.json")
+
+
+# Shop manager accounts live in this JSON file in every storage backend.
+def load_shop_manager_accounts():
+    path = os.path.join(app_dir(), SHOP_MANAGER_USERS_FILE)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return []
+
+    if not isinstance(data, list):
+        return []
+
+    # Backward compatibility: older format was list of passwords.
+    if data and isinstance(data[0], str):
+        migrated = []
+        for idx, raw_pwd in enumerate(data, start=1):
+            pwd = str(raw_pwd or "").strip()
+            if not pwd:
+                continue
+            migrated.append(
+                {
+                    "username": f"SM-{idx:03d}",
+                    "password": pwd,
+                    "created_on": "",
+                    "last_login": "",
+                    "is_active": True,
+                    "is_deleted": False,
+                    "deleted_on": "",
+                }
+            )
+        save_shop_manager_accounts(migrated)
+        return migrated
+
+    normalized = []
+    for rec in data:
+        if not isinstance(rec, dict):
+            continue
+        username = str(rec.get("username", "")).strip() or f"SM-{len(normalized) + 1:03d}"
+        password = str(rec.get("password", "")).strip()
+        if not password:
+            continue
+        normalized.append(
+            {
+                "username": username,
+                "password": password,
+                "created_on": str(rec.get("created_on", "")).strip(),
+                "last_login": str(rec.get("last_login", "")).strip(),
+                "is_active": bool(rec.get("is_active", True)),
+                "is_deleted": bool(rec.get("is_deleted", False)),
+                "deleted_on": str(rec.get("deleted_on", "")).strip(),
+            }
+        )
+    return normalized
+
+
+def save_shop_manager_accounts(accounts):
+    path = os.path.join(app_dir(), SHOP_MANAGER_USERS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    accounts = sorted(accounts, key=lambda a: str(a.get("username", "")).lower())
+    durable_io.write_json(path, accounts, indent=2)
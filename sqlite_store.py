@@ -0,0 +1,766 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from utils import app_dir
+from journal_store import JournalStore
+
+
+# -------------------------------
+# Backend selection
+# -------------------------------
+# Set APP_STORAGE_BACKEND=sqlite to keep desktop data in data/billing.db
+# instead of the flat JSON files. JSON stays the default.
+BACKEND_ENV = "APP_STORAGE_BACKEND"
+
+BASE_DIR = app_dir()
+DATA_DIR = os.path.join(BASE_DIR, "data")
+DB_FILE = os.path.join(DATA_DIR, "billing.db")
+
+JSON_SOURCES = {
+    "sales": os.path.join(DATA_DIR, "sales.json"),
+    "purchases": os.path.join(DATA_DIR, "purchase.json"),
+    "inventory": os.path.join(DATA_DIR, "inventory.json"),
+    "customers": os.path.join(DATA_DIR, "customers.json"),
+    "suppliers": os.path.join(DATA_DIR, "suppliers.json"),
+    "cash_ledger": os.path.join(DATA_DIR, "cash_ledger.json"),
+    "supplier_payments": os.path.join(DATA_DIR, "supplier_payments.json"),
+}
+
+
+def is_enabled() -> bool:
+    return (os.getenv(BACKEND_ENV) or "").strip().lower() == "sqlite"
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sales (
+    invoice_no TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    date_key TEXT NOT NULL DEFAULT '',
+    customer_name TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    grand_total REAL NOT NULL DEFAULT 0,
+    paid REAL NOT NULL DEFAULT 0,
+    due REAL NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sales_seq ON sales(seq);
+CREATE INDEX IF NOT EXISTS ix_sales_date ON sales(date_key);
+CREATE INDEX IF NOT EXISTS ix_sales_phone ON sales(phone, date_key);
+CREATE INDEX IF NOT EXISTS ix_sales_customer ON sales(customer_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ix_sales_due ON sales(phone) WHERE due > 0;
+
+CREATE TABLE IF NOT EXISTS sale_items (
+    invoice_no TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    item TEXT NOT NULL DEFAULT '',
+    qty REAL NOT NULL DEFAULT 0,
+    rate REAL NOT NULL DEFAULT 0,
+    gst REAL NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (invoice_no, line_no)
+);
+CREATE INDEX IF NOT EXISTS ix_sale_items_item ON sale_items(item, invoice_no);
+
+CREATE TABLE IF NOT EXISTS purchases (
+    purchase_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    date_key TEXT NOT NULL DEFAULT '',
+    supplier_id TEXT NOT NULL DEFAULT '',
+    supplier_name TEXT NOT NULL DEFAULT '',
+    grand_total REAL NOT NULL DEFAULT 0,
+    paid_amount REAL NOT NULL DEFAULT 0,
+    due REAL NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_purchases_seq ON purchases(seq);
+CREATE INDEX IF NOT EXISTS ix_purchases_date ON purchases(date_key);
+CREATE INDEX IF NOT EXISTS ix_purchases_supplier ON purchases(supplier_name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS purchase_items (
+    purchase_id TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    item TEXT NOT NULL DEFAULT '',
+    qty REAL NOT NULL DEFAULT 0,
+    rate REAL NOT NULL DEFAULT 0,
+    gst REAL NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (purchase_id, line_no)
+);
+CREATE INDEX IF NOT EXISTS ix_purchase_items_item ON purchase_items(item, purchase_id);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    item TEXT PRIMARY KEY,
+    stock REAL NOT NULL DEFAULT 0,
+    rate REAL NOT NULL DEFAULT 0,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    phone TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_customers_name ON customers(name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS suppliers (
+    supplier_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_suppliers_name ON suppliers(name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS cash_ledger (
+    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_key TEXT NOT NULL DEFAULT '',
+    reference TEXT NOT NULL DEFAULT '',
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cash_ledger_date ON cash_ledger(date_key);
+CREATE INDEX IF NOT EXISTS ix_cash_ledger_reference ON cash_ledger(reference);
+
+CREATE TABLE IF NOT EXISTS supplier_payments (
+    entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payment_id TEXT NOT NULL DEFAULT '',
+    supplier_name TEXT NOT NULL DEFAULT '',
+    date_key TEXT NOT NULL DEFAULT '',
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_supplier_payments_supplier ON supplier_payments(supplier_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ix_supplier_payments_date ON supplier_payments(date_key);
+"""
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def date_key(value) -> str:
+    """Canonical sortable date text (YYYY-MM-DD HH:MM:SS) for any stored date format."""
+    text = str(value or "").strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    return ""
+
+
+def _dumps(rec) -> str:
+    return json.dumps(rec, ensure_ascii=False)
+
+
+def _load_json_file(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+
+# -------------------------------
+# Connection
+# -------------------------------
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_FILE, timeout=15, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    global _initialized
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+        _local.depth = 0
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.executescript(SCHEMA)
+                _import_json_if_needed(conn)
+                _initialized = True
+    return conn
+
+
+@contextmanager
+def transaction():
+    """BEGIN IMMEDIATE ... COMMIT on this thread's connection; nested calls join the outer one."""
+    conn = get_connection()
+    depth = getattr(_local, "depth", 0)
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE")
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except Exception:
+        _local.depth = depth
+        if depth == 0:
+            conn.execute("ROLLBACK")
+        raise
+    else:
+        _local.depth = depth
+        if depth == 0:
+            conn.execute("COMMIT")
+
+
+# -------------------------------
+# Row writers
+# -------------------------------
+def _legacy_key(seq: Optional[int], what: str, key_field: str) -> str:
+    # Old rows saved before ids were assigned keep their place in the table
+    # under a synthetic key; their doc is stored unchanged. Only a full write
+    # (import, save_*) knows the position, single puts still need the id.
+    if seq is None:
+        raise ValueError(f"{what} record requires '{key_field}'")
+    return f"legacy-{seq}"
+
+
+def _write_sale(conn, rec: dict, seq: Optional[int] = None):
+    invoice_no = str(rec.get("invoice_no", "")).strip() or _legacy_key(seq, "Sale", "invoice_no")
+    if seq is None:
+        row = conn.execute("SELECT seq FROM sales WHERE invoice_no = ?", (invoice_no,)).fetchone()
+        if row:
+            seq = row[0]
+        else:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM sales").fetchone()[0]
+
+    conn.execute(
+        "INSERT OR REPLACE INTO sales "
+        "(invoice_no, seq, date_key, customer_name, phone, grand_total, paid, due, cancelled, doc) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            invoice_no,
+            seq,
+            date_key(rec.get("date")),
+            str(rec.get("customer_name", "")).strip(),
+            str(rec.get("phone", "")).strip(),
+            _to_float(rec.get("grand_total", 0)),
+            _to_float(rec.get("paid", rec.get("paid_amount", 0))),
+            _to_float(rec.get("due", 0)),
+            1 if rec.get("cancelled") else 0,
+            _dumps(rec),
+        ),
+    )
+    conn.execute("DELETE FROM sale_items WHERE invoice_no = ?", (invoice_no,))
+    conn.executemany(
+        "INSERT INTO sale_items (invoice_no, line_no, item, qty, rate, gst, total) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                invoice_no,
+                idx,
+                str(i.get("item") or i.get("name") or "").strip(),
+                _to_float(i.get("qty", 0)),
+                _to_float(i.get("rate", 0)),
+                _to_float(i.get("gst", i.get("gst_percent", 0))),
+                _to_float(i.get("total", 0)),
+            )
+            for idx, i in enumerate(rec.get("items", []) or [])
+            if isinstance(i, dict)
+        ],
+    )
+
+
+def _write_purchase(conn, rec: dict, seq: Optional[int] = None):
+    purchase_id = str(rec.get("purchase_id", "")).strip() or _legacy_key(seq, "Purchase", "purchase_id")
+    if seq is None:
+        row = conn.execute("SELECT seq FROM purchases WHERE purchase_id = ?", (purchase_id,)).fetchone()
+        if row:
+            seq = row[0]
+        else:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM purchases").fetchone()[0]
+
+    conn.execute(
+        "INSERT OR REPLACE INTO purchases "
+        "(purchase_id, seq, date_key, supplier_id, supplier_name, grand_total, paid_amount, due, doc) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            purchase_id,
+            seq,
+            date_key(rec.get("date") or rec.get("created_on")),
+            str(rec.get("supplier_id") or "").strip(),
+            str(rec.get("supplier_name") or rec.get("supplier") or "").strip(),
+            _to_float(rec.get("grand_total", 0)),
+            _to_float(rec.get("paid_amount", rec.get("paid", 0))),
+            _to_float(rec.get("due", rec.get("due_amount", 0))),
+            _dumps(rec),
+        ),
+    )
+    conn.execute("DELETE FROM purchase_items WHERE purchase_id = ?", (purchase_id,))
+    conn.executemany(
+        "INSERT INTO purchase_items (purchase_id, line_no, item, qty, rate, gst, total) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                purchase_id,
+                idx,
+                str(i.get("item") or i.get("name") or "").strip(),
+                _to_float(i.get("qty", 0)),
+                _to_float(i.get("rate", 0)),
+                _to_float(i.get("gst", i.get("gst_percent", 0))),
+                _to_float(i.get("total", 0)),
+            )
+            for idx, i in enumerate(rec.get("items", []) or [])
+            if isinstance(i, dict)
+        ],
+    )
+
+
+def _write_inventory(conn, item: str, rec: dict):
+    conn.execute(
+        "INSERT OR REPLACE INTO inventory (item, stock, rate, doc) VALUES (?, ?, ?, ?)",
+        (item, _to_float(rec.get("stock", rec.get("qty", 0))), _to_float(rec.get("rate", 0)), _dumps(rec)),
+    )
+
+
+def _write_customer(conn, phone: str, rec: dict):
+    conn.execute(
+        "INSERT OR REPLACE INTO customers (phone, name, doc) VALUES (?, ?, ?)",
+        (phone, str(rec.get("name", "")).strip(), _dumps(rec)),
+    )
+
+
+def _write_supplier(conn, supplier_id: str, rec: dict):
+    conn.execute(
+        "INSERT OR REPLACE INTO suppliers (supplier_id, name, doc) VALUES (?, ?, ?)",
+        (supplier_id, str(rec.get("name", "")).strip(), _dumps(rec)),
+    )
+
+
+def _write_cash_entry(conn, rec: dict):
+    conn.execute(
+        "INSERT INTO cash_ledger (date_key, reference, doc) VALUES (?, ?, ?)",
+        (date_key(rec.get("date")), str(rec.get("reference", "")).strip(), _dumps(rec)),
+    )
+
+
+def _write_supplier_payment(conn, rec: dict):
+    conn.execute(
+        "INSERT INTO supplier_payments (payment_id, supplier_name, date_key, doc) VALUES (?, ?, ?, ?)",
+        (
+            str(rec.get("payment_id", "")).strip(),
+            str(rec.get("supplier_name", "")).strip(),
+            date_key(rec.get("date")),
+            _dumps(rec),
+        ),
+    )
+
+
+# -------------------------------
+# One-time import from JSON
+# -------------------------------
+def _json_records(path: str) -> Dict[str, dict]:
+    data = _load_json_file(path, {}) or {}
+    return {key: rec for key, rec in data.items() if isinstance(rec, dict)}
+
+
+def _check_imported(conn, table: str, expected: int):
+    # Rows collapsing onto one key (duplicate ids) would otherwise vanish
+    # silently; abort so the JSON files stay the source of truth.
+    found = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if found != expected:
+        raise ValueError(f"JSON import of {table} kept {found} of {expected} rows; fix the data and restart")
+
+
+def _import_json_if_needed(conn):
+    done = conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+    if done:
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        sales = [r for r in JournalStore(JSON_SOURCES["sales"], key_field="invoice_no").load() if isinstance(r, dict)]
+        for seq, rec in enumerate(sales, start=1):
+            _write_sale(conn, rec, seq=seq)
+        _check_imported(conn, "sales", len(sales))
+
+        purchases = [
+            r for r in JournalStore(JSON_SOURCES["purchases"], key_field="purchase_id").load() if isinstance(r, dict)
+        ]
+        for seq, rec in enumerate(purchases, start=1):
+            _write_purchase(conn, rec, seq=seq)
+        _check_imported(conn, "purchases", len(purchases))
+
+        inventory = _json_records(JSON_SOURCES["inventory"])
+        for item, rec in inventory.items():
+            _write_inventory(conn, item, rec)
+        _check_imported(conn, "inventory", len(inventory))
+        customers = _json_records(JSON_SOURCES["customers"])
+        for phone, rec in customers.items():
+            _write_customer(conn, phone, rec)
+        _check_imported(conn, "customers", len(customers))
+        suppliers = _json_records(JSON_SOURCES["suppliers"])
+        for supplier_id, rec in suppliers.items():
+            _write_supplier(conn, supplier_id, rec)
+        _check_imported(conn, "suppliers", len(suppliers))
+
+        cash = [r for r in JournalStore(JSON_SOURCES["cash_ledger"], key_field="entry_id").load() if isinstance(r, dict)]
+        for rec in cash:
+            _write_cash_entry(conn, rec)
+        _check_imported(conn, "cash_ledger", len(cash))
+        payments = [r for r in _load_json_file(JSON_SOURCES["supplier_payments"], []) or [] if isinstance(r, dict)]
+        for rec in payments:
+            _write_supplier_payment(conn, rec)
+        _check_imported(conn, "supplier_payments", len(payments))
+
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)",
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# -------------------------------
+# Sales
+# -------------------------------
+def load_sales() -> List[dict]:
+    rows = get_connection().execute("SELECT doc FROM sales ORDER BY seq").fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def save_sales(rows: List[dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM sale_items")
+        conn.execute("DELETE FROM sales")
+        for seq, rec in enumerate(rows, start=1):
+            _write_sale(conn, rec, seq=seq)
+
+
+def put_sale(rec: dict):
+    with transaction() as conn:
+        _write_sale(conn, rec)
+
+
+def get_sale(invoice_no: str) -> Optional[dict]:
+    row = get_connection().execute(
+        "SELECT doc FROM sales WHERE invoice_no = ?", (str(invoice_no or "").strip(),)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def customer_ledger(phone: str) -> List[dict]:
+    rows = get_connection().execute(
+        "SELECT date_key, invoice_no, grand_total, paid, due, doc FROM sales "
+        "WHERE phone = ? ORDER BY date_key DESC, seq",
+        (str(phone or "").strip(),),
+    ).fetchall()
+    return [
+        {
+            "date": json.loads(doc).get("date", dk),
+            "invoice": invoice_no,
+            "total": total,
+            "paid": paid,
+            "due": due,
+        }
+        for dk, invoice_no, total, paid, due, doc in rows
+    ]
+
+
+def due_customers() -> List[dict]:
+    rows = get_connection().execute(
+        # With a single MIN() aggregate SQLite takes bare columns from that
+        # row, so the name comes from the customer's oldest due invoice.
+        "SELECT phone, customer_name, SUM(due), MIN(seq) AS first_seq FROM sales "
+        "WHERE due > 0 AND cancelled = 0 GROUP BY phone ORDER BY first_seq"
+    ).fetchall()
+    return [{"customer": name, "phone": phone, "due": due} for phone, name, due, _seq in rows]
+
+
+def due_sales(phone: str = "", name: str = "") -> List[dict]:
+    """Open (due > 0, not cancelled) invoices, newest first; optionally one customer's."""
+    sql = "SELECT doc FROM sales WHERE due > 0 AND cancelled = 0"
+    params: List = []
+    phone = str(phone or "").strip()
+    name = str(name or "").strip()
+    match = []
+    if phone:
+        match.append("phone = ?")
+        params.append(phone)
+    if name:
+        match.append("customer_name = ? COLLATE NOCASE")
+        params.append(name)
+    if match:
+        sql += " AND (" + " OR ".join(match) + ")"
+    rows = get_connection().execute(sql + " ORDER BY date_key DESC, seq DESC", params).fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def sales_between(from_key: str = "", to_key: str = "", item: str = "", customer: str = "") -> List[dict]:
+    """
+    Indexed sales search (newest first). from_key/to_key are canonical
+    date keys; item is an exact line item name; customer is a
+    case-insensitive substring of customer_name.
+    """
+    where = []
+    params = []
+    if from_key:
+        where.append("s.date_key >= ?")
+        params.append(from_key)
+    if to_key:
+        where.append("s.date_key <= ?")
+        params.append(to_key)
+    if from_key or to_key:
+        where.append("s.date_key != ''")
+    if item:
+        where.append("s.invoice_no IN (SELECT invoice_no FROM sale_items WHERE item = ?)")
+        params.append(item)
+    if customer:
+        where.append("s.customer_name LIKE ? ESCAPE '\\'")
+        escaped = customer.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%{escaped}%")
+
+    sql = "SELECT s.doc FROM sales s"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY s.date_key DESC, s.seq"
+    return [json.loads(r[0]) for r in get_connection().execute(sql, params).fetchall()]
+
+
+def sale_item_names() -> List[str]:
+    rows = get_connection().execute("SELECT DISTINCT item FROM sale_items WHERE item != ''").fetchall()
+    return sorted((r[0] for r in rows), key=str.lower)
+
+
+def sale_customer_names() -> List[str]:
+    rows = get_connection().execute(
+        "SELECT DISTINCT customer_name FROM sales WHERE customer_name != ''"
+    ).fetchall()
+    return sorted((r[0] for r in rows), key=str.lower)
+
+
+# -------------------------------
+# Purchases
+# -------------------------------
+def load_purchases() -> List[dict]:
+    rows = get_connection().execute("SELECT doc FROM purchases ORDER BY seq").fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def save_purchases(rows: List[dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM purchase_items")
+        conn.execute("DELETE FROM purchases")
+        for seq, rec in enumerate(rows, start=1):
+            _write_purchase(conn, rec, seq=seq)
+
+
+def put_purchase(rec: dict):
+    with transaction() as conn:
+        _write_purchase(conn, rec)
+
+
+def history_stamp() -> List[int]:
+    """Row counts/max seq of sales and purchases; changes whenever history does."""
+    row = get_connection().execute(
+        "SELECT (SELECT COUNT(*) FROM sales), (SELECT COALESCE(MAX(seq), 0) FROM sales), "
+        "(SELECT COUNT(*) FROM sales WHERE cancelled = 1), "
+        "(SELECT COUNT(*) FROM purchases), (SELECT COALESCE(MAX(seq), 0) FROM purchases)"
+    ).fetchone()
+    return [int(v or 0) for v in row]
+
+
+_HISTORY_TABLES = {"sales": "invoice_no", "purchases": "purchase_id"}
+
+
+def history_mark() -> Dict[str, list]:
+    """{table: [max seq, row count, key at max seq]}; pass to history_since() later."""
+    conn = get_connection()
+    mark = {}
+    for table, key in _HISTORY_TABLES.items():
+        seq, count = conn.execute(f"SELECT COALESCE(MAX(seq), 0), COUNT(*) FROM {table}").fetchone()
+        row = conn.execute(f"SELECT {key} FROM {table} WHERE seq = ?", (seq,)).fetchone()
+        mark[table] = [int(seq), int(count), row[0] if row else ""]
+    return mark
+
+
+def history_since(mark) -> Optional[Dict[str, List[dict]]]:
+    """
+    {"sales": [...], "purchases": [...]} added after history_mark() returned
+    mark, in seq order. None if rows up to the mark were removed or rewritten.
+    """
+    if not isinstance(mark, dict):
+        return None
+    conn = get_connection()
+    added = {}
+    for table, key in _HISTORY_TABLES.items():
+        try:
+            seq, count, last_key = mark[table]
+        except (KeyError, TypeError, ValueError):
+            return None
+        if conn.execute(f"SELECT COUNT(*) FROM {table} WHERE seq <= ?", (seq,)).fetchone()[0] != count:
+            return None
+        row = conn.execute(f"SELECT {key} FROM {table} WHERE seq = ?", (seq,)).fetchone()
+        if (row[0] if row else "") != last_key:
+            return None
+        rows = conn.execute(f"SELECT doc FROM {table} WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        added[table] = [json.loads(r[0]) for r in rows]
+    return added
+
+
+def cancelled_invoice_numbers() -> List[str]:
+    rows = get_connection().execute("SELECT invoice_no FROM sales WHERE cancelled = 1").fetchall()
+    return [r[0] for r in rows]
+
+
+# -------------------------------
+# Inventory
+# -------------------------------
+def load_inventory() -> Dict[str, dict]:
+    rows = get_connection().execute("SELECT item, doc FROM inventory ORDER BY rowid").fetchall()
+    return {item: json.loads(doc) for item, doc in rows}
+
+
+def save_inventory(inv: Dict[str, dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM inventory")
+        for item, rec in inv.items():
+            _write_inventory(conn, item, rec)
+
+
+def load_inventory_items(items) -> Dict[str, dict]:
+    names = list(dict.fromkeys(items))
+    found = {}
+    conn = get_connection()
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        for item, doc in conn.execute(f"SELECT item, doc FROM inventory WHERE item IN ({marks})", chunk):
+            found[item] = json.loads(doc)
+    return found
+
+
+def put_inventory_items(changes: Dict[str, Optional[dict]]):
+    """Upsert each item's row; None deletes it."""
+    with transaction() as conn:
+        for item, rec in changes.items():
+            if rec is None:
+                conn.execute("DELETE FROM inventory WHERE item = ?", (item,))
+            else:
+                _write_inventory(conn, item, rec)
+
+
+def get_item_stock(item_name: str) -> float:
+    row = get_connection().execute("SELECT stock FROM inventory WHERE item = ?", (item_name,)).fetchone()
+    return float(row[0]) if row else 0.0
+
+
+# -------------------------------
+# Customers / suppliers
+# -------------------------------
+def load_customers() -> Dict[str, dict]:
+    rows = get_connection().execute("SELECT phone, doc FROM customers ORDER BY rowid").fetchall()
+    return {phone: json.loads(doc) for phone, doc in rows}
+
+
+def save_customers(data: Dict[str, dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM customers")
+        for phone, rec in data.items():
+            _write_customer(conn, phone, rec)
+
+
+def put_customer(phone: str, rec: dict):
+    with transaction() as conn:
+        _write_customer(conn, phone, rec)
+
+
+def get_customer_by_phone(phone: str) -> Optional[dict]:
+    row = get_connection().execute("SELECT doc FROM customers WHERE phone = ?", (phone,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def get_customer_by_name(name: str) -> Optional[dict]:
+    row = get_connection().execute(
+        "SELECT doc FROM customers WHERE name = ? COLLATE NOCASE ORDER BY rowid LIMIT 1",
+        (str(name or "").strip(),),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def load_suppliers() -> Dict[str, dict]:
+    rows = get_connection().execute("SELECT supplier_id, doc FROM suppliers ORDER BY rowid").fetchall()
+    return {supplier_id: json.loads(doc) for supplier_id, doc in rows}
+
+
+def save_suppliers(data: Dict[str, dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM suppliers")
+        for supplier_id, rec in data.items():
+            _write_supplier(conn, supplier_id, rec)
+
+
+# -------------------------------
+# Cash ledger / supplier payments
+# -------------------------------
+def load_cash_ledger() -> List[dict]:
+    rows = get_connection().execute("SELECT doc FROM cash_ledger ORDER BY entry_id").fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def save_cash_ledger(rows: List[dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM cash_ledger")
+        for rec in rows:
+            _write_cash_entry(conn, rec)
+
+
+def append_cash_entry(rec: dict):
+    with transaction() as conn:
+        _write_cash_entry(conn, rec)
+
+
+def load_supplier_payments() -> List[dict]:
+    rows = get_connection().execute("SELECT doc FROM supplier_payments ORDER BY entry_id").fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def save_supplier_payments(rows: List[dict]):
+    with transaction() as conn:
+        conn.execute("DELETE FROM supplier_payments")
+        for rec in rows:
+            _write_supplier_payment(conn, rec)
+
+
+def append_supplier_payment(rec: dict):
+    with transaction() as conn:
+        _write_supplier_payment(conn, rec)
+
+
+def count_supplier_payments() -> int:
+    return int(get_connection().execute("SELECT COUNT(*) FROM supplier_payments").fetchone()[0])
+
+
+def get_supplier_payments(supplier_name: str) -> List[dict]:
+    rows = get_connection().execute(
+        "SELECT doc FROM supplier_payments WHERE supplier_name = ? COLLATE NOCASE ORDER BY entry_id",
+        (str(supplier_name or "").strip(),),
+    ).fetchall()
+    return [json.loads(r[0]) for r in rows]
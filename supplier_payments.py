@@ -3,6 +3,9 @@ import os
 from datetime import datetime
 
 from utils import app_dir
+import data_cache
+import durable_io
+import sqlite_store
 
 
 BASE_DIR = app_dir()
@@ -10,7 +13,7 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 SUPPLIER_PAYMENTS_FILE = os.path.join(DATA_DIR, "supplier_payments.json")
 
 
-def load_supplier_payments():
+def _read_supplier_payments():
     if not os.path.exists(SUPPLIER_PAYMENTS_FILE):
         return []
     with open(SUPPLIER_PAYMENTS_FILE, "r", encoding="utf-8") as f:
@@ -20,16 +23,30 @@ def load_supplier_payments():
             return []
 
 
+def load_supplier_payments():
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_supplier_payments()
+    return data_cache.load(SUPPLIER_PAYMENTS_FILE, _read_supplier_payments)
+
+
 def save_supplier_payments(rows):
+    if sqlite_store.is_enabled():
+        sqlite_store.save_supplier_payments(rows)
+        return
     os.makedirs(DATA_DIR, exist_ok=True)
-    with open(SUPPLIER_PAYMENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(rows, f, indent=4)
+    durable_io.write_json(SUPPLIER_PAYMENTS_FILE, rows, indent=4)
+    data_cache.store(SUPPLIER_PAYMENTS_FILE, rows)
 
 
 def add_supplier_payment(supplier_name, amount, payment_mode, reference="", note="", due_before=0.0, due_after=0.0):
-    rows = load_supplier_payments()
+    if sqlite_store.is_enabled():
+        rows = None
+        count = sqlite_store.count_supplier_payments()
+    else:
+        rows = load_supplier_payments()
+        count = len(rows)
     record = {
-        "payment_id": f"SP{len(rows) + 1:05d}",
+        "payment_id": f"SP{count + 1:05d}",
         "date": datetime.now().strftime("%Y-%m-%d"),
         "supplier_name": supplier_name,
         "amount": float(amount),
@@ -39,12 +56,17 @@ def add_supplier_payment(supplier_name, amount, payment_mode, reference="", note
         "due_before": float(due_before),
         "due_after": float(due_after),
     }
-    rows.append(record)
-    save_supplier_payments(rows)
+    if rows is None:
+        sqlite_store.append_supplier_payment(record)
+    else:
+        rows.append(record)
+        save_supplier_payments(rows)
     return record
 
 
 def get_supplier_payments(supplier_name):
+    if sqlite_store.is_enabled():
+        return sqlite_store.get_supplier_payments(supplier_name)
     target = str(supplier_name or "").strip().lower()
     return [
         p for p in load_supplier_payments()
@@ -1,6 +1,9 @@
 import json
 import os
 from utils import app_dir
+import data_cache
+import durable_io
+import sqlite_store
 
 # -------------------------------
 # Path setup
@@ -12,17 +15,26 @@ SUPPLIERS_FILE = os.path.join(DATA_DIR, "suppliers.json")
 # -------------------------------
 # File handling
 # -------------------------------
-def load_suppliers():
+def _read_suppliers():
     if not os.path.exists(SUPPLIERS_FILE):
         return {}
     with open(SUPPLIERS_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def load_suppliers():
+    if sqlite_store.is_enabled():
+        return sqlite_store.load_suppliers()
+    return data_cache.load(SUPPLIERS_FILE, _read_suppliers)
+
+
 def save_suppliers(data):
+    if sqlite_store.is_enabled():
+        sqlite_store.save_suppliers(data)
+        return
     os.makedirs(DATA_DIR, exist_ok=True)
-    with open(SUPPLIERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    durable_io.write_json(SUPPLIERS_FILE, data, indent=4)
+    data_cache.store(SUPPLIERS_FILE, data)
 
 
 # -------------------------------
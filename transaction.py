@@ -0,0 +1,42 @@
+import os
+from contextlib import contextmanager
+
+from utils import app_dir
+import durable_io
+import sqlite_store
+
+BASE_DIR = app_dir()
+DATA_DIR = os.path.join(BASE_DIR, "data")
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# One record per in-flight unit of work; see durable_io.group_commit.
+TRANSACTION_LOG_FILE = os.path.join(DATA_DIR, ".transaction.redo.json")
+
+
+# -------------------------------
+# Unit of work
+# -------------------------------
+@contextmanager
+def unit_of_work(label=""):
+    """
+    Group every data write made inside the block into one commit.
+
+    Files are read through data_cache, so each is parsed at most once and
+    later steps see earlier staged changes. Writes (inventory, sales and
+    purchase journals, cash ledger, customers, overrides, audit lines...)
+    are staged and, on a clean exit, recorded as a single redo record and
+    then applied. If the block raises, nothing is written and the cached
+    copies are dropped. In SQLite mode the same block is also one database
+    transaction. Nested units join the outer one.
+    """
+    with durable_io.group_commit(redo_log=TRANSACTION_LOG_FILE, label=label):
+        if sqlite_store.is_enabled():
+            with sqlite_store.transaction():
+                yield
+        else:
+            yield
+
+
+def recover_pending_transaction():
+    """Finish a unit of work interrupted by a crash. Call once at startup."""
+    return durable_io.recover(TRANSACTION_LOG_FILE)
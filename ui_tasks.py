@@ -0,0 +1,209 @@
+import os
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, messagebox
+
+
+# Background work for the Tk screens.
+#
+# Tk widgets may only be touched from the main loop. run_task() runs
+# work(task) on a shared thread pool and polls the future with after(), so
+# on_done / on_error / on_progress always run on the main thread. work must
+# only load, aggregate and write files: read the filter widgets first and
+# pass the values in. It can report progress with task.progress() and should
+# call task.check() between steps, which raises TaskCancelled once the task
+# was cancelled. Results of cancelled tasks, or of tasks whose widget was
+# destroyed, are dropped.
+#
+# Loads made by work while the UI thread has a unit of work open return
+# the committed data, never its staged values (see data_cache).
+#
+# TaskStatus is a status line (text, progress bar, Cancel button) that
+# screens pack next to their actions and start tasks through.
+
+MAX_WORKERS = max(1, int(os.environ.get("UI_TASK_WORKERS", "4") or 4))
+POLL_MS = 50
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    def __init__(self, name=""):
+        self.name = name
+        self.future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = None
+        self._reported = None
+
+    # ----- worker side -----
+    def progress(self, done, total=None, text=""):
+        with self._lock:
+            self._progress = (done, total, text)
+
+    def check(self):
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    # ----- UI side -----
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def _take_progress(self):
+        with self._lock:
+            latest = self._progress
+        if latest == self._reported:
+            return None
+        self._reported = latest
+        return latest
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ui-task")
+        return _executor
+
+
+def _alive(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except tk.TclError:
+        return False
+
+
+def _show_error(title):
+    def handler(exc):
+        messagebox.showerror(title or "Error", str(exc) or exc.__class__.__name__)
+    return handler
+
+
+def run_task(widget, work, on_done=None, on_error=None, on_progress=None, name=""):
+    """
+    Run work(task) in the background; callbacks run on widget's main loop.
+    Returns the Task (use task.cancel() to stop waiting for it).
+    """
+    task = Task(name)
+    task.future = _pool().submit(work, task)
+    on_error = on_error or _show_error(name)
+
+    def poll():
+        if not _alive(widget):
+            task.cancel()
+            return
+        latest = task._take_progress()
+        if latest is not None and on_progress and not task.cancelled:
+            on_progress(*latest)
+        if not task.future.done():
+            widget.after(POLL_MS, poll)
+            return
+        if task.cancelled:
+            return
+        try:
+            result = task.future.result()
+        except TaskCancelled:
+            return
+        except Exception as exc:
+            on_error(exc)
+            return
+        if on_done:
+            on_done(result)
+
+    widget.after(POLL_MS, poll)
+    return task
+
+
+class TaskStatus(ttk.Frame):
+    """Status line for the background tasks of one screen."""
+
+    def __init__(self, parent, **kwargs):
+        super().__init__(parent, **kwargs)
+        self._tasks = {}  # key -> (task, text), newest last
+        self.text_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.text_var, style="Subtle.TLabel").pack(side="left")
+        self.bar = ttk.Progressbar(self, length=140, mode="indeterminate")
+        self.cancel_btn = ttk.Button(self, text="Cancel", width=8, command=self.cancel)
+        self._shown = False
+
+    def run(self, work, on_done=None, on_error=None, text="Working...", key=None):
+        """
+        run_task() shown on this status line. Starting a task with the key
+        of a running one cancels the old task (key defaults to text).
+        """
+        key = key or text
+        previous = self._tasks.pop(key, None)
+        if previous:
+            previous[0].cancel()
+
+        def finish(callback):
+            def handler(value):
+                current = self._tasks.get(key)
+                if current and current[0] is task:
+                    del self._tasks[key]
+                    self._refresh()
+                if callback:
+                    callback(value)
+            return handler
+
+        def progress(done, total, message):
+            if self._tasks and list(self._tasks.values())[-1][0] is task:
+                self._show_progress(done, total, message or text)
+
+        task = run_task(
+            self,
+            work,
+            on_done=finish(on_done),
+            on_error=finish(on_error or _show_error(text.rstrip("."))),
+            on_progress=progress,
+            name=text,
+        )
+        self._tasks[key] = (task, text)
+        self._refresh()
+        return task
+
+    def busy(self, key=None):
+        if key is None:
+            return bool(self._tasks)
+        return key in self._tasks
+
+    def cancel(self):
+        for task, _text in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._refresh()
+
+    def _refresh(self):
+        if not self._tasks:
+            self.text_var.set("")
+            self.bar.stop()
+            self.bar.pack_forget()
+            self.cancel_btn.pack_forget()
+            self._shown = False
+            return
+        _task, text = list(self._tasks.values())[-1]
+        self.text_var.set(text)
+        self.bar.configure(mode="indeterminate", value=0)
+        self.bar.start(15)
+        if not self._shown:
+            self.bar.pack(side="left", padx=(8, 4))
+            self.cancel_btn.pack(side="left")
+            self._shown = True
+
+    def _show_progress(self, done, total, text):
+        self.text_var.set(text)
+        if total:
+            self.bar.stop()
+            self.bar.configure(mode="determinate", maximum=total, value=min(done, total))
@@ -0,0 +1,211 @@
+from tkinter import ttk
+
+
+# Virtual scrolling for report grids.
+#
+# VirtualTree drives an existing ttk.Treeview from a backing list of row
+# values. Only the rows that fit in the widget exist as Treeview items; the
+# vertical scrollbar, mouse wheel and arrow/page keys move a window over the
+# backing list and re-render it. Opening a 100k-row report costs one list
+# assignment instead of 100k tree.insert() calls, and memory held by Tk is
+# bounded by the window size.
+#
+# Rows keep a stable iid, str(index in the list given to set_rows()), so
+# screens can key their own maps on iid and use tree.item(iid, "values") or
+# tree.set(iid, col) for visible rows as before. sort() reorders the view
+# without changing iids. selection() returns selected iids across the whole
+# list, including rows scrolled out of view.
+
+_SHIFT = 0x0001
+_CONTROL = 0x0004
+_WHEEL_UNITS = 3
+
+
+class VirtualTree:
+    def __init__(self, tree, yscrollbar=None):
+        self.tree = tree
+        self.yscrollbar = yscrollbar
+        self._rows = []
+        self._tags = []
+        self._order = []
+        self._first = 0
+        self._window = 20
+        self._selected = set()
+
+        if yscrollbar is not None:
+            yscrollbar.configure(command=self.yview)
+        tree.configure(yscrollcommand=lambda *_: None)
+        tree.bind("<Configure>", self._on_configure, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel, add="+")
+        tree.bind("<Button-4>", lambda _e: self._scroll(-_WHEEL_UNITS), add="+")
+        tree.bind("<Button-5>", lambda _e: self._scroll(_WHEEL_UNITS), add="+")
+        tree.bind("<ButtonPress-1>", self._on_press, add="+")
+        for key in ("<Up>", "<Down>", "<Prior>", "<Next>"):
+            tree.bind(key, self._on_key, add="+")
+
+    # ----- data -----
+    def set_rows(self, rows, tags=None):
+        """Replace the backing list. rows: value tuples; tags: per-row tag tuples."""
+        self._rows = list(rows)
+        self._tags = list(tags) if tags is not None else [()] * len(self._rows)
+        self._order = list(range(len(self._rows)))
+        self._first = 0
+        self._selected = set()
+        self.tree.selection_set(())
+        self._render()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def row_index(self, iid):
+        """Position of iid in the list given to set_rows()."""
+        return int(iid)
+
+    def values(self, iid):
+        return self._rows[int(iid)]
+
+    def value(self, iid, column):
+        """One cell of a row, visible or not (like tree.set(iid, column))."""
+        return self._rows[int(iid)][self._column_index(column)]
+
+    def set_value(self, iid, column, value):
+        """Change one cell in the backing list (and on screen if visible)."""
+        idx = int(iid)
+        col = self._column_index(column)
+        row = list(self._rows[idx])
+        row[col] = value
+        self._rows[idx] = tuple(row)
+        if self.tree.exists(iid):
+            self.tree.set(iid, column, value)
+
+    def iids(self):
+        """Every iid in display order."""
+        return [str(idx) for idx in self._order]
+
+    def sort(self, column, key=None, reverse=False):
+        col = self._column_index(column)
+        key = key or (lambda v: v)
+        self._order.sort(key=lambda idx: key(self._rows[idx][col]), reverse=reverse)
+        self._render()
+
+    def selection(self):
+        visible = set(self.tree.get_children())
+        chosen = (self._selected - visible) | set(self.tree.selection())
+        return [iid for iid in self.iids() if iid in chosen]
+
+    def _column_index(self, column):
+        return list(self.tree["columns"]).index(column)
+
+    # ----- rendering -----
+    def _clamp(self, first):
+        return max(0, min(first, len(self._order) - self._window))
+
+    def _render(self):
+        tree = self.tree
+        visible = tree.get_children()
+        self._selected = (self._selected - set(visible)) | set(tree.selection())
+        focus_idx = tree.focus()
+        if visible:
+            tree.delete(*visible)
+
+        self._first = self._clamp(self._first)
+        shown = []
+        for idx in self._order[self._first:self._first + self._window]:
+            iid = str(idx)
+            tree.insert("", "end", iid=iid, values=self._rows[idx], tags=self._tags[idx])
+            shown.append(iid)
+
+        keep = [iid for iid in shown if iid in self._selected]
+        tree.selection_set(keep)
+        if focus_idx in shown:
+            tree.focus(focus_idx)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self.yscrollbar is None:
+            return
+        total = len(self._order)
+        if not total:
+            self.yscrollbar.set(0.0, 1.0)
+            return
+        self.yscrollbar.set(self._first / total, min(1.0, (self._first + self._window) / total))
+
+    def _row_height(self):
+        children = self.tree.get_children()
+        if len(children) >= 2:
+            first = self.tree.bbox(children[0])
+            second = self.tree.bbox(children[1])
+            if first and second:
+                return max(1, second[1] - first[1]), first[1]
+        height = ttk.Style(self.tree).lookup("Treeview", "rowheight")
+        try:
+            height = int(height)
+        except (TypeError, ValueError):
+            height = 20
+        return height, height + 4
+
+    def _on_configure(self, _event=None):
+        row_height, header = self._row_height()
+        window = max(1, (self.tree.winfo_height() - header) // row_height)
+        if window != self._window:
+            self._window = window
+            self._render()
+
+    # ----- scrolling -----
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, units|pages)."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._first = int(float(args[1]) * len(self._order))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                step *= self._window
+            self._first += step
+        self._render()
+
+    def _scroll(self, units):
+        before = self._first
+        self._first = self._clamp(self._first + units)
+        if self._first != before:
+            self._render()
+        return "break"
+
+    def _on_wheel(self, event):
+        if not event.delta:
+            return "break"
+        return self._scroll(-_WHEEL_UNITS if event.delta > 0 else _WHEEL_UNITS)
+
+    def _on_press(self, event):
+        # A plain click replaces the selection, including off-screen rows.
+        if not event.state & (_SHIFT | _CONTROL):
+            self._selected = set()
+
+    def _on_key(self, event):
+        children = self.tree.get_children()
+        if not children:
+            return None
+        if not event.state & _SHIFT:
+            self._selected = set()
+        focus = self.tree.focus()
+        at_top = focus == children[0]
+        at_bottom = focus == children[-1]
+        step = {"Up": -1, "Down": 1, "Prior": -self._window, "Next": self._window}[event.keysym]
+        if (step < 0 and not at_top) or (step > 0 and not at_bottom):
+            if abs(step) == 1:
+                return None  # Move within the window; Treeview handles it.
+        pos = self._first + children.index(focus) if focus in children else self._first
+        target = max(0, min(pos + step, len(self._order) - 1))
+        if target < self._first:
+            self._first = target
+        elif target >= self._first + self._window:
+            self._first = target - self._window + 1
+        self._render()
+        iid = str(self._order[target])
+        self.tree.focus(iid)
+        if event.state & _SHIFT:
+            self.tree.selection_add(iid)
+        else:
+            self.tree.selection_set(iid)
+        return "break"